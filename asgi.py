@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecomm_dashboard.settings')
+# Serve the visualizer endpoints with their async views.
+os.environ.setdefault('VISUALIZER_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
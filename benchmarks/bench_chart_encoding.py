@@ -0,0 +1,120 @@
+"""
+Benchmark serialization time and size of chart payloads per renderer.
+
+Builds a ``/visualizer/series`` payload for ``--days`` daily labels and
+``--groups`` breakdown groups with all four metrics, then renders it with
+DRF's JSON renderer (the previous output), the orjson renderer (from lists,
+and from NumPy arrays) and the Arrow IPC renderer. Reports the median render
+time and the body size uncompressed, gzipped and brotli-compressed, as the
+compression middleware would send it. Renderers whose package is not
+installed are skipped. Run from the directory that contains the
+``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_chart_encoding --days 730 --groups 50
+"""
+
+import argparse
+import gzip
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from ecomm_dashboard.visualizer.middleware import BROTLI_QUALITY, brotli  # noqa: E402
+from ecomm_dashboard.visualizer.renderers import (  # noqa: E402
+    ArrowRenderer,
+    ORJSONRenderer,
+    orjson,
+    pyarrow,
+)
+
+
+def series_payload(days, groups, seed=0):
+    """Return a daily series payload broken down into ``groups`` groups."""
+    rng = random.Random(seed)
+    start = date(2023, 1, 1)
+    labels = [(start + timedelta(days=day)).isoformat() for day in range(days)]
+    series = []
+    for index in range(groups):
+        orders = [rng.randrange(0, 40) for _ in labels]
+        series.append(
+            {
+                "group": {"category": f"C{index % 10}", "state": f"S{index // 10}"},
+                "values": {
+                    "quantity_sold": [count * rng.randrange(1, 4) for count in orders],
+                    "revenue": [
+                        round(count * rng.uniform(5, 500), 2) for count in orders
+                    ],
+                    "order_count": orders,
+                    "cancelled_orders": [count // 10 for count in orders],
+                },
+            }
+        )
+    return {"status": "success", "data": {"labels": labels, "series": series}}
+
+
+def with_numpy_arrays(payload):
+    """Return ``payload`` with its series as NumPy arrays."""
+    data = payload["data"]
+    series = [
+        {
+            "group": entry["group"],
+            "values": {
+                metric: np.asarray(values) for metric, values in entry["values"].items()
+            },
+        }
+        for entry in data["series"]
+    ]
+    return {**payload, "data": {**data, "series": series}}
+
+
+def measure(render, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = render(payload)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = series_payload(args.days, args.groups)
+    cases = [("drf-json", JSONRenderer(), payload)]
+    if orjson is not None:
+        cases.append(("orjson", ORJSONRenderer(), payload))
+        cases.append(("orjson-numpy", ORJSONRenderer(), with_numpy_arrays(payload)))
+    if pyarrow is not None:
+        cases.append(("arrow", ArrowRenderer(), payload))
+
+    print(
+        f"{args.days} days x {args.groups} groups x 4 metrics; "
+        "render ms, bytes raw / gzip / brotli"
+    )
+    for name, renderer, data in cases:
+        seconds, body = measure(renderer.render, data, args.repeat)
+        sizes = [len(body), len(gzip.compress(body, compresslevel=6))]
+        if brotli is not None:
+            sizes.append(len(brotli.compress(body, quality=BROTLI_QUALITY)))
+        print(
+            f"{name:>13}: {seconds * 1000:8.2f} ms  "
+            + " / ".join(f"{size:>9,}" for size in sizes)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark rows/sec of the "insert" and "copy" loader engines.
+
+Generates a synthetic export, parses and normalizes it up front, then times
+only the database writes of each engine. Every run happens inside a
+transaction that is rolled back, but it still takes locks on the order
+tables, so point it at a local or scratch Postgres. Run from the directory
+that contains the ``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_loader_engines --rows 200000
+"""
+
+import argparse
+import io
+import os
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+from django.db import connections, transaction  # noqa: E402
+
+from ecomm_dashboard.benchmarks.synthetic import synthetic_csv_text  # noqa: E402
+from ecomm_dashboard.data_loader.pipeline import (  # noqa: E402
+    LOADER_DB,
+    WRITERS,
+    iter_csv_chunks,
+    normalize_chunk,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def time_engine(engine, chunks):
+    """Write every chunk with ``engine`` and return the elapsed seconds."""
+    try:
+        with transaction.atomic(using=LOADER_DB):
+            with connections[LOADER_DB].cursor() as cursor:
+                writer = WRITERS[engine](cursor)
+                start = time.perf_counter()
+                for records in chunks:
+                    writer.write(records)
+                writer.finish()
+                elapsed = time.perf_counter() - start
+            raise Rollback
+    except Rollback:
+        return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--engines", default="insert,copy")
+    args = parser.parse_args()
+
+    text = synthetic_csv_text(args.rows, prefix="BENCH")
+    chunks = [
+        normalize_chunk(chunk)
+        for chunk in iter_csv_chunks(io.BytesIO(text.encode()), args.chunk_rows)
+    ]
+    print(f"dataset: {args.rows} rows in {len(chunks)} chunks")
+
+    for engine in args.engines.split(","):
+        elapsed = time_engine(engine, chunks)
+        print(
+            f"{engine:>7}: {elapsed:7.2f} s, {args.rows / elapsed:10.0f} rows/sec"
+        )
+
+
+if __name__ == "__main__":
+    main()
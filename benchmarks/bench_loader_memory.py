@@ -0,0 +1,104 @@
+"""
+Benchmark peak memory of whole-file versus streaming CSV ingestion.
+
+Writes a synthetic order export of the requested size, then parses and
+normalizes it in a fresh subprocess per mode and reports wall time and peak
+RSS. ``whole`` reproduces the previous loader (full text, one DataFrame,
+one list of dicts); ``stream`` uses ``iter_csv_chunks`` and
+``normalize_chunk``. Database writes are not included. Run from the
+directory that contains the ``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_loader_memory --size-mb 2048
+"""
+
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from ecomm_dashboard.benchmarks.synthetic import write_synthetic_csv  # noqa: E402
+from ecomm_dashboard.data_loader.pipeline import (  # noqa: E402
+    iter_csv_chunks,
+    normalize_chunk,
+)
+
+
+def run_whole(path):
+    with open(path) as f:
+        text = f.read()
+    dataframe = pd.concat([pd.read_csv(io.StringIO(text))], ignore_index=True)
+    records = dataframe.replace({np.nan: None}).to_dict(orient="records")
+    return len(records)
+
+
+def run_stream(path):
+    rows = 0
+    with open(path, "rb") as f:
+        for chunk in iter_csv_chunks(f):
+            rows += len(normalize_chunk(chunk))
+    return rows
+
+
+MODES = {"whole": run_whole, "stream": run_stream}
+
+
+def measure(mode, path):
+    """Run one mode in this process and print rows, seconds and peak RSS."""
+    start = time.perf_counter()
+    rows = MODES[mode](path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{rows} {elapsed:.3f} {peak_kb}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--path", help="reuse or create the CSV at this path")
+    parser.add_argument("--modes", default="stream,whole")
+    parser.add_argument("--measure", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.path)
+        return
+
+    path = args.path or os.path.join(
+        tempfile.gettempdir(), f"bench_orders_{args.size_mb}mb.csv"
+    )
+    if not os.path.exists(path):
+        print(f"writing {args.size_mb} MB synthetic CSV to {path}")
+        write_synthetic_csv(path, args.size_mb * 1024 * 1024)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"input: {size_mb:.0f} MB")
+
+    for mode in args.modes.split(","):
+        result = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--measure", mode, "--path", path],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"{mode:>7}: failed (exit {result.returncode}, likely out of memory)")
+            continue
+        rows, elapsed, peak_kb = result.stdout.split()[-3:]
+        print(
+            f"{mode:>7}: {int(rows)} rows in {float(elapsed):7.1f} s, "
+            f"peak RSS {int(peak_kb) / 1024:8.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the pandas and SQL monthly aggregation paths of the visualizer.
+
+Generates a temporary table shaped like ``mv_order_details`` and times both
+the original pandas aggregation, which fetches every line and sums them by
+month in pandas, and ``get_monthly_aggregate`` against it. Run from the
+directory that contains the ``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_monthly_aggregation --rows 1000000
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import django
+import pandas as pd
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ecomm_dashboard.visualizer.views import get_monthly_aggregate  # noqa: E402
+
+BENCH_TABLE = "bench_mv_order_details"
+
+NO_FILTERS = {
+    "sales_date": None,
+    "category": None,
+    "delivery_status": None,
+    "platform_id": None,
+    "state": None,
+}
+
+
+def create_dataset(rows):
+    """Fill a temporary table with ``rows`` synthetic order lines."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE {BENCH_TABLE} AS
+            SELECT
+                'ORD-' || g AS order_id,
+                DATE '2022-01-01' + (random() * 1095)::int AS date_of_sale,
+                (ARRAY['Delivered', 'Cancelled', 'Shipped'])[1 + mod(g, 3)]
+                    AS delivery_status,
+                1 + mod(g, 4) AS platform_id,
+                round((random() * 500)::numeric, 2)::double precision
+                    AS selling_price,
+                1 + mod(g, 5) AS quantity_sold,
+                (ARRAY['Books', 'Toys', 'Home', 'Garden'])[1 + mod(g, 4)]
+                    AS category,
+                'State-' || mod(g, 20) AS state
+            FROM generate_series(1, %s) AS g
+            """,
+            [rows],
+        )
+        cursor.execute(f"ANALYZE {BENCH_TABLE}")
+
+
+def pandas_path(value_col):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT date_of_sale, {value_col} FROM {BENCH_TABLE}")
+        df = pd.DataFrame(cursor.fetchall(), columns=["date_of_sale", value_col])
+    df["date_of_sale"] = pd.to_datetime(df["date_of_sale"])
+    monthly_data = (
+        df.groupby(df["date_of_sale"].dt.strftime("%Y-%m"))[value_col]
+        .sum()
+        .reset_index()
+        .rename(columns={"date_of_sale": "month"})
+        .sort_values("month")
+    )
+    return {
+        "labels": monthly_data["month"].tolist(),
+        "values": monthly_data[value_col].tolist(),
+    }
+
+
+def sql_path(value_col):
+    return get_monthly_aggregate(value_col, NO_FILTERS, source=BENCH_TABLE)
+
+
+def timed(func, value_col, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(value_col)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_dataset(args.rows)
+    print(f"dataset: {args.rows} rows in {BENCH_TABLE}")
+
+    for value_col in ("quantity_sold", "selling_price"):
+        pandas_result, pandas_timings = timed(pandas_path, value_col, args.repeat)
+        sql_result, sql_timings = timed(sql_path, value_col, args.repeat)
+
+        assert pandas_result["labels"] == sql_result["labels"]
+        for expected, actual in zip(pandas_result["values"], sql_result["values"]):
+            assert abs(expected - actual) <= 1e-6 * max(1.0, abs(expected))
+
+        pandas_median = statistics.median(pandas_timings)
+        sql_median = statistics.median(sql_timings)
+        print(
+            f"{value_col:>14}: pandas {pandas_median * 1000:9.1f} ms | "
+            f"sql {sql_median * 1000:9.1f} ms | "
+            f"speedup {pandas_median / sql_median:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
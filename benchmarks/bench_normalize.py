@@ -0,0 +1,92 @@
+"""
+Microbenchmark of row-wise versus columnar record normalization.
+
+Parses a synthetic export of the requested number of rows into one frame,
+then times only the normalization step. ``rows`` reproduces the previous
+loader (list of dicts, then per-row address splits, ``strptime`` and
+``json.dumps``); ``columnar`` is ``normalize_chunk``. Run from the directory
+that contains the ``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_normalize --rows 1000000
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from ecomm_dashboard.benchmarks.synthetic import synthetic_csv_text  # noqa: E402
+from ecomm_dashboard.data_loader.pipeline import (  # noqa: E402
+    TEXT_DTYPES,
+    normalize_chunk,
+)
+
+
+def run_rows(frame):
+    records = frame.replace({np.nan: None}).to_dict(orient="records")
+    rows = []
+    for record in records:
+        street, city_state = record["DeliveryAddress"].split(", ", 1)
+        city, state = city_state.split(", ")
+        city = city.replace("City-", "")
+        state = state.replace("State-", "")
+        rows.append(
+            (
+                f"ADDR-{record['CustomerID']}-{city}-{state}",
+                street,
+                city,
+                state,
+                datetime.strptime(record["DateOfSale"], "%Y-%m-%d").date(),
+                datetime.strptime(record["DeliveryDate"], "%Y-%m-%d").date(),
+                json.dumps(
+                    {
+                        "coupon_used": record["CouponUsed"],
+                        "return_window": record["ReturnWindow"],
+                        "prime_delivery": record["PrimeDelivery"],
+                        "warehouse_location": record["WarehouseLocation"],
+                        "reseller_name": record["ResellerName"],
+                        "commission_percentage": record["CommissionPercentage"],
+                        "phone_number": record["PhoneNumber"],
+                    }
+                ),
+            )
+        )
+    return len(rows)
+
+
+def run_columnar(frame):
+    return len(normalize_chunk(frame))
+
+
+MODES = {"rows": run_rows, "columnar": run_columnar}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", default="rows,columnar")
+    args = parser.parse_args()
+
+    text = synthetic_csv_text(args.rows)
+    frame = pd.read_csv(io.StringIO(text), dtype=TEXT_DTYPES)
+    print(f"dataset: {len(frame)} rows")
+
+    for mode in args.modes.split(","):
+        start = time.perf_counter()
+        rows = MODES[mode](frame)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>9}: {rows} rows in {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
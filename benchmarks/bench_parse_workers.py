@@ -0,0 +1,79 @@
+"""
+Benchmark parse and normalize throughput by number of parse workers.
+
+Writes a synthetic export of ``--rows`` rows, then reads it back through
+``iter_normalized_chunks`` parsing in the calling thread (``0`` workers) and
+with process pools of each size in ``--workers``. Pools are started and
+warmed up before timing, as a loader process keeps its pool between jobs.
+Database writes are not included, so this is the ceiling the single writer
+can be fed at. Run from the directory that contains the ``ecomm_dashboard``
+package:
+
+    python -m ecomm_dashboard.benchmarks.bench_parse_workers --rows 1000000
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+django.setup()
+
+from ecomm_dashboard.benchmarks.synthetic import synthetic_blocks  # noqa: E402
+from ecomm_dashboard.benchmarks.synthetic import HEADER  # noqa: E402
+from ecomm_dashboard.data_loader.pipeline import (  # noqa: E402
+    iter_normalized_chunks,
+    parse_csv_block,
+)
+
+
+def write_export(path, rows):
+    with open(path, "w") as f:
+        f.write(HEADER)
+        blocks = synthetic_blocks()
+        for _ in range(rows // 10_000):
+            f.write(next(blocks))
+
+
+def measure(path, pool):
+    start = time.perf_counter()
+    rows = 0
+    with open(path, "rb") as f:
+        for frame in iter_normalized_chunks(f, pool):
+            rows += len(frame)
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.csv")
+        write_export(path, args.rows)
+        print(f"cpus: {os.cpu_count()}, export: {os.path.getsize(path):,} bytes")
+
+        rows, seconds = measure(path, None)
+        print(f"inline:    {seconds:8.2f} s, {rows / seconds:10,.0f} rows/sec")
+
+        sample = HEADER.encode(), next(synthetic_blocks(block_rows=10)).encode()
+        for workers in [int(value) for value in args.workers.split(",")]:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                wait([pool.submit(parse_csv_block, *sample) for _ in range(workers)])
+                rows, seconds = measure(path, pool)
+            print(
+                f"{workers:>2} workers: {seconds:8.2f} s, "
+                f"{rows / seconds:10,.0f} rows/sec"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Load test the chart endpoints served under WSGI and under ASGI.
+
+Starts the project under each server in turn (gunicorn with threaded sync
+workers for WSGI, uvicorn with the async views for ASGI), keeps
+``--concurrency`` keep-alive connections polling the chart endpoints for
+``--duration`` seconds and reports requests/sec and latency percentiles.
+With ``--miss`` every request asks for a different date range, so it misses
+the response cache and queries the database. ``--db-latency-ms`` puts a
+proxy delaying each packet by half that much in front of the database, to
+approximate a remote one such as RDS from a local setup. Needs gunicorn and uvicorn
+installed and a loaded database. Run from the directory that contains the
+``ecomm_dashboard`` package:
+
+    python -m ecomm_dashboard.benchmarks.bench_wsgi_asgi --concurrency 64 --miss
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecomm_dashboard.settings")
+
+ENDPOINTS = [
+    "/visualizer/monthly_sales_volume",
+    "/visualizer/monthly_revenue",
+    "/visualizer/orders_summary",
+]
+
+
+def server_command(mode, port, workers, threads):
+    """Return the command line serving the project in ``mode``."""
+    if mode == "wsgi":
+        command = (
+            f"gunicorn ecomm_dashboard.wsgi:application --bind 127.0.0.1:{port} "
+            f"--workers {workers} --threads {threads}"
+        )
+    else:
+        command = (
+            f"uvicorn ecomm_dashboard.asgi:application --port {port} "
+            f"--workers {workers}"
+        )
+    return [sys.executable, "-m", *command.split(), "--log-level", "warning"]
+
+
+def start_latency_proxy(latency_ms):
+    """Proxy the configured database with added round-trip latency."""
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    db_host = connection.settings_dict["HOST"] or "localhost"
+    db_port = int(connection.settings_dict["PORT"] or 5432)
+    delay = latency_ms / 2000
+    port = free_port()
+
+    async def pipe(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        db_reader, db_writer = await asyncio.open_connection(db_host, db_port)
+        await asyncio.gather(
+            pipe(client_reader, db_writer),
+            pipe(db_reader, client_writer),
+            return_exceptions=True,
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port)
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    wait_for_port(port)
+    return port
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def request_path(miss):
+    """Return a chart request, with a random date range if ``miss``."""
+    path = random.choice(ENDPOINTS)
+    if not miss:
+        return path
+    start = date(2023, 1, 1) + timedelta(days=random.randrange(300))
+    end = start + timedelta(days=random.randrange(1, 60))
+    return f"{path}?date_range={start},{end}"
+
+
+async def fetch(reader, writer, path):
+    """Send one GET over a keep-alive connection and return its status."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, deadline, miss, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            status = await fetch(reader, writer, request_path(miss))
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(port, concurrency, duration, miss):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(
+        *(client(port, deadline, miss, latencies, errors) for _ in range(concurrency))
+    )
+    return latencies, errors
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_mode(mode, args):
+    port = free_port()
+    server = subprocess.Popen(server_command(mode, port, args.workers, args.threads))
+    try:
+        wait_for_port(port)
+        # Warm up connections, pools and the response cache.
+        asyncio.run(load(port, args.concurrency, 2, args.miss))
+        latencies, errors = asyncio.run(
+            load(port, args.concurrency, args.duration, args.miss)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print(
+        f"{mode}: {len(latencies) / args.duration:8.0f} req/s, "
+        f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms, "
+        f"{len(errors)} non-200"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--threads", type=int, default=10, help="Threads per gunicorn worker."
+    )
+    parser.add_argument(
+        "--miss", action="store_true", help="Bypass the response cache."
+    )
+    parser.add_argument("--db-latency-ms", type=float, default=0)
+    parser.add_argument("--modes", default="wsgi,asgi")
+    args = parser.parse_args()
+
+    if args.db_latency_ms:
+        port = start_latency_proxy(args.db_latency_ms)
+        os.environ.update(DATABASE_HOST="127.0.0.1", DATABASE_PORT=str(port))
+
+    print(
+        f"{args.concurrency} connections for {args.duration:.0f} s, "
+        f"{args.workers} worker(s), {'cache misses' if args.miss else 'cached'}, "
+        f"{args.db_latency_ms:.0f} ms added database latency"
+    )
+    for mode in args.modes.split(","):
+        run_mode(mode, args)
+
+
+if __name__ == "__main__":
+    main()
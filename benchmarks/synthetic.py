@@ -0,0 +1,62 @@
+"""Synthetic order exports shared by the benchmarks."""
+
+import random
+
+HEADER = (
+    "OrderID,DateOfSale,Platform,ProductID,ProductName,Category,CustomerID,"
+    "CustomerName,ContactEmail,DeliveryAddress,DeliveryDate,DeliveryStatus,"
+    "SellingPrice,QuantitySold,CouponUsed,ReturnWindow,PrimeDelivery,"
+    "WarehouseLocation,ResellerName,CommissionPercentage,PhoneNumber\n"
+)
+
+PLATFORMS = ["Amazon", "Flipkart", "Meesho"]
+CATEGORIES = ["Books", "Toys", "Home", "Garden"]
+STATUSES = ["Delivered", "Cancelled", "Shipped"]
+
+
+def synthetic_blocks(seed=0, block_rows=10_000, prefix="ORD"):
+    """Yield blocks of ``block_rows`` CSV order lines, without the header."""
+    rng = random.Random(seed)
+    order = 0
+    while True:
+        lines = []
+        for _ in range(block_rows):
+            order += 1
+            customer = rng.randrange(100_000)
+            product = rng.randrange(5_000)
+            month, day = rng.randrange(1, 13), rng.randrange(1, 29)
+            lines.append(
+                f"{prefix}-{order},2023-{month:02d}-{day:02d},{rng.choice(PLATFORMS)},"
+                f"P{product},Product {product},{CATEGORIES[product % 4]},"
+                f"C{customer},Customer {customer},c{customer}@example.com,"
+                f'"{customer} Main St, City-{customer % 97}, State-{customer % 29}",'
+                f"2023-{month:02d}-{day:02d},{rng.choice(STATUSES)},"
+                f"{rng.uniform(1, 500):.2f},{rng.randrange(1, 5)},True,7,False,"
+                f"WH-{customer % 11},,,9{customer:09d}\n"
+            )
+        yield "".join(lines)
+
+
+def write_synthetic_csv(path, size_bytes, seed=0):
+    """Write order rows to ``path`` until it reaches ``size_bytes``."""
+    with open(path, "w") as f:
+        f.write(HEADER)
+        written = len(HEADER)
+        for block in synthetic_blocks(seed):
+            if written >= size_bytes:
+                break
+            f.write(block)
+            written += len(block)
+
+
+def synthetic_csv_text(rows, seed=0, prefix="ORD"):
+    """Return a CSV export with exactly ``rows`` order lines."""
+    blocks = synthetic_blocks(seed, block_rows=min(rows, 10_000), prefix=prefix)
+    parts, remaining = [HEADER], rows
+    while remaining > 0:
+        block = next(blocks)
+        if remaining < 10_000:
+            block = "".join(block.splitlines(keepends=True)[:remaining])
+        parts.append(block)
+        remaining -= 10_000
+    return "".join(parts)
@@ -3,4 +3,5 @@ from django.apps import AppConfig
 
 class DataLoaderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'data_loader'
+    name = 'ecomm_dashboard.data_loader'
+    label = 'data_loader'
@@ -0,0 +1,100 @@
+"""
+Process-level caches of the dimension keys known to exist in the database.
+
+Steady-state uploads mostly repeat platforms, products, customers and
+addresses loaded before. The writers look up every chunk's keys here, then
+look up the keys they miss in the database, where other processes may have
+written them. Only the keys found in neither are inserted, with ``INSERT
+... ON CONFLICT DO NOTHING``; afterwards the keys exist either way and are
+cached. The caches start empty and warm up as loads run, each holding at
+most ``DATA_LOADER_DIMENSION_CACHE_SIZE`` keys and evicting the least
+recently used.
+
+Keys are only cached once the transaction that wrote them commits, so a
+rolled-back chunk cannot leave a key cached whose row does not exist. The
+caches assume dimension rows are never deleted; call ``clear_all`` after
+removing any.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+CACHE_SIZE = getattr(settings, "DATA_LOADER_DIMENSION_CACHE_SIZE", 100_000)
+
+
+class DimensionKeyCache:
+    """A bounded LRU mapping of dimension keys to their ids, if any."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, keys):
+        """Return the cached ``{key: id}`` of ``keys`` and a list of the rest."""
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+                    found[key] = self._keys[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def update(self, mapping):
+        """Cache ``mapping``, evicting the least recently used keys."""
+        with self._lock:
+            for key, value in mapping.items():
+                self._keys[key] = value
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def update_on_commit(self, mapping, using):
+        """Cache ``mapping`` once the transaction on ``using`` commits."""
+        if mapping:
+            transaction.on_commit(lambda: self.update(mapping), using=using)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+# Platform name -> id.
+platform_ids = DimensionKeyCache(CACHE_SIZE)
+# (id, name, category, platform_id) of products; the ids map to None.
+product_keys = DimensionKeyCache(CACHE_SIZE)
+customer_keys = DimensionKeyCache(CACHE_SIZE)
+address_keys = DimensionKeyCache(CACHE_SIZE)
+
+CACHES = {
+    "platform": platform_ids,
+    "product": product_keys,
+    "customer": customer_keys,
+    "customer_address_details": address_keys,
+}
+
+
+def cache_stats():
+    """Return the size, hits and misses of every cache, by table."""
+    return {
+        table: {"size": len(cache), "hits": cache.hits, "misses": cache.misses}
+        for table, cache in CACHES.items()
+    }
+
+
+def clear_all():
+    """Forget every cached key, e.g. after dimension rows were deleted."""
+    for cache in CACHES.values():
+        cache.clear()
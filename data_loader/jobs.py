@@ -0,0 +1,223 @@
+"""
+Asynchronous ingestion jobs.
+
+Uploads only record an ``IngestionJob`` and return its id. Jobs are claimed
+from the ``ingestion_job`` table with ``SELECT ... FOR UPDATE SKIP LOCKED``,
+so worker threads in any web process, or the ``run_ingestion_jobs``
+command, can run them without an external broker. A worker must hold one of
+``DATA_LOADER_MAX_CONCURRENT_JOBS`` session advisory locks while it runs
+jobs, which caps concurrent ingestion across all processes and leaves
+database connections and CPU for dashboard reads.
+"""
+
+import logging
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader.models import DataVersion, IngestionJob, SourceFile
+from ecomm_dashboard.data_loader.pipeline import LOADER_DB, make_writer
+from ecomm_dashboard.data_loader.refresh import order_details_refresher
+from ecomm_dashboard.data_loader.sources import load_csv_sources, remove_uploads
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock namespace for job slots; the second key is the slot number.
+JOB_SLOT_LOCK_ID = 7_210_003
+
+
+def submit_job(urls):
+    """Queue a load of ``urls`` and wake this process's workers."""
+    job = IngestionJob.objects.create(urls=urls)
+    job_runner.wake()
+    return job
+
+
+def claim_next_job():
+    """Mark the oldest queued job as running and return it, or None."""
+    with transaction.atomic(using=LOADER_DB):
+        job = (
+            IngestionJob.objects.using(LOADER_DB)
+            .select_for_update(skip_locked=True)
+            .filter(status=IngestionJob.QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = IngestionJob.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at", "updated_at"])
+    return job
+
+
+def publish_changes(writer):
+    """
+    Invalidate cached chart responses and request a refresh of the
+    materialized view if a load changed any rows.
+    """
+    if writer.rollup_months:
+        # Invalidate cached chart responses built from the previous data
+        DataVersion.bump(DataVersion.ORDERS)
+
+        # Refresh materialized view in the background, coalesced with
+        # any other uploads that land within the debounce window
+        order_details_refresher.request_refresh()
+
+
+def run_job(job):
+    """Load every file of a claimed job and record its outcome."""
+    with instrumentation.collect() as timings:
+        load_job(job, timings)
+
+
+def load_job(job, timings):
+    """Helper function to run a job while ``timings`` collects its stages"""
+    rows = IngestionJob.objects.using(LOADER_DB).filter(pk=job.pk)
+    writer = None
+    try:
+        with connections[LOADER_DB].cursor() as cursor:
+            writer = make_writer(cursor)
+
+            def progress(files):
+                rows.update(
+                    files=files,
+                    rows_parsed=writer.record_count,
+                    rows_inserted=dict(writer.inserted_rows),
+                    rows_updated=dict(writer.updated_rows),
+                    timings=timings.as_dict(),
+                    updated_at=timezone.now(),
+                )
+
+            try:
+                files = load_csv_sources(
+                    writer, job.urls, progress, skip_loaded=True
+                )
+            finally:
+                # Update the monthly rollup for the months this load touched.
+                # Chunks commit as they are written, so this also runs when a
+                # later chunk failed: re-posting the file would not write the
+                # committed rows again, and their months would stay stale.
+                writer.finish()
+
+        # Only now are the files' rows in the rollup, so skipping them later
+        # cannot leave a month stale.
+        SourceFile.record_loaded(files, using=LOADER_DB)
+        publish_changes(writer)
+
+    except Exception as e:
+        logger.error(f"Error inserting data: {str(e)}")
+        logger.error(traceback.format_exc())
+        if writer is not None:
+            # Publish the chunks that committed before the failure
+            try:
+                publish_changes(writer)
+            except Exception as publish_error:
+                logger.error(f"Error publishing changes: {str(publish_error)}")
+        rows.update(
+            status=IngestionJob.ERROR,
+            message=f"Error inserting data: {str(e)}",
+            timings=timings.as_dict(),
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        return
+
+    failed = [outcome for outcome in files if outcome["status"] == "error"]
+    if len(failed) == len(files):
+        status, message = IngestionJob.ERROR, failed[0]["message"]
+    else:
+        status = IngestionJob.PARTIAL if failed else IngestionJob.SUCCESS
+        message = f"Successfully inserted {writer.record_count} records"
+
+    rows.update(
+        status=status,
+        message=message,
+        files=files,
+        rows_parsed=writer.record_count,
+        rows_inserted=dict(writer.inserted_rows),
+        rows_updated=dict(writer.updated_rows),
+        timings=timings.as_dict(),
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+class IngestionJobRunner:
+    """Runs queued jobs on at most ``max_concurrent`` workers at a time."""
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def wake(self):
+        """Start background worker threads, up to the concurrency limit."""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for _ in range(self.max_concurrent - len(self._threads)):
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def run_pending(self):
+        """
+        Run queued jobs until none are left or every slot is busy elsewhere.
+
+        Returns the number of jobs this call ran.
+        """
+        ran = 0
+        while True:
+            slot = self._acquire_slot()
+            if slot is None:
+                return ran
+
+            try:
+                while (job := claim_next_job()) is not None:
+                    run_job(job)
+                    remove_uploads(job.urls)
+                    ran += 1
+            finally:
+                self._release_slot(slot)
+
+            # A job queued while the slot was held may have found every slot
+            # busy; look again so it is not left waiting for the next upload.
+            queued = IngestionJob.objects.using(LOADER_DB).filter(
+                status=IngestionJob.QUEUED
+            )
+            if not queued.exists():
+                return ran
+
+    def _acquire_slot(self):
+        with connections[LOADER_DB].cursor() as cursor:
+            for slot in range(self.max_concurrent):
+                cursor.execute(
+                    "SELECT pg_try_advisory_lock(%s, %s)", [JOB_SLOT_LOCK_ID, slot]
+                )
+                (acquired,) = cursor.fetchone()
+                if acquired:
+                    return slot
+        return None
+
+    def _release_slot(self, slot):
+        with connections[LOADER_DB].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_unlock(%s, %s)", [JOB_SLOT_LOCK_ID, slot]
+            )
+
+    def _work(self):
+        try:
+            self.run_pending()
+        except Exception as e:
+            logger.error(f"Error running ingestion jobs: {str(e)}")
+        finally:
+            connections.close_all()
+
+
+job_runner = IngestionJobRunner(
+    max_concurrent=getattr(settings, "DATA_LOADER_MAX_CONCURRENT_JOBS", 2)
+)
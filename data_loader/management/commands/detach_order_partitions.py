@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ecomm_dashboard.data_loader.models import DataVersion
+from ecomm_dashboard.data_loader.partitions import (
+    attached_partitions,
+    detach_month_partitions,
+    partition_name,
+)
+from ecomm_dashboard.data_loader.pipeline import LOADER_DB
+from ecomm_dashboard.data_loader.refresh import order_details_refresher
+from ecomm_dashboard.data_loader.rollup import refresh_monthly_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Detach the orders and order_details partitions of every month before "
+        "--before, leaving them as standalone tables to archive (or dropping "
+        "them with --drop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            required=True,
+            metavar="YYYY-MM",
+            help="First month to keep attached.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop the detached tables instead of keeping them.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = date.fromisoformat(options["before"] + "-01")
+        except ValueError:
+            raise CommandError("--before must be a month in YYYY-MM format.")
+
+        with connections[LOADER_DB].cursor() as cursor:
+            attached = attached_partitions(cursor, "orders")
+            months = []
+            for name in sorted(attached):
+                year, month = name.removeprefix("orders_p").split("_")
+                if date(int(year), int(month), 1) < cutoff:
+                    months.append(date(int(year), int(month), 1))
+
+            for month in months:
+                detach_month_partitions(cursor, month, drop=options["drop"])
+                action = "Dropped" if options["drop"] else "Detached"
+                self.stdout.write(f"{action} {partition_name('orders', month)}")
+
+            if months:
+                # The months are gone from the base tables; drop their rollup
+                # rows and bring mv_order_details and the chart cache in line.
+                refresh_monthly_rollup(cursor, months)
+
+        if not months:
+            self.stdout.write(f"No partitions before {options['before']}")
+            return
+
+        DataVersion.bump(DataVersion.ORDERS)
+        order_details_refresher.request_refresh()
+        order_details_refresher.refresh_if_pending()
+        self.stdout.write(
+            self.style.SUCCESS(f"{action} {len(months)} month(s) of orders")
+        )
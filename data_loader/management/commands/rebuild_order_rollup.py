@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ecomm_dashboard.data_loader.pipeline import LOADER_DB
+from ecomm_dashboard.data_loader.rollup import rebuild_monthly_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild order_monthly_rollup from the orders base tables."
+
+    def handle(self, *args, **options):
+        with connections[LOADER_DB].cursor() as cursor:
+            rebuild_monthly_rollup(cursor)
+            cursor.execute("SELECT COUNT(*) FROM order_monthly_rollup")
+            (row_count,) = cursor.fetchone()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {row_count} rollup rows"))
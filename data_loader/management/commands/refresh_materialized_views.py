@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ecomm_dashboard.data_loader.refresh import order_details_refresher
+
+
+class Command(BaseCommand):
+    help = "Run any pending refresh of mv_order_details synchronously."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Refresh even if no upload requested it.",
+        )
+
+    def handle(self, *args, **options):
+        if options["force"]:
+            order_details_refresher.status()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE materialized_view_refresh SET requested_at = now() "
+                    "WHERE view_name = %s",
+                    [order_details_refresher.view_name],
+                )
+
+        refreshed = order_details_refresher.refresh_if_pending()
+        if refreshed is None:
+            raise CommandError("Another process is refreshing the view.")
+
+        state = order_details_refresher.status()
+        if refreshed:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Refreshed {state.view_name} in {state.duration_ms:.0f} ms"
+                )
+            )
+        else:
+            self.stdout.write(f"No refresh pending for {state.view_name}")
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ecomm_dashboard.data_loader.jobs import job_runner
+from ecomm_dashboard.data_loader.models import IngestionJob
+from ecomm_dashboard.data_loader.refresh import order_details_refresher
+
+
+class Command(BaseCommand):
+    help = "Run queued ingestion jobs in this process until the queue is empty."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-stalled",
+            type=int,
+            metavar="SECONDS",
+            help=(
+                "First mark running jobs without progress for this long as "
+                "failed, e.g. after the process running them was restarted."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["fail_stalled"] is not None:
+            cutoff = timezone.now() - timedelta(seconds=options["fail_stalled"])
+            stalled = IngestionJob.objects.filter(
+                status=IngestionJob.RUNNING, updated_at__lt=cutoff
+            ).update(
+                status=IngestionJob.ERROR,
+                message="Job stalled and was marked as failed",
+                finished_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+            if stalled:
+                self.stdout.write(f"Marked {stalled} stalled job(s) as failed")
+
+        ran = job_runner.run_pending()
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} ingestion job(s)"))
+
+        # The jobs' refresh would otherwise wait on a timer that dies with
+        # this process; this also runs one left behind by a crashed process.
+        if order_details_refresher.flush():
+            self.stdout.write("Refreshed mv_order_details")
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            CREATE TABLE IF NOT EXISTS order_monthly_rollup (
+                month date NOT NULL,
+                category varchar(32),
+                delivery_status varchar(31),
+                platform_id integer,
+                state varchar(255),
+                quantity_sold integer NOT NULL DEFAULT 0,
+                revenue double precision NOT NULL DEFAULT 0,
+                order_count integer NOT NULL DEFAULT 0
+            );
+
+            CREATE UNIQUE INDEX IF NOT EXISTS order_monthly_rollup_key
+                ON order_monthly_rollup
+                (month, category, delivery_status, platform_id, state);
+
+            DO $$
+            BEGIN
+                IF to_regclass('orders') IS NOT NULL THEN
+                    INSERT INTO order_monthly_rollup
+                        (month, category, delivery_status, platform_id, state,
+                         quantity_sold, revenue, order_count)
+                    SELECT
+                        date_trunc('month', o.date_of_sale)::date,
+                        p.category,
+                        o.delivery_status,
+                        o.platform_id,
+                        cad.state,
+                        SUM(od.quantity_sold),
+                        SUM(od.selling_price),
+                        COUNT(DISTINCT o.id)
+                    FROM orders o
+                    INNER JOIN order_details od ON o.id = od.order_id
+                    -- One product row per id and platform; 0011 rebuilds
+                    -- the rollup with the newest one.
+                    INNER JOIN (
+                        SELECT DISTINCT ON (id, platform_id)
+                            id, platform_id, category
+                        FROM product
+                        ORDER BY id, platform_id, category
+                    ) p
+                        ON od.product_id = p.id AND p.platform_id = o.platform_id
+                    INNER JOIN customer_address_details cad
+                        ON o.customer_address_details_id = cad.id
+                    GROUP BY 1, 2, 3, 4, 5;
+                END IF;
+            END
+            $$;
+            """,
+            reverse_sql="DROP TABLE IF EXISTS order_monthly_rollup;",
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0001_order_monthly_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterializedViewRefresh',
+            fields=[
+                ('view_name', models.CharField(max_length=63, primary_key=True, serialize=False)),
+                ('requested_at', models.DateTimeField(null=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('refreshed_at', models.DateTimeField(null=True)),
+                ('duration_ms', models.FloatField(null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'db_table': 'materialized_view_refresh',
+            },
+        ),
+    ]
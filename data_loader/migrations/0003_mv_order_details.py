@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0002_materialized_view_refresh'),
+        ('visualizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+            DROP MATERIALIZED VIEW IF EXISTS mv_order_details;
+
+            CREATE MATERIALIZED VIEW mv_order_details AS
+            SELECT
+                od.id AS order_detail_id,
+                o.id AS order_id,
+                o.date_of_sale,
+                o.delivery_status,
+                o.platform_id,
+                od.product_id,
+                od.selling_price,
+                od.quantity_sold,
+                p.category,
+                cad.state
+            FROM orders o
+            INNER JOIN order_details od ON o.id = od.order_id
+            -- One product row per id and platform; 0010 recreates the
+            -- view with the newest one.
+            INNER JOIN (
+                SELECT DISTINCT ON (id, platform_id) id, platform_id, category
+                FROM product
+                ORDER BY id, platform_id, category
+            ) p ON od.product_id = p.id AND p.platform_id = o.platform_id
+            INNER JOIN customer_address_details cad
+                ON o.customer_address_details_id = cad.id
+            WITH DATA;
+
+            -- REFRESH ... CONCURRENTLY requires a unique index on the view.
+            CREATE UNIQUE INDEX mv_order_details_order_detail_id
+                ON mv_order_details (order_detail_id);
+
+            INSERT INTO materialized_view_refresh (view_name, last_error)
+            VALUES ('mv_order_details', '')
+            ON CONFLICT (view_name) DO NOTHING;
+            """,
+            reverse_sql="""
+            DELETE FROM materialized_view_refresh
+            WHERE view_name = 'mv_order_details';
+
+            DROP MATERIALIZED VIEW IF EXISTS mv_order_details;
+            """,
+        ),
+    ]
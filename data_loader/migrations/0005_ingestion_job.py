@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0004_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestionJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('urls', models.JSONField()),
+                ('status', models.CharField(default='queued', max_length=16)),
+                ('message', models.TextField(blank=True, default='')),
+                ('files', models.JSONField(default=list)),
+                ('rows_parsed', models.BigIntegerField(default=0)),
+                ('rows_inserted', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ingestion_job',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ingestion_job_queue')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Indexes on mv_order_details for the chart and summary filters. Every
+# filter is an equality on one column combined with an optional
+# date_of_sale range, so each filter column leads a composite index with
+# date_of_sale second; the planner can BitmapAnd them when several filters
+# are set. Unfiltered date ranges use the date index, whose INCLUDE columns
+# let the aggregates run as index-only scans.
+INDEXES = {
+    "mv_order_details_date_of_sale": (
+        "(date_of_sale) INCLUDE (quantity_sold, selling_price, order_id)"
+    ),
+    "mv_order_details_category_date": "(category, date_of_sale)",
+    "mv_order_details_status_date": "(delivery_status, date_of_sale)",
+    "mv_order_details_platform_date": "(platform_id, date_of_sale)",
+    "mv_order_details_state_date": "(state, date_of_sale)",
+}
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('data_loader', '0005_ingestion_job'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON mv_order_details {columns}",
+            reverse_sql=f"DROP INDEX CONCURRENTLY IF EXISTS {name}",
+        )
+        for name, columns in INDEXES.items()
+    ]
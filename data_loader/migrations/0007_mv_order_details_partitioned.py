@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# Recreates mv_order_details and its indexes (see 0003 and 0006) on top of
+# the partitioned orders and order_details from visualizer 0003. Joining on
+# date_of_sale as well as the order id lets Postgres join the two tables
+# partition by partition.
+MV_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_order_details AS
+SELECT
+    od.id AS order_detail_id,
+    o.id AS order_id,
+    o.date_of_sale,
+    o.delivery_status,
+    o.platform_id,
+    od.product_id,
+    od.selling_price,
+    od.quantity_sold,
+    p.category,
+    cad.state
+FROM orders o
+INNER JOIN order_details od
+    ON o.id = od.order_id AND o.date_of_sale = od.date_of_sale
+-- One product row per id and platform; 0010 recreates the view with the
+-- newest one.
+INNER JOIN (
+    SELECT DISTINCT ON (id, platform_id) id, platform_id, category
+    FROM product
+    ORDER BY id, platform_id, category
+) p ON od.product_id = p.id AND p.platform_id = o.platform_id
+INNER JOIN customer_address_details cad
+    ON o.customer_address_details_id = cad.id
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_order_details_order_detail_id
+    ON mv_order_details (order_detail_id);
+CREATE INDEX IF NOT EXISTS mv_order_details_date_of_sale
+    ON mv_order_details (date_of_sale)
+    INCLUDE (quantity_sold, selling_price, order_id);
+CREATE INDEX IF NOT EXISTS mv_order_details_category_date
+    ON mv_order_details (category, date_of_sale);
+CREATE INDEX IF NOT EXISTS mv_order_details_status_date
+    ON mv_order_details (delivery_status, date_of_sale);
+CREATE INDEX IF NOT EXISTS mv_order_details_platform_date
+    ON mv_order_details (platform_id, date_of_sale);
+CREATE INDEX IF NOT EXISTS mv_order_details_state_date
+    ON mv_order_details (state, date_of_sale);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0006_mv_order_details_indexes'),
+        ('visualizer', '0003_partition_orders'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MV_SQL),
+    ]
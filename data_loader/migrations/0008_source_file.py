@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0007_mv_order_details_partitioned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceFile',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('url', models.TextField()),
+                ('size', models.BigIntegerField()),
+                ('rows', models.BigIntegerField()),
+                ('loaded_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'source_file',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='rows_updated',
+            field=models.JSONField(default=dict),
+        ),
+    ]
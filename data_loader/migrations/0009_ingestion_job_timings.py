@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0008_source_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='timings',
+            field=models.JSONField(default=dict),
+        ),
+    ]
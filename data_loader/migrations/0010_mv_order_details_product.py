@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Recreates mv_order_details (see 0007) joining a single product row per
+# (id, platform_id). product is unique on (id, name, category, platform_id),
+# so a product loaded again under a new name or category gets a second row;
+# joining both listed each of its order lines twice, which duplicated
+# order_detail_id and made every REFRESH ... CONCURRENTLY fail. The newest
+# row, by product_key, gives the category.
+MV_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS mv_order_details;
+
+CREATE MATERIALIZED VIEW mv_order_details AS
+SELECT
+    od.id AS order_detail_id,
+    o.id AS order_id,
+    o.date_of_sale,
+    o.delivery_status,
+    o.platform_id,
+    od.product_id,
+    od.selling_price,
+    od.quantity_sold,
+    p.category,
+    cad.state
+FROM orders o
+INNER JOIN order_details od
+    ON o.id = od.order_id AND o.date_of_sale = od.date_of_sale
+INNER JOIN (
+    SELECT DISTINCT ON (id, platform_id) id, platform_id, category
+    FROM product
+    ORDER BY id, platform_id, product_key DESC
+) p
+    ON od.product_id = p.id AND p.platform_id = o.platform_id
+INNER JOIN customer_address_details cad
+    ON o.customer_address_details_id = cad.id
+WITH DATA;
+
+CREATE UNIQUE INDEX mv_order_details_order_detail_id
+    ON mv_order_details (order_detail_id);
+CREATE INDEX mv_order_details_date_of_sale
+    ON mv_order_details (date_of_sale)
+    INCLUDE (quantity_sold, selling_price, order_id);
+CREATE INDEX mv_order_details_category_date
+    ON mv_order_details (category, date_of_sale);
+CREATE INDEX mv_order_details_status_date
+    ON mv_order_details (delivery_status, date_of_sale);
+CREATE INDEX mv_order_details_platform_date
+    ON mv_order_details (platform_id, date_of_sale);
+CREATE INDEX mv_order_details_state_date
+    ON mv_order_details (state, date_of_sale);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0009_ingestion_job_timings'),
+        ('visualizer', '0005_product_key'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MV_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Rebuilds order_monthly_rollup joining a single product row per
+# (id, platform_id), as mv_order_details does since 0010. Joining every row
+# of a product loaded under several names counted its lines once per name.
+REBUILD_SQL = """
+DELETE FROM order_monthly_rollup;
+INSERT INTO order_monthly_rollup
+    (month, category, delivery_status, platform_id, state,
+     quantity_sold, revenue, order_count)
+SELECT
+    date_trunc('month', o.date_of_sale)::date,
+    p.category,
+    o.delivery_status,
+    o.platform_id,
+    cad.state,
+    SUM(od.quantity_sold),
+    SUM(od.selling_price),
+    COUNT(DISTINCT o.id)
+FROM orders o
+INNER JOIN order_details od
+    ON o.id = od.order_id AND o.date_of_sale = od.date_of_sale
+INNER JOIN (
+    SELECT DISTINCT ON (id, platform_id) id, platform_id, category
+    FROM product
+    ORDER BY id, platform_id, product_key DESC
+) p ON od.product_id = p.id AND p.platform_id = o.platform_id
+INNER JOIN customer_address_details cad ON o.customer_address_details_id = cad.id
+GROUP BY 1, 2, 3, 4, 5;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0010_mv_order_details_product'),
+    ]
+
+    operations = [
+        migrations.RunSQL(REBUILD_SQL, migrations.RunSQL.noop),
+    ]
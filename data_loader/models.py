@@ -1,3 +1,143 @@
-from django.db import models
+import uuid
 
-# Create your models here.
+from django.db import DEFAULT_DB_ALIAS, models
+from django.utils import timezone
+
+
+class MaterializedViewRefresh(models.Model):
+    view_name = models.CharField(max_length=63, primary_key=True)
+    requested_at = models.DateTimeField(null=True)
+    started_at = models.DateTimeField(null=True)
+    refreshed_at = models.DateTimeField(null=True)
+    duration_ms = models.FloatField(null=True)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        app_label = "data_loader"
+        db_table = "materialized_view_refresh"
+
+    def __str__(self):
+        return self.view_name + " " + str(self.refreshed_at)
+
+    @property
+    def pending(self):
+        """Whether a refresh was requested after the last one started."""
+        if self.requested_at is None:
+            return False
+        return self.started_at is None or self.requested_at > self.started_at
+
+
+class DataVersion(models.Model):
+    # Dataset covering the order tables, the rollup and mv_order_details.
+    ORDERS = "orders"
+
+    name = models.CharField(max_length=63, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "data_loader"
+        db_table = "data_version"
+
+    def __str__(self):
+        return self.name + " " + str(self.version)
+
+    @classmethod
+    def current(cls, name, using=None):
+        """Return the current version number of a dataset."""
+        version = (
+            cls.objects.using(using or DEFAULT_DB_ALIAS)
+            .filter(name=name)
+            .values_list("version", flat=True)
+        )
+        return version.first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the version of a dataset after its data changed."""
+        updated = cls.objects.filter(name=name).update(
+            version=models.F("version") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(name=name, defaults={"version": 1})
+
+
+class IngestionJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCESS = "success"
+    PARTIAL = "partial"
+    ERROR = "error"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    urls = models.JSONField()
+    status = models.CharField(max_length=16, default=QUEUED)
+    message = models.TextField(blank=True, default="")
+    # Per-file outcomes, as returned by load_csv_sources.
+    files = models.JSONField(default=list)
+    rows_parsed = models.BigIntegerField(default=0)
+    # New rows per table, e.g. {"orders": 120, "order_details": 480}.
+    rows_inserted = models.JSONField(default=dict)
+    # Existing orders and order lines whose values changed, per table.
+    rows_updated = models.JSONField(default=dict)
+    # Seconds and rows per loader stage, and database queries, e.g.
+    # {"stages": {"parse": {"seconds": 1.2, "rows": 5000}, ...},
+    #  "queries": 40, "query_seconds": 0.8}.
+    timings = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    # Touched on every progress update, so a stalled job can be spotted.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "data_loader"
+        db_table = "ingestion_job"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="ingestion_job_queue"),
+        ]
+
+    def __str__(self):
+        return str(self.id) + " " + self.status
+
+    @property
+    def finished(self):
+        """Whether the job has run to completion, successfully or not."""
+        return self.status in (self.SUCCESS, self.PARTIAL, self.ERROR)
+
+
+class SourceFile(models.Model):
+    # A source export whose rows are all loaded, keyed by the SHA-256 of its
+    # content, so a later upload of the same file is skipped.
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    url = models.TextField()
+    size = models.BigIntegerField()
+    rows = models.BigIntegerField()
+    loaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "data_loader"
+        db_table = "source_file"
+
+    def __str__(self):
+        return self.sha256 + " " + self.url
+
+    @classmethod
+    def is_loaded(cls, sha256, using=None):
+        """Whether a file with this content has already been loaded."""
+        files = cls.objects.using(using or DEFAULT_DB_ALIAS)
+        return files.filter(sha256=sha256).exists()
+
+    @classmethod
+    def record_loaded(cls, outcomes, using=None):
+        """Remember the files ``load_csv_sources`` loaded successfully."""
+        for outcome in outcomes:
+            if outcome["status"] == "success":
+                cls.objects.using(using or DEFAULT_DB_ALIAS).update_or_create(
+                    sha256=outcome["sha256"],
+                    defaults={
+                        "url": outcome["url"],
+                        "size": outcome["size"],
+                        "rows": outcome["records"],
+                    },
+                )
@@ -0,0 +1,145 @@
+"""
+Monthly partitions of ``orders`` and ``order_details``.
+
+Both tables are range-partitioned on ``date_of_sale`` with one partition per
+month, named ``<table>_pYYYY_MM``. The loader creates the partitions a chunk
+needs before writing it. New partitions are created standalone and then
+attached, which only takes a SHARE UPDATE EXCLUSIVE lock on the parent, so
+dashboard reads and other loads are not blocked.
+"""
+
+from datetime import date, timedelta
+
+from django.db import transaction
+
+PARTITIONED_TABLES = ("orders", "order_details")
+
+# Advisory lock key serialising partition creation across loader processes.
+PARTITION_LOCK_ID = 7_210_004
+
+# Months this process has already seen partitions for. Another process can
+# detach one meanwhile; writers then forget the months and try again.
+_known_months = set()
+
+
+class PartitionError(Exception):
+    """Raised when a month's partition cannot be created."""
+
+
+def month_start(day):
+    """Return the first day of the month ``day`` falls in."""
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    """Return the first day of the month after ``month``."""
+    return month_start(month_start(month) + timedelta(days=32))
+
+
+def partition_name(table, month):
+    """Return the name of ``table``'s partition for ``month``."""
+    return f"{table}_p{month:%Y_%m}"
+
+
+def attached_partitions(cursor, table):
+    """Return the names of the partitions currently attached to ``table``."""
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        INNER JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        INNER JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE parent.relname = %s
+        """,
+        [table],
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def ensure_month_partitions(cursor, months):
+    """Create the partitions of every partitioned table for ``months``."""
+    missing = {month_start(month) for month in months} - _known_months
+    if not missing:
+        return
+
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        for table in PARTITIONED_TABLES:
+            attached = attached_partitions(cursor, table)
+            for month in sorted(missing):
+                name = partition_name(table, month)
+                if name in attached:
+                    continue
+                cursor.execute("SELECT to_regclass(%s)", [name])
+                if cursor.fetchone()[0] is not None:
+                    raise PartitionError(
+                        f"{name} exists but is not attached to {table}; it was "
+                        "probably archived. Reattach or drop it before loading "
+                        f"orders for {month:%Y-%m}."
+                    )
+                cursor.execute(
+                    f"CREATE TABLE {name} "
+                    f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+                cursor.execute(
+                    f"ALTER TABLE {table} ATTACH PARTITION {name} "
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [month, next_month(month)],
+                )
+        # Only remember the months once the partitions are committed; a load
+        # that rolls back takes its new partitions with it.
+        transaction.on_commit(
+            lambda: _known_months.update(missing), using=cursor.db.alias
+        )
+
+
+def forget_month_partitions(months):
+    """
+    Forget that ``months`` have partitions, so the next
+    ``ensure_month_partitions`` checks them again.
+    """
+    _known_months.difference_update(month_start(month) for month in months)
+
+
+def is_missing_partition_error(error):
+    """Whether ``error`` is Postgres finding no partition for a row."""
+    return "no partition of relation" in str(error)
+
+
+def analyze_month_partitions(cursor, months):
+    """
+    Update the planner statistics of the partitions for ``months``.
+
+    Analyzing a partition only samples that month, so the cost does not
+    grow with the history kept in the other partitions.
+    """
+    names = [
+        partition_name(table, month_start(month))
+        for table in PARTITIONED_TABLES
+        for month in sorted(months)
+    ]
+    if names:
+        cursor.execute(f"ANALYZE {', '.join(names)}")
+
+
+def detach_month_partitions(cursor, month, drop=False):
+    """
+    Detach (and optionally drop) the partitions for ``month``.
+
+    ``DETACH PARTITION ... CONCURRENTLY`` waits for running queries instead
+    of blocking new ones, so it must run outside a transaction. Detached
+    tables keep their rows and can be archived with ``pg_dump -t``.
+    """
+    # order_details references orders, so it goes first and loses its
+    # foreign key before the orders partition is detached.
+    for table in reversed(PARTITIONED_TABLES):
+        name = partition_name(table, month)
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY")
+        if table == "order_details":
+            cursor.execute(
+                f"ALTER TABLE {name} DROP CONSTRAINT IF EXISTS order_details_order_fk"
+            )
+    if drop:
+        for table in reversed(PARTITIONED_TABLES):
+            cursor.execute(f"DROP TABLE {partition_name(table, month)}")
+    _known_months.discard(month)
@@ -0,0 +1,1082 @@
+"""
+Streaming ingestion of order CSV exports.
+
+Each source is parsed ``DATA_LOADER_CHUNK_ROWS`` rows at a time. A chunk is
+normalized and written before the next one is read, so memory is bounded
+by the chunk size and the number of distinct dimension keys, not by the
+size of the upload. Normalization stays columnar: addresses, dates, keys
+and meta_data are derived with vectorized pandas operations, never per row.
+
+With ``DATA_LOADER_PARSE_WORKERS`` set, parsing and normalization move to a
+pool of worker processes: a file is cut into byte blocks of whole records,
+the workers turn each block into a normalized DataFrame, and the blocks
+come back in file order to the single writer of the load.
+
+Loads are idempotent. Every order and order line carries a fingerprint of
+its values (``row_hash``); the writers insert rows whose key is new, update
+rows whose fingerprint changed and leave the rest alone, so re-posting an
+export writes nothing and only the months that really changed are rolled
+up again.
+"""
+
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from psycopg2.extras import execute_values
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader import dimensions
+from ecomm_dashboard.data_loader.partitions import (
+    analyze_month_partitions,
+    ensure_month_partitions,
+    forget_month_partitions,
+    is_missing_partition_error,
+    month_start,
+)
+from ecomm_dashboard.data_loader.rollup import refresh_monthly_rollup
+
+CHUNK_ROWS = getattr(settings, "DATA_LOADER_CHUNK_ROWS", 50_000)
+
+# Size of the byte blocks parse workers get; about CHUNK_ROWS rows of a
+# typical export.
+PARSE_BLOCK_BYTES = getattr(settings, "DATA_LOADER_PARSE_BLOCK_BYTES", 8 * 1024 * 1024)
+
+# Loads that insert or update at least this many orders and order lines
+# analyze the partitions of the months they touched before the rollup is
+# refreshed; smaller loads are left to autovacuum.
+ANALYZE_MIN_ROWS = getattr(settings, "DATA_LOADER_ANALYZE_MIN_ROWS", 100_000)
+
+# Database alias for loads, view refreshes and maintenance, kept apart from
+# the connections serving dashboard reads.
+LOADER_DB = getattr(settings, "DATA_LOADER_DATABASE", DEFAULT_DB_ALIAS)
+
+# CSV header -> normalized column, for the text and numeric columns.
+TEXT_COLUMNS = {
+    "Platform": "platform",
+    "ProductID": "product_id",
+    "ProductName": "product_name",
+    "Category": "category",
+    "CustomerID": "customer_id",
+    "CustomerName": "customer_name",
+    "ContactEmail": "contact_email",
+    "OrderID": "order_id",
+    "DeliveryStatus": "delivery_status",
+}
+NUMERIC_COLUMNS = {
+    "SellingPrice": "selling_price",
+    "QuantitySold": "quantity_sold",
+}
+DATE_COLUMNS = {
+    "DateOfSale": "date_of_sale",
+    "DeliveryDate": "delivery_date",
+}
+DATE_FORMAT = "%Y-%m-%d"
+
+# CSV header -> key in orders.meta_data.
+META_COLUMNS = {
+    "CouponUsed": "coupon_used",
+    "ReturnWindow": "return_window",
+    "PrimeDelivery": "prime_delivery",
+    "WarehouseLocation": "warehouse_location",
+    "ResellerName": "reseller_name",
+    "CommissionPercentage": "commission_percentage",
+    "PhoneNumber": "phone_number",
+}
+
+# Read ids and other text as strings, so "0042" or a column of numeric ids
+# with gaps is not turned into numbers. meta_data values are read as text
+# too and typed by meta_json, so they do not depend on the rest of a chunk.
+TEXT_DTYPES = dict.fromkeys([*TEXT_COLUMNS, "DeliveryAddress", *META_COLUMNS], str)
+
+# Text pandas would read as a boolean -> its JSON.
+BOOLEAN_JSON = {
+    "True": "true",
+    "TRUE": "true",
+    "true": "true",
+    "False": "false",
+    "FALSE": "false",
+    "false": "false",
+}
+
+STAGE_TABLE = "stage_order_lines"
+STAGE_COLUMNS = (
+    "platform",
+    "product_id",
+    "product_name",
+    "category",
+    "customer_id",
+    "customer_name",
+    "contact_email",
+    "address_id",
+    "street",
+    "city",
+    "state",
+    "order_id",
+    "date_of_sale",
+    "delivery_date",
+    "delivery_status",
+    "meta_data",
+    "selling_price",
+    "quantity_sold",
+)
+
+# Natural key of order_details: one line per product and order.
+LINE_KEY = ["order_id", "date_of_sale", "product_id"]
+
+# Columns whose values make up the fingerprints stored in row_hash.
+ORDER_FINGERPRINT_COLUMNS = [
+    "customer_id",
+    "address_id",
+    "platform",
+    "delivery_date",
+    "delivery_status",
+    "meta_data",
+]
+LINE_FINGERPRINT_COLUMNS = ["selling_price", "quantity_sold"]
+FINGERPRINT_COLUMNS = ("order_hash", "line_hash")
+
+# Normalized columns the dimension rows are built from.
+DIMENSION_COLUMNS = [
+    "product_id",
+    "product_name",
+    "category",
+    "customer_id",
+    "customer_name",
+    "contact_email",
+    "address_id",
+    "street",
+    "city",
+    "state",
+]
+
+
+class CsvReadError(Exception):
+    """Raised when a source CSV cannot be downloaded or parsed."""
+
+
+def iter_csv_chunks(stream, chunksize=CHUNK_ROWS):
+    """Yield DataFrames of at most ``chunksize`` rows parsed from ``stream``."""
+    try:
+        with pd.read_csv(stream, chunksize=chunksize, dtype=TEXT_DTYPES) as reader:
+            yield from reader
+    except Exception as e:
+        raise CsvReadError(str(e)) from e
+
+
+def iter_csv_blocks(stream, block_bytes=PARSE_BLOCK_BYTES):
+    """
+    Yield ``(header, block)`` pairs splitting a binary CSV ``stream`` into
+    blocks of whole records of about ``block_bytes`` each.
+
+    A block only ends at a line break outside quotes, so a quoted field
+    spanning several lines stays in one block.
+    """
+    header = stream.readline()
+    if not header:
+        raise CsvReadError("No columns to parse from file")
+
+    while block := stream.read(block_bytes):
+        quotes = block.count(b'"')
+        while not block.endswith(b"\n") or quotes % 2:
+            line = stream.readline()
+            if not line:
+                break
+            block += line
+            quotes += line.count(b'"')
+        yield header, block
+
+
+def parse_csv_block(header, block):
+    """Parse and normalize one block from ``iter_csv_blocks``."""
+    try:
+        chunk = pd.read_csv(io.BytesIO(header + block), dtype=TEXT_DTYPES)
+    except Exception as e:
+        raise CsvReadError(str(e)) from e
+    return normalize_chunk(chunk)
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def parse_pool():
+    """
+    Return this process's pool of DATA_LOADER_PARSE_WORKERS parse workers,
+    started on first use, or None when parsing happens in the loading thread.
+    """
+    global _parse_pool
+    workers = getattr(settings, "DATA_LOADER_PARSE_WORKERS", 0)
+    if workers < 1:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Spawned rather than forked: the loader runs on threads of a
+            # process holding open database connections.
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _parse_pool
+
+
+def iter_normalized_chunks(
+    stream, pool=None, window=None, block_bytes=PARSE_BLOCK_BYTES
+):
+    """
+    Yield the normalized chunks of a binary CSV ``stream`` in file order.
+
+    Without a ``pool``, chunks of CHUNK_ROWS rows are parsed in this thread.
+    With one, blocks from ``iter_csv_blocks`` are parsed by its workers with
+    up to ``window`` blocks (twice DATA_LOADER_PARSE_WORKERS by default) in
+    flight, which bounds memory while the writer catches up.
+    """
+    if pool is None:
+        for chunk in iter_csv_chunks(stream):
+            yield normalize_chunk(chunk)
+        return
+
+    window = window or 2 * getattr(settings, "DATA_LOADER_PARSE_WORKERS", 1)
+    pending = deque()
+    try:
+        for header, block in iter_csv_blocks(stream, block_bytes):
+            pending.append(pool.submit(parse_csv_block, header, block))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def normalize_chunk(chunk):
+    """
+    Convert a parsed chunk into a frame with one column per STAGE_COLUMNS.
+
+    Columns missing from the export come out as nulls. Raises CsvReadError
+    for dates that do not match DATE_FORMAT.
+    """
+    frame = pd.DataFrame(index=chunk.index)
+    for source, column in TEXT_COLUMNS.items():
+        frame[column] = source_column(chunk, source).astype(object)
+    # Always float64: pd.to_numeric picks int64 or float64 by the other rows
+    # of the chunk, and the fingerprints must not depend on them.
+    for source, column in NUMERIC_COLUMNS.items():
+        frame[column] = pd.to_numeric(source_column(chunk, source)).astype("float64")
+    try:
+        for source, column in DATE_COLUMNS.items():
+            frame[column] = pd.to_datetime(
+                source_column(chunk, source), format=DATE_FORMAT
+            )
+    except ValueError as e:
+        raise CsvReadError(str(e)) from e
+
+    address = split_delivery_addresses(
+        source_column(chunk, "DeliveryAddress").astype(object),
+        frame["customer_id"],
+    )
+    frame = frame.join(address)
+    frame["meta_data"] = order_meta_data(chunk)
+    return frame[list(STAGE_COLUMNS)]
+
+
+def source_column(chunk, name):
+    """Return column ``name`` of a parsed chunk, all null if it is missing."""
+    if name in chunk:
+        return chunk[name]
+    return pd.Series(None, index=chunk.index, dtype=object)
+
+
+def map_distinct(values, func):
+    """
+    Apply ``func`` to the distinct non-null ``values`` only and broadcast its
+    Series or DataFrame result back to every row; nulls map to nulls.
+    """
+    codes, uniques = pd.factorize(values)
+    result = func(pd.Series(uniques, dtype=object))
+    # factorize codes nulls as -1, which reindexes to an all-null row.
+    return result.reindex(codes).set_axis(values.index)
+
+
+def split_address_parts(addresses):
+    """Split "street, City-x, State-y" into street, city and state columns."""
+    parts = addresses.str.split(", ", n=2, expand=True, regex=False)
+    parts = parts.reindex(columns=[0, 1, 2]).astype(object)
+    return pd.DataFrame(
+        {
+            "street": parts[0],
+            "city": parts[1].str.replace("City-", "", regex=False),
+            "state": parts[2].str.replace("State-", "", regex=False),
+        }
+    )
+
+
+def split_delivery_addresses(addresses, customer_ids):
+    """
+    Return address_id, street, city and state columns for DeliveryAddress
+    values. Rows without an address or customer get nulls.
+    """
+    # Customers reuse their addresses, so split each distinct one only once.
+    address = map_distinct(addresses, split_address_parts)
+    address.insert(
+        0,
+        "address_id",
+        "ADDR-" + customer_ids + "-" + address["city"] + "-" + address["state"],
+    )
+    return address.where(address["address_id"].notna())
+
+
+def meta_json(value):
+    """
+    Return the JSON of one meta_data value read as text: booleans and
+    numbers as such, integral numbers as integers, anything else as a string.
+    """
+    text = str(value)
+    if text in BOOLEAN_JSON:
+        return BOOLEAN_JSON[text]
+    if "_" not in text:
+        try:
+            return json.dumps(int(text))
+        except ValueError:
+            pass
+        try:
+            number = float(text)
+        except ValueError:
+            number = None
+        if number is not None and math.isfinite(number):
+            return json.dumps(int(number) if number.is_integer() else number)
+    return json.dumps(text)
+
+
+def order_meta_data(chunk):
+    """Serialize the optional per-order attributes stored in orders.meta_data."""
+    fields = [
+        f'"{key}": '
+        + map_distinct(
+            source_column(chunk, source), lambda values: values.map(meta_json)
+        ).fillna("null")
+        for source, key in META_COLUMNS.items()
+    ]
+    return "{" + fields[0].str.cat(fields[1:], sep=", ") + "}"
+
+
+def sale_months(frame):
+    """Return the first day of every month a normalized chunk has sales in."""
+    months = frame["date_of_sale"].dropna().dt.to_period("M").unique()
+    return {month.start_time.date() for month in months}
+
+
+def fingerprint_text(column):
+    """
+    Helper function to encode a column as text for ``row_fingerprints``:
+    dates as ISO dates, numbers as the repr of their float value, nulls as
+    NUL and anything else as its string.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        text = column.dt.strftime("%Y-%m-%d")
+    elif pd.api.types.is_numeric_dtype(column):
+        text = column.astype("float64").map(repr)
+    else:
+        text = column.astype(str)
+    return text.where(column.notna(), "\x00")
+
+
+def row_fingerprints(frame, columns):
+    """
+    Return a signed 64-bit hash of ``columns`` for every row of ``frame``.
+
+    Fingerprints are stored, so they must not change between releases: the
+    rows are hashed with BLAKE2b from their text encoding rather than with
+    pandas' own hashing, which is not guaranteed to be stable across
+    versions.
+    """
+    rows = fingerprint_text(frame[columns[0]]).str.cat(
+        [fingerprint_text(frame[column]) for column in columns[1:]], sep="\x1f"
+    )
+    return pd.Series(
+        [
+            int.from_bytes(
+                hashlib.blake2b(row.encode(), digest_size=8).digest(),
+                "big",
+                signed=True,
+            )
+            for row in rows
+        ],
+        index=frame.index,
+        dtype="int64",
+    )
+
+
+def fingerprint_chunk(frame):
+    """
+    Add the order_hash and line_hash fingerprints to a normalized chunk.
+
+    order_details holds one line per order and product, and a later line
+    for the same key replaces the earlier one, whether it comes later in
+    the chunk, in a later chunk or in a later file. Within a chunk only the
+    last line is kept, as an upsert can only write each key once per
+    statement.
+    """
+    lines = frame["order_id"].notna() & frame["product_id"].notna()
+    frame = frame[~(lines & frame.duplicated(LINE_KEY, keep="last"))]
+
+    return frame.assign(
+        order_hash=row_fingerprints(frame, ORDER_FINGERPRINT_COLUMNS),
+        line_hash=row_fingerprints(frame, LINE_FINGERPRINT_COLUMNS),
+    )
+
+
+def require_platforms(frame):
+    """
+    Raise CsvReadError if a line of a normalized chunk has no platform.
+
+    orders, product and customer all need a platform_id, so such lines
+    cannot be written; both engines refuse the chunk rather than write part
+    of it.
+    """
+    missing = frame["platform"].isna()
+    if missing.any():
+        raise CsvReadError(
+            f"{missing.sum()} line(s) have no Platform, e.g. order "
+            f"{frame.loc[missing, 'order_id'].iloc[0]}"
+        )
+
+
+def rows_of(frame, columns, required, unique=None, cache=None, distinct=True):
+    """
+    Return ``columns`` of ``frame`` as tuples for execute_values.
+
+    Rows with a null ``required`` column are dropped, and so are duplicate
+    rows unless ``distinct`` is false. With ``unique`` (a column or a list of
+    columns), only the last row per value is kept, as later lines of an
+    export win, and with ``cache`` (a DimensionKeyCache of ``unique``
+    values) cached values are skipped.
+    """
+    rows = frame.loc[frame[required].notna(), columns]
+    if unique is not None:
+        rows = rows.drop_duplicates(subset=unique, keep="last")
+        if cache is not None:
+            _, missing = cache.lookup(rows[unique].tolist())
+            rows = rows[rows[unique].isin(missing)]
+    elif distinct:
+        rows = rows.drop_duplicates()
+    return list(rows.itertuples(index=False, name=None))
+
+
+class OrderBatchWriter:
+    """
+    Writes normalized chunks to the order tables.
+
+    Dimension keys known to exist, from an earlier chunk or an earlier load
+    in this process, are looked up in the ``dimensions`` caches and not
+    inserted again; keys the caches miss are looked up in the database
+    before they are inserted. Orders and order lines are compared with the stored
+    fingerprints first, so only new rows are inserted and only changed rows
+    updated. The months of those rows are collected so the rollup is
+    refreshed once in ``finish``. ``inserted_rows`` and ``updated_rows``
+    count the rows each table actually gained and changed. Each chunk is
+    written in its own transaction, retried once if a month partition it
+    needs was detached by another process meanwhile.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.rollup_months = set()
+        self.record_count = 0
+        self.inserted_rows = Counter()
+        self.updated_rows = Counter()
+
+    def insert_values(self, table, sql, values):
+        """Insert ``values`` in one multi-row statement and count the new rows."""
+        if not values:
+            return
+        execute_values(self.cursor, sql, values, page_size=len(values))
+        self.inserted_rows[table] += self.cursor.rowcount
+
+    def update_values(self, table, sql, values, template):
+        """Update rows from ``values`` in one statement and count them."""
+        if not values:
+            return
+        execute_values(self.cursor, sql, values, template, page_size=len(values))
+        self.updated_rows[table] += self.cursor.rowcount
+
+    def split_by_fingerprint(self, table, key_columns, rows):
+        """
+        Split ``rows`` into new rows and rows whose stored fingerprint differs.
+
+        Each row starts with the ``key_columns`` values and ends with its
+        fingerprint. Rows stored with the same fingerprint are dropped.
+        """
+        if not rows:
+            return [], []
+
+        size = len(key_columns)
+        keys = [list(column) for column in zip(*(row[:size] for row in rows))]
+        self.cursor.execute(
+            f"""
+            SELECT {", ".join(key_columns)}, row_hash FROM {table}
+            WHERE ({", ".join(key_columns)}) IN (
+                SELECT * FROM unnest({", ".join(["%s"] * size)})
+            )
+            """,
+            keys,
+        )
+        stored = {tuple(row[:size]): row[size] for row in self.cursor.fetchall()}
+
+        new_rows, changed_rows = [], []
+        for row in rows:
+            key = row[:size]
+            if key not in stored:
+                new_rows.append(row)
+            elif stored[key] != row[-1]:
+                changed_rows.append(row)
+        return new_rows, changed_rows
+
+    def write_platforms(self, frame):
+        """
+        Insert the platforms of a chunk that are not cached, and return the
+        name -> id map of all its platforms.
+        """
+        platform_map, platforms = dimensions.platform_ids.lookup(
+            frame["platform"].dropna().unique().tolist()
+        )
+        if platforms:
+            # Get platform mapping, and insert the platforms not in it yet
+            self.cursor.execute(
+                "SELECT name, id FROM platform WHERE name = ANY(%s)", [platforms]
+            )
+            new_platforms = dict(self.cursor.fetchall())
+            missing = [name for name in platforms if name not in new_platforms]
+            self.insert_values(
+                "platform",
+                "INSERT INTO platform (name) VALUES %s ON CONFLICT (name) DO NOTHING",
+                [(name,) for name in missing],
+            )
+            if missing:
+                self.cursor.execute(
+                    "SELECT name, id FROM platform WHERE name = ANY(%s)", [missing]
+                )
+                new_platforms.update(self.cursor.fetchall())
+            dimensions.platform_ids.update_on_commit(
+                new_platforms, using=self.cursor.db.alias
+            )
+            platform_map.update(new_platforms)
+        return platform_map
+
+    def drop_stored_rows(self, table, key_columns, rows, cache):
+        """
+        Drop the ``rows`` whose key, their leading ``key_columns`` values, is
+        already stored in ``table``, e.g. by another process, and cache those
+        keys in ``cache`` once the transaction commits.
+        """
+        if not rows:
+            return rows
+
+        size = len(key_columns)
+        keys = [list(column) for column in zip(*(row[:size] for row in rows))]
+        self.cursor.execute(
+            f"""
+            SELECT {", ".join(key_columns)} FROM {table}
+            WHERE ({", ".join(key_columns)}) IN (
+                SELECT * FROM unnest({", ".join(["%s"] * size)})
+            )
+            """,
+            keys,
+        )
+        stored = set(self.cursor.fetchall())
+        cache.update_on_commit(
+            dict.fromkeys(key[0] if size == 1 else key for key in stored),
+            using=self.cursor.db.alias,
+        )
+        return [row for row in rows if row[:size] not in stored]
+
+    def new_dimension_rows(self, frame):
+        """
+        Return the product, customer and address rows of a chunk whose keys
+        are neither cached nor stored. ``frame`` needs platform_id and
+        pincode columns and None for nulls.
+        """
+        products = rows_of(
+            frame,
+            ["product_id", "product_name", "category", "platform_id"],
+            required="product_id",
+        )
+        _, products = dimensions.product_keys.lookup(products)
+        customers = rows_of(
+            frame,
+            ["customer_id", "customer_name", "contact_email", "platform_id"],
+            required="customer_id",
+            unique="customer_id",
+            cache=dimensions.customer_keys,
+        )
+        addresses = rows_of(
+            frame,
+            ["address_id", "street", "city", "state", "pincode", "customer_id"],
+            required="address_id",
+            unique="address_id",
+            cache=dimensions.address_keys,
+        )
+        # Keys written by other processes are missing from this process's
+        # caches; looking them up is cheaper than inserting them again.
+        products = self.drop_stored_rows(
+            "product",
+            ["id", "name", "category", "platform_id"],
+            products,
+            dimensions.product_keys,
+        )
+        customers = self.drop_stored_rows(
+            "customer", ["id"], customers, dimensions.customer_keys
+        )
+        addresses = self.drop_stored_rows(
+            "customer_address_details", ["id"], addresses, dimensions.address_keys
+        )
+        return products, customers, addresses
+
+    def cache_dimension_rows(self, products, customers, addresses):
+        """Cache the keys of written dimension rows once they commit."""
+        using = self.cursor.db.alias
+        dimensions.product_keys.update_on_commit(dict.fromkeys(products), using)
+        dimensions.customer_keys.update_on_commit(
+            dict.fromkeys(row[0] for row in customers), using
+        )
+        dimensions.address_keys.update_on_commit(
+            dict.fromkeys(row[0] for row in addresses), using
+        )
+
+    def write(self, frame):
+        """Insert or update one normalized chunk."""
+        require_platforms(frame)
+        self.record_count += len(frame)
+        frame = fingerprint_chunk(frame)
+        months = sale_months(frame)
+        ensure_month_partitions(self.cursor, months)
+
+        # One transaction per chunk, so a failed chunk leaves no partial
+        # orders behind and the chunks written before it stay committed.
+        counts = (self.inserted_rows.copy(), self.updated_rows.copy())
+        rollup_months = set(self.rollup_months)
+        try:
+            with transaction.atomic(using=self.cursor.db.alias):
+                self.write_chunk(frame)
+        except IntegrityError as e:
+            if not is_missing_partition_error(e):
+                raise
+            # Another process detached a month this one had created or
+            # seen; find out which and retry the rolled back chunk once.
+            self.inserted_rows, self.updated_rows = counts
+            self.rollup_months = rollup_months
+            forget_month_partitions(months)
+            ensure_month_partitions(self.cursor, months)
+            with transaction.atomic(using=self.cursor.db.alias):
+                self.write_chunk(frame)
+
+    def write_chunk(self, frame):
+        """Write one fingerprinted chunk, inside its transaction."""
+        rows = len(frame)
+        with instrumentation.stage("dimensions", rows):
+            frame = self.write_dimensions(frame)
+        with instrumentation.stage("orders", rows):
+            self.write_orders(frame)
+
+    def write_dimensions(self, frame):
+        """
+        Insert the platforms, products, customers and addresses of a chunk
+        not known to exist, and return the chunk with platform ids and None
+        for nulls.
+        """
+        platform_map = self.write_platforms(frame)
+        frame = frame.assign(
+            platform_id=frame["platform"].map(platform_map).astype("Int64"),
+            pincode=0,
+            date_of_sale=frame["date_of_sale"].dt.date,
+            delivery_date=frame["delivery_date"].dt.date,
+        )
+        # psycopg2 sends None as NULL; pandas' NA and NaN would not adapt.
+        frame = frame.astype(object).where(frame.notna(), None)
+
+        # Insert products, customers and addresses not known to exist
+        products, customers, addresses = self.new_dimension_rows(frame)
+        self.insert_values(
+            "product",
+            """
+            INSERT INTO product (id, name, category, platform_id)
+            VALUES %s
+            ON CONFLICT (id, name, category, platform_id) DO NOTHING
+            """,
+            products,
+        )
+        self.insert_values(
+            "customer",
+            """
+            INSERT INTO customer (id, name, contact_email, platform_id)
+            VALUES %s ON CONFLICT (id) DO NOTHING
+            """,
+            customers,
+        )
+        self.insert_values(
+            "customer_address_details",
+            """
+            INSERT INTO customer_address_details
+            (id, street, city, state, pincode, customer_id)
+            VALUES %s ON CONFLICT (id) DO NOTHING
+            """,
+            addresses,
+        )
+        self.cache_dimension_rows(products, customers, addresses)
+        return frame
+
+    def write_orders(self, frame):
+        """Insert new orders and order lines and update changed ones."""
+        order_values = rows_of(
+            frame,
+            [
+                "order_id",
+                "date_of_sale",
+                "customer_id",
+                "address_id",
+                "platform_id",
+                "delivery_date",
+                "delivery_status",
+                "meta_data",
+                "order_hash",
+            ],
+            required="order_id",
+            unique=["order_id", "date_of_sale"],
+        )
+        new_orders, changed_orders = self.split_by_fingerprint(
+            "orders", ["id", "date_of_sale"], order_values
+        )
+        self.insert_values(
+            "orders",
+            """
+            INSERT INTO orders
+            (id, date_of_sale, customer_id, customer_address_details_id,
+             platform_id, delivery_date, delivery_status, meta_data, row_hash)
+            VALUES %s ON CONFLICT (id, date_of_sale) DO NOTHING
+            """,
+            new_orders,
+        )
+        self.update_values(
+            "orders",
+            """
+            UPDATE orders SET
+                customer_id = v.customer_id,
+                customer_address_details_id = v.address_id,
+                platform_id = v.platform_id,
+                delivery_date = v.delivery_date,
+                delivery_status = v.delivery_status,
+                meta_data = v.meta_data,
+                row_hash = v.row_hash
+            FROM (VALUES %s) AS v
+                (id, date_of_sale, customer_id, address_id, platform_id,
+                 delivery_date, delivery_status, meta_data, row_hash)
+            WHERE orders.id = v.id AND orders.date_of_sale = v.date_of_sale
+            """,
+            changed_orders,
+            "(%s, %s::date, %s, %s, %s::integer, %s::date, %s, %s::jsonb, %s::bigint)",
+        )
+
+        # Insert new order details and update changed ones
+        line_values = rows_of(
+            frame[frame["product_id"].notna()],
+            [*LINE_KEY, "selling_price", "quantity_sold", "line_hash"],
+            required="order_id",
+            unique=LINE_KEY,
+        )
+        new_lines, changed_lines = self.split_by_fingerprint(
+            "order_details", LINE_KEY, line_values
+        )
+        self.insert_values(
+            "order_details",
+            """
+            INSERT INTO order_details
+            (order_id, date_of_sale, product_id, selling_price, quantity_sold,
+             row_hash)
+            VALUES %s
+            ON CONFLICT (order_id, date_of_sale, product_id) DO NOTHING
+            """,
+            new_lines,
+        )
+        self.update_values(
+            "order_details",
+            """
+            UPDATE order_details SET
+                selling_price = v.selling_price,
+                quantity_sold = v.quantity_sold,
+                row_hash = v.row_hash
+            FROM (VALUES %s) AS v
+                (order_id, date_of_sale, product_id, selling_price,
+                 quantity_sold, row_hash)
+            WHERE order_details.order_id = v.order_id
+              AND order_details.date_of_sale = v.date_of_sale
+              AND order_details.product_id = v.product_id
+            """,
+            changed_lines,
+            "(%s, %s::date, %s, %s::double precision, %s::integer, %s::bigint)",
+        )
+
+        for rows in (new_orders, changed_orders, new_lines, changed_lines):
+            self.rollup_months |= {month_start(row[1]) for row in rows}
+
+    def finish(self):
+        """Update the monthly rollup for every month the load touched."""
+        changed = sum(
+            counter[table]
+            for counter in (self.inserted_rows, self.updated_rows)
+            for table in ("orders", "order_details")
+        )
+        if self.rollup_months and changed >= ANALYZE_MIN_ROWS:
+            # A large load can grow a month many times over before autovacuum
+            # notices; stale statistics turn the rollup joins into nested
+            # loops.
+            with instrumentation.stage("analyze"):
+                analyze_month_partitions(self.cursor, self.rollup_months)
+        with instrumentation.stage("rollup"):
+            refresh_monthly_rollup(self.cursor, self.rollup_months)
+
+
+class CopyOrderBatchWriter(OrderBatchWriter):
+    """
+    Writes chunks by COPYing them into a staging table and merging from there.
+
+    Each chunk is streamed with ``COPY ... FROM STDIN`` from an in-memory CSV
+    buffer into a session temp table, then merged into every order table
+    with set-based ``INSERT ... SELECT ... ON CONFLICT`` statements, all in
+    one transaction per chunk. Dimension merges are limited to the keys
+    missing from the ``dimensions`` caches, and skipped when there are none.
+    Orders and order lines whose fingerprint changed are updated with
+    ``UPDATE ... FROM`` before the new ones are inserted.
+    """
+
+    def __init__(self, cursor):
+        super().__init__(cursor)
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (
+                platform text,
+                product_id text,
+                product_name text,
+                category text,
+                customer_id text,
+                customer_name text,
+                contact_email text,
+                address_id text,
+                street text,
+                city text,
+                state text,
+                order_id text,
+                date_of_sale date,
+                delivery_date date,
+                delivery_status text,
+                meta_data jsonb,
+                selling_price double precision,
+                quantity_sold double precision,
+                order_hash bigint,
+                line_hash bigint,
+                seq integer
+            ) ON COMMIT DELETE ROWS
+            """
+        )
+
+    def write_chunk(self, frame):
+        """Stage and merge one fingerprinted chunk, inside its transaction."""
+        rows = len(frame)
+        with instrumentation.stage("staging", rows):
+            # seq numbers the lines, so merges can keep the last line of an
+            # order or dimension key like the insert engine does.
+            buffer = io.StringIO()
+            frame.assign(seq=range(len(frame))).to_csv(
+                buffer, header=False, index=False, date_format=DATE_FORMAT
+            )
+            buffer.seek(0)
+            self.cursor.execute(f"TRUNCATE {STAGE_TABLE}")
+            self.cursor.copy_expert(
+                f"COPY {STAGE_TABLE} "
+                f"({', '.join([*STAGE_COLUMNS, *FINGERPRINT_COLUMNS])}, seq) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+        with instrumentation.stage("dimensions", rows):
+            platform_map = self.write_platforms(frame)
+            keys = frame[DIMENSION_COLUMNS].assign(
+                platform_id=frame["platform"].map(platform_map).astype("Int64"),
+                pincode=0,
+            )
+            new_rows = self.new_dimension_rows(
+                keys.astype(object).where(keys.notna(), None)
+            )
+            self.merge_dimensions(*new_rows)
+
+        with instrumentation.stage("orders", rows):
+            self.merge_orders()
+        self.cache_dimension_rows(*new_rows)
+
+    def merge(self, table, sql, keys):
+        """
+        Run one merge statement for the staged rows with the given ``keys``
+        and count the rows it added to ``table``.
+        """
+        if not keys:
+            return
+        self.cursor.execute(sql, [sorted(keys)])
+        self.inserted_rows[table] += self.cursor.rowcount
+
+    def merge_changes(self, counter, table, sql):
+        """
+        Run an INSERT or UPDATE returning ``date_of_sale``, count its rows in
+        ``counter`` and collect the months they fall into.
+        """
+        self.cursor.execute(
+            f"""
+            WITH changed AS ({sql})
+            SELECT date_trunc('month', date_of_sale)::date, count(*)
+            FROM changed GROUP BY 1
+            """
+        )
+        for month, count in self.cursor.fetchall():
+            counter[table] += count
+            self.rollup_months.add(month)
+
+    def merge_dimensions(self, products, customers, addresses):
+        """
+        Merge the staged chunk into the dimension tables for the given
+        product, customer and address rows.
+        """
+        self.merge(
+            "product",
+            f"""
+            INSERT INTO product (id, name, category, platform_id)
+            SELECT DISTINCT s.product_id, s.product_name, s.category, pl.id
+            FROM {STAGE_TABLE} s
+            INNER JOIN platform pl ON pl.name = s.platform
+            WHERE s.product_id = ANY(%s)
+            ON CONFLICT (id, name, category, platform_id) DO NOTHING
+            """,
+            {product[0] for product in products},
+        )
+        self.merge(
+            "customer",
+            f"""
+            INSERT INTO customer (id, name, contact_email, platform_id)
+            SELECT DISTINCT ON (s.customer_id)
+                s.customer_id, s.customer_name, s.contact_email, pl.id
+            FROM {STAGE_TABLE} s
+            INNER JOIN platform pl ON pl.name = s.platform
+            WHERE s.customer_id = ANY(%s)
+            ORDER BY s.customer_id, s.seq DESC
+            ON CONFLICT (id) DO NOTHING
+            """,
+            {customer[0] for customer in customers},
+        )
+        self.merge(
+            "customer_address_details",
+            f"""
+            INSERT INTO customer_address_details
+            (id, street, city, state, pincode, customer_id)
+            SELECT DISTINCT ON (address_id)
+                address_id, street, city, state, 0, customer_id
+            FROM {STAGE_TABLE}
+            WHERE address_id = ANY(%s)
+            ORDER BY address_id, seq DESC
+            ON CONFLICT (id) DO NOTHING
+            """,
+            {address[0] for address in addresses},
+        )
+
+    def merge_orders(self):
+        """Merge the staged chunk into orders and order_details."""
+        staged_orders = f"""
+            SELECT DISTINCT ON (s.order_id, s.date_of_sale) s.*, pl.id AS platform_id
+            FROM {STAGE_TABLE} s
+            LEFT JOIN platform pl ON pl.name = s.platform
+            WHERE s.order_id IS NOT NULL
+            ORDER BY s.order_id, s.date_of_sale, s.seq DESC
+        """
+        self.merge_changes(
+            self.updated_rows,
+            "orders",
+            f"""
+            UPDATE orders o SET
+                customer_id = s.customer_id,
+                customer_address_details_id = s.address_id,
+                platform_id = s.platform_id,
+                delivery_date = s.delivery_date,
+                delivery_status = s.delivery_status,
+                meta_data = s.meta_data,
+                row_hash = s.order_hash
+            FROM ({staged_orders}) s
+            WHERE o.id = s.order_id AND o.date_of_sale = s.date_of_sale
+              AND o.row_hash IS DISTINCT FROM s.order_hash
+            RETURNING o.date_of_sale
+            """,
+        )
+        self.merge_changes(
+            self.inserted_rows,
+            "orders",
+            f"""
+            INSERT INTO orders
+            (id, date_of_sale, customer_id, customer_address_details_id,
+             platform_id, delivery_date, delivery_status, meta_data, row_hash)
+            SELECT order_id, date_of_sale, customer_id, address_id,
+                   platform_id, delivery_date, delivery_status, meta_data,
+                   order_hash
+            FROM ({staged_orders}) s
+            ON CONFLICT (id, date_of_sale) DO NOTHING
+            RETURNING date_of_sale
+            """,
+        )
+        staged_lines = f"""
+            SELECT * FROM {STAGE_TABLE}
+            WHERE order_id IS NOT NULL AND product_id IS NOT NULL
+        """
+        self.merge_changes(
+            self.updated_rows,
+            "order_details",
+            f"""
+            UPDATE order_details od SET
+                selling_price = s.selling_price,
+                quantity_sold = s.quantity_sold::integer,
+                row_hash = s.line_hash
+            FROM ({staged_lines}) s
+            WHERE od.order_id = s.order_id
+              AND od.date_of_sale = s.date_of_sale
+              AND od.product_id = s.product_id
+              AND od.row_hash IS DISTINCT FROM s.line_hash
+            RETURNING od.date_of_sale
+            """,
+        )
+        self.merge_changes(
+            self.inserted_rows,
+            "order_details",
+            f"""
+            INSERT INTO order_details
+            (order_id, date_of_sale, product_id, selling_price, quantity_sold,
+             row_hash)
+            SELECT order_id, date_of_sale, product_id, selling_price,
+                   quantity_sold::integer, line_hash
+            FROM ({staged_lines}) s
+            ON CONFLICT (order_id, date_of_sale, product_id) DO NOTHING
+            RETURNING date_of_sale
+            """,
+        )
+
+
+WRITERS = {
+    "insert": OrderBatchWriter,
+    "copy": CopyOrderBatchWriter,
+}
+
+
+def make_writer(cursor, engine=None):
+    """Create the batch writer for ``engine``, defaulting to DATA_LOADER_ENGINE."""
+    engine = engine or getattr(settings, "DATA_LOADER_ENGINE", "copy")
+    return WRITERS[engine](cursor)
@@ -0,0 +1,183 @@
+"""
+Debounced, coalesced ``REFRESH MATERIALIZED VIEW CONCURRENTLY`` for the views
+the loader maintains.
+
+Uploads only record a refresh request in ``materialized_view_refresh`` and
+return. A background timer waits for back-to-back uploads to settle, then a
+single refresh serves every request made before it started. A session-level
+advisory lock keeps two processes from refreshing the same view at once.
+
+The request itself is stored, so it survives the process that made it: a
+refresh still waiting on its timer is run by ``flush`` when the process
+exits, and one left behind by a crashed process by the next
+``run_ingestion_jobs`` or ``refresh_materialized_views`` run.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader.models import DataVersion, MaterializedViewRefresh
+from ecomm_dashboard.data_loader.pipeline import LOADER_DB
+
+logger = logging.getLogger(__name__)
+
+ORDER_DETAILS_VIEW = "mv_order_details"
+
+# Advisory lock namespace for refreshes; the second key is hashtext(view_name).
+REFRESH_LOCK_ID = 7_210_002
+
+
+class MaterializedViewRefresher:
+    """Schedules and runs concurrent refreshes of one materialized view."""
+
+    def __init__(self, view_name, debounce_seconds, max_delay_seconds):
+        self.view_name = view_name
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._lock = threading.Lock()
+        self._timer = None
+        self._first_request = None
+
+    def request_refresh(self):
+        """Record a refresh request and (re)arm the debounce timer."""
+        updated = MaterializedViewRefresh.objects.filter(
+            view_name=self.view_name
+        ).update(requested_at=timezone.now())
+        if not updated:
+            MaterializedViewRefresh.objects.create(
+                view_name=self.view_name, requested_at=timezone.now()
+            )
+        self._schedule()
+
+    def status(self):
+        """Return the stored refresh state for the view."""
+        state, _ = MaterializedViewRefresh.objects.get_or_create(
+            view_name=self.view_name
+        )
+        return state
+
+    def refresh_if_pending(self, wait=False):
+        """
+        Refresh the view if a request is outstanding.
+
+        Returns True after a refresh, False when nothing was pending and None
+        when another process currently holds the refresh lock. With ``wait``,
+        waits for that process's refresh to finish instead.
+        """
+        with connections[LOADER_DB].cursor() as cursor:
+            if wait:
+                cursor.execute(
+                    "SELECT pg_advisory_lock(%s, hashtext(%s))",
+                    [REFRESH_LOCK_ID, self.view_name],
+                )
+            else:
+                cursor.execute(
+                    "SELECT pg_try_advisory_lock(%s, hashtext(%s))",
+                    [REFRESH_LOCK_ID, self.view_name],
+                )
+                (acquired,) = cursor.fetchone()
+                if not acquired:
+                    return None
+
+            try:
+                state = self.status()
+                if not state.pending:
+                    return False
+
+                rows = MaterializedViewRefresh.objects.filter(view_name=self.view_name)
+                rows.update(started_at=timezone.now())
+                start = time.perf_counter()
+                try:
+                    cursor.execute(
+                        f"REFRESH MATERIALIZED VIEW CONCURRENTLY {self.view_name}"
+                    )
+                except Exception as e:
+                    # Restore started_at so the request stays pending for a retry.
+                    rows.update(started_at=state.started_at, last_error=str(e))
+                    raise
+
+                seconds = time.perf_counter() - start
+                instrumentation.record("view_refresh", seconds)
+                rows.update(
+                    refreshed_at=timezone.now(),
+                    duration_ms=seconds * 1000,
+                    last_error="",
+                )
+                DataVersion.bump(DataVersion.ORDERS)
+                return True
+            finally:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s, hashtext(%s))",
+                    [REFRESH_LOCK_ID, self.view_name],
+                )
+
+    def flush(self):
+        """
+        Run any pending refresh now instead of on the timer, waiting for a
+        refresh running elsewhere, e.g. before the process exits. Returns
+        whether the view was refreshed.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._first_request = None
+        return self.refresh_if_pending(wait=True)
+
+    def flush_at_exit(self):
+        """Flush a refresh this process still has scheduled when it exits."""
+        if self._timer is None:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error refreshing {self.view_name}: {str(e)}")
+
+    def _schedule(self, delay=None):
+        with self._lock:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            if delay is None:
+                # Keep postponing while uploads arrive, but never past max delay.
+                remaining = self._first_request + self.max_delay_seconds - now
+                delay = max(0, min(self.debounce_seconds, remaining))
+
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            self._first_request = None
+
+        refreshed = False
+        try:
+            refreshed = self.refresh_if_pending()
+        except Exception as e:
+            logger.error(f"Error refreshing {self.view_name}: {str(e)}")
+        finally:
+            connections.close_all()
+
+        if refreshed is None:
+            self._schedule(self.debounce_seconds)
+
+
+order_details_refresher = MaterializedViewRefresher(
+    ORDER_DETAILS_VIEW,
+    debounce_seconds=getattr(settings, "MV_REFRESH_DEBOUNCE_SECONDS", 5),
+    max_delay_seconds=getattr(settings, "MV_REFRESH_MAX_DELAY_SECONDS", 60),
+)
+
+# Timers are daemon threads, so run a scheduled refresh before exiting.
+atexit.register(order_details_refresher.flush_at_exit)
@@ -0,0 +1,99 @@
+"""
+Maintenance of ``order_monthly_rollup``.
+
+The rollup holds one row per (month, category, delivery_status, platform_id,
+state) with the summed quantity and revenue and the number of distinct
+orders, so the chart endpoints can answer month-aligned queries without
+scanning every order line.
+"""
+
+from django.db import transaction
+
+from ecomm_dashboard.data_loader.partitions import next_month
+
+# Advisory lock key serialising rollup maintenance across loader processes.
+ROLLUP_LOCK_ID = 7_210_001
+
+# A product loaded again under a new name or category has several rows;
+# join only the newest per (id, platform_id), as mv_order_details does, so
+# its lines are counted once.
+ORDER_LINES = """
+    FROM orders o
+    INNER JOIN order_details od
+        ON o.id = od.order_id AND o.date_of_sale = od.date_of_sale
+    INNER JOIN (
+        SELECT DISTINCT ON (id, platform_id) id, platform_id, category
+        FROM product
+        ORDER BY id, platform_id, product_key DESC
+    ) p ON od.product_id = p.id AND p.platform_id = o.platform_id
+    INNER JOIN customer_address_details cad ON o.customer_address_details_id = cad.id
+"""
+
+ROLLUP_KEY = """
+    date_trunc('month', o.date_of_sale)::date AS month,
+    p.category AS category,
+    o.delivery_status AS delivery_status,
+    o.platform_id AS platform_id,
+    cad.state AS state
+"""
+
+ROLLUP_AGGREGATES = """
+    SUM(od.quantity_sold),
+    SUM(od.selling_price),
+    COUNT(DISTINCT o.id)
+"""
+
+ROLLUP_COLUMNS = """
+    (month, category, delivery_status, platform_id, state,
+     quantity_sold, revenue, order_count)
+"""
+
+
+def refresh_monthly_rollup(cursor, months):
+    """
+    Recompute the rollup rows of the given months from the base tables.
+
+    Whole months are recomputed rather than individual keys: a month's lines
+    are one contiguous range of ``date_of_sale``, which aggregates in a
+    single scan, while matching thousands of five-column keys made the
+    planner fan out the joins.
+    """
+    if not months:
+        return
+
+    months = sorted(months)
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK_ID])
+        cursor.execute(
+            "DELETE FROM order_monthly_rollup WHERE month = ANY(%s::date[])",
+            [months],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO order_monthly_rollup {ROLLUP_COLUMNS}
+            SELECT {ROLLUP_KEY}, {ROLLUP_AGGREGATES}
+            {ORDER_LINES}
+            WHERE o.date_of_sale >= %(first)s
+              AND o.date_of_sale < %(end)s
+              AND od.date_of_sale >= %(first)s
+              AND od.date_of_sale < %(end)s
+              AND date_trunc('month', o.date_of_sale)::date = ANY(%(months)s::date[])
+            GROUP BY 1, 2, 3, 4, 5
+            """,
+            {"first": months[0], "end": next_month(months[-1]), "months": months},
+        )
+
+
+def rebuild_monthly_rollup(cursor):
+    """Rebuild the whole rollup from the base tables."""
+    with transaction.atomic(using=cursor.db.alias):
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK_ID])
+        cursor.execute("DELETE FROM order_monthly_rollup")
+        cursor.execute(
+            f"""
+            INSERT INTO order_monthly_rollup {ROLLUP_COLUMNS}
+            SELECT {ROLLUP_KEY}, {ROLLUP_AGGREGATES}
+            {ORDER_LINES}
+            GROUP BY 1, 2, 3, 4, 5
+            """
+        )
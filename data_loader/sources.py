@@ -0,0 +1,335 @@
+"""
+Source CSVs for the loader: Google Drive links, local files and uploads.
+
+Drive files are fetched by a bounded thread pool over one pooled
+``requests`` session and spooled to temporary files, so the caller can parse
+a finished file while the others are still downloading. Each file gets its
+own timeout and retries with exponential backoff, and failures are reported
+per file instead of aborting the whole upload. Any other source is a path
+under ``DATA_LOADER_FILE_ROOT``, where uploaded files are stored too, and is
+read from disk directly. gzip and zstd-compressed files are decompressed
+while they are parsed. A file whose content was already loaded, by SHA-256,
+is skipped without parsing it.
+"""
+
+import contextvars
+import gzip
+import hashlib
+import io
+import logging
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader.models import SourceFile
+from ecomm_dashboard.data_loader.pipeline import (
+    LOADER_DB,
+    CsvReadError,
+    iter_normalized_chunks,
+    parse_pool,
+)
+
+logger = logging.getLogger(__name__)
+
+# Files smaller than this stay in memory; larger ones roll over to disk.
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Leading bytes of compressed files.
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Errors a corrupt compressed file raises while it is read.
+DECOMPRESSION_ERRORS = (OSError, EOFError)
+if zstandard is not None:
+    DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+# Directory under DATA_LOADER_FILE_ROOT that uploaded files are stored in.
+UPLOAD_DIR = "uploads"
+
+
+def download_setting(name, default):
+    """Helper function to read a DATA_LOADER_DOWNLOAD_* setting"""
+    return getattr(settings, f"DATA_LOADER_DOWNLOAD_{name}", default)
+
+
+def drive_download_url(drive_url):
+    """Turn a Google Drive share link into a direct download URL."""
+    try:
+        google_file_id = drive_url.split("/d/")[1].split("/")[0]
+    except IndexError:
+        raise CsvReadError(f"Not a Google Drive file link: {drive_url}")
+    template = download_setting("URL", "https://drive.google.com/uc?id={file_id}")
+    return template.format(file_id=google_file_id)
+
+
+def download_session(pool_size):
+    """Create a session whose connection pool fits ``pool_size`` workers."""
+    session = requests.Session()
+    session.verify = False
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_to_spool(session, url):
+    """
+    Download ``url`` into a rewound temporary file.
+
+    Connection errors, timeouts and retryable HTTP statuses are retried with
+    exponential backoff; the whole attempt must finish within the per-file
+    timeout. Raises CsvReadError once retries are exhausted.
+    """
+    retries = download_setting("RETRIES", 3)
+    backoff = download_setting("BACKOFF", 1.0)
+    timeout = download_setting("TIMEOUT", 300)
+    connect_timeout = download_setting("CONNECT_TIMEOUT", 10)
+
+    for attempt in range(retries + 1):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        deadline = time.monotonic() + timeout
+        try:
+            with session.get(
+                url, stream=True, timeout=(connect_timeout, timeout)
+            ) as response:
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise requests.HTTPError(
+                        f"{response.status_code} Server Error for url: {url}",
+                        response=response,
+                    )
+                response.raise_for_status()
+                for block in response.iter_content(chunk_size=1024 * 1024):
+                    if time.monotonic() > deadline:
+                        raise requests.Timeout(
+                            f"Download exceeded {timeout} seconds: {url}"
+                        )
+                    spool.write(block)
+            spool.seek(0)
+            return spool
+        except requests.RequestException as e:
+            spool.close()
+            status_code = getattr(e.response, "status_code", None)
+            retryable = status_code is None or status_code in RETRYABLE_STATUS_CODES
+            if not retryable or attempt == retries:
+                raise CsvReadError(str(e)) from e
+            delay = backoff * 2**attempt
+            logger.warning(
+                f"Retrying download of {url} in {delay:.1f}s after error: {str(e)}"
+            )
+            time.sleep(delay)
+
+
+def timed_download(session, url):
+    """Download ``url`` with ``download_to_spool`` as the download stage."""
+    with instrumentation.stage("download"):
+        return download_to_spool(session, url)
+
+
+def iter_downloads(drive_urls, meanwhile=()):
+    """
+    Download every URL concurrently and yield results as they complete.
+
+    Yields ``(drive_url, spool, error)`` tuples where exactly one of ``spool``
+    and ``error`` is set. The caller owns and must close each spool.
+    ``meanwhile`` results, e.g. of files read from disk, are yielded first,
+    once every download has been started.
+    """
+    workers = max(1, min(download_setting("WORKERS", 4), len(drive_urls)))
+    with download_session(workers) as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for drive_url in drive_urls:
+                try:
+                    url = drive_download_url(drive_url)
+                except CsvReadError as e:
+                    yield drive_url, None, e
+                    continue
+                # Each download runs in a copy of the caller's context, so
+                # its stage is recorded with the job's timings.
+                future = executor.submit(
+                    contextvars.copy_context().run, timed_download, session, url
+                )
+                futures[future] = drive_url
+
+            try:
+                yield from meanwhile
+                for future in as_completed(futures):
+                    try:
+                        yield futures[future], future.result(), None
+                    except CsvReadError as e:
+                        yield futures[future], None, e
+            finally:
+                # Stop queued downloads if the caller gives up early.
+                for future in futures:
+                    future.cancel()
+
+
+def file_fingerprint(spool):
+    """Return the SHA-256 hex digest and size of a spool, rewinding it."""
+    digest = hashlib.sha256()
+    size = 0
+    while block := spool.read(1024 * 1024):
+        digest.update(block)
+        size += len(block)
+    spool.seek(0)
+    return digest.hexdigest(), size
+
+
+def is_remote(source):
+    """Whether ``source`` is a URL to download rather than a local file."""
+    return "://" in source
+
+
+def file_root():
+    """Return the resolved DATA_LOADER_FILE_ROOT, or None if it is not set."""
+    root = getattr(settings, "DATA_LOADER_FILE_ROOT", None)
+    return Path(root).resolve() if root else None
+
+
+def local_source_path(source):
+    """
+    Resolve a local source to a file under DATA_LOADER_FILE_ROOT.
+
+    Raises CsvReadError for paths outside the root, including through
+    ``..`` or symlinks, and for missing files.
+    """
+    root = file_root()
+    if root is None:
+        raise CsvReadError(f"Not a Google Drive file link: {source}")
+    path = (root / source).resolve()
+    if not path.is_relative_to(root):
+        raise CsvReadError(f"Not a file under DATA_LOADER_FILE_ROOT: {source}")
+    if not path.is_file():
+        raise CsvReadError(f"No such file: {source}")
+    return path
+
+
+def iter_local_files(sources):
+    """Helper function to open local sources for ``iter_sources``"""
+    for source in sources:
+        try:
+            yield source, open(local_source_path(source), "rb"), None
+        except CsvReadError as e:
+            yield source, None, e
+        except OSError as e:
+            yield source, None, CsvReadError(str(e))
+
+
+def iter_sources(sources):
+    """
+    Yield ``(source, stream, error)`` for every source, like
+    ``iter_downloads``: local files first, opened for reading from disk
+    while the Drive files download, then Drive files as their downloads
+    complete.
+    """
+    local = iter_local_files(source for source in sources if not is_remote(source))
+    remote = [source for source in sources if is_remote(source)]
+    if remote:
+        yield from iter_downloads(remote, meanwhile=local)
+    else:
+        yield from local
+
+
+def save_upload(uploaded_file):
+    """
+    Store an uploaded file under DATA_LOADER_FILE_ROOT and return the
+    source name to queue it with.
+    """
+    name = f"{uuid.uuid4().hex}-{Path(uploaded_file.name).name}"
+    directory = file_root() / UPLOAD_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / name, "wb") as f:
+        for block in uploaded_file.chunks():
+            f.write(block)
+    return f"{UPLOAD_DIR}/{name}"
+
+
+def remove_uploads(sources):
+    """Delete the uploaded files among ``sources`` once their job has run."""
+    for source in sources:
+        if not is_remote(source) and source.startswith(f"{UPLOAD_DIR}/"):
+            try:
+                local_source_path(source).unlink()
+            except (CsvReadError, OSError) as e:
+                logger.warning(f"Could not remove upload {source}: {str(e)}")
+
+
+def decompressed(stream):
+    """
+    Return a binary stream of the CSV in ``stream``, decompressing gzip and
+    zstd files on the fly.
+    """
+    magic = stream.read(len(ZSTD_MAGIC))
+    stream.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise CsvReadError("zstd-compressed files need the zstandard package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(stream))
+    return stream
+
+
+def load_csv_sources(writer, sources, progress=None, skip_loaded=False):
+    """
+    Read, parse and write every source CSV, parsing each download as soon
+    as it finishes.
+
+    Returns one outcome dict per source, with the SHA-256 and size of every
+    file read, before decompression. A file that cannot be read or parsed
+    is reported as an error without stopping the others; database errors
+    propagate.
+    With ``skip_loaded``, files recorded as loaded in ``SourceFile`` are
+    reported as skipped instead of parsed. ``progress``, if given, is called
+    with the outcomes so far after every written chunk and every finished
+    file.
+    """
+    outcomes = []
+    for source, spool, error in iter_sources(sources):
+        outcome = {"url": source, "status": "success", "records": 0}
+        if error is None:
+            with spool:
+                outcome["sha256"], outcome["size"] = file_fingerprint(spool)
+                if skip_loaded and SourceFile.is_loaded(
+                    outcome["sha256"], using=LOADER_DB
+                ):
+                    outcome["status"] = "skipped"
+                else:
+                    records_before = writer.record_count
+                    try:
+                        stream = decompressed(spool)
+                        # Closed before the file, also when a write fails
+                        with closing(
+                            iter_normalized_chunks(stream, parse_pool())
+                        ) as frames:
+                            for frame in instrumentation.timed_iter("parse", frames):
+                                writer.write(frame)
+                                if progress is not None:
+                                    progress(outcomes)
+                    except (CsvReadError, *DECOMPRESSION_ERRORS) as e:
+                        error = e
+                    outcome["records"] = writer.record_count - records_before
+
+        if error is not None:
+            outcome["status"] = "error"
+            outcome["message"] = f"Error reading CSV file: {str(error)}"
+        outcomes.append(outcome)
+        if progress is not None:
+            progress(outcomes)
+
+    return outcomes
@@ -1,3 +1,1175 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import tempfile
+import multiprocessing
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader import (
+    dimensions,
+    jobs,
+    partitions,
+    pipeline,
+    refresh,
+)
+from ecomm_dashboard.data_loader.dimensions import DimensionKeyCache
+from ecomm_dashboard.data_loader.models import (
+    DataVersion,
+    IngestionJob,
+    MaterializedViewRefresh,
+    SourceFile,
+)
+from ecomm_dashboard.data_loader.pipeline import (
+    LOADER_DB,
+    WRITERS,
+    CopyOrderBatchWriter,
+    CsvReadError,
+    fingerprint_chunk,
+    iter_csv_blocks,
+    iter_csv_chunks,
+    iter_normalized_chunks,
+    normalize_chunk,
+)
+from ecomm_dashboard.data_loader.sources import (
+    iter_downloads,
+    iter_sources,
+    load_csv_sources,
+    remove_uploads,
+    save_upload,
+    zstandard,
+)
+from ecomm_dashboard.visualizer.models import (
+    Order,
+    OrderDetails,
+    Platform,
+    Product,
+)
+
+CSV_BODY = b"OrderID,QuantitySold\nORD-1,2\nORD-2,3\nORD-3,1\n"
+
+ORDERS_HEADER = """\
+OrderID,DateOfSale,Platform,ProductID,ProductName,Category,CustomerID,\
+CustomerName,ContactEmail,DeliveryAddress,DeliveryDate,DeliveryStatus,\
+SellingPrice,QuantitySold
+"""
+ORDER_LINES = [
+    'O1,2023-01-10,Amazon,P1,Novel,Books,C1,Ann,a@example.com,"1 Main St, Pune, MH",'
+    "2023-01-12,Delivered,100.0,1",
+    'O1,2023-01-10,Amazon,P2,Kite,Toys,C1,Ann,a@example.com,"1 Main St, Pune, MH",'
+    "2023-01-12,Delivered,50.0,2",
+    'O3,2023-02-03,Meesho,P3,Ball,Toys,C2,Bo,b@example.com,"2 Hill Rd, Agra, UP",'
+    "2023-02-05,Delivered,20.0,3",
+]
+ORDERS_CSV = ORDERS_HEADER + "\n".join(ORDER_LINES) + "\n"
+
+
+class StandInDriveHandler(BaseHTTPRequestHandler):
+    """Serves /uc?id=<file id> like Google Drive, with scripted failures."""
+
+    attempts = {}
+
+    def do_GET(self):
+        file_id = parse_qs(urlparse(self.path).query)["id"][0]
+        attempt = self.attempts[file_id] = self.attempts.get(file_id, 0) + 1
+
+        if file_id == "missing":
+            self.send_response(404)
+            self.end_headers()
+        elif file_id == "flaky" and attempt == 1:
+            self.send_response(503)
+            self.end_headers()
+        elif file_id == "broken":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'OrderID,QuantitySold\n"ORD-1,2\n')
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(CSV_BODY)))
+            self.end_headers()
+            self.wfile.write(CSV_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.record_count = 0
+        self.order_ids = []
+
+    def write(self, frame):
+        self.order_ids.extend(frame["order_id"])
+        self.record_count += len(frame)
+
+
+class StandInDriveMixin:
+    """Points the downloads at a StandInDriveHandler server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInDriveHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            DATA_LOADER_DOWNLOAD_URL=(
+                f"http://127.0.0.1:{cls.server.server_port}/uc?id={{file_id}}"
+            ),
+            DATA_LOADER_DOWNLOAD_BACKOFF=0.01,
+            DATA_LOADER_DOWNLOAD_TIMEOUT=5,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StandInDriveHandler.attempts.clear()
+
+    @staticmethod
+    def drive_link(file_id):
+        return f"https://drive.google.com/file/d/{file_id}/view"
+
+
+class DownloadTests(StandInDriveMixin, SimpleTestCase):
+    def test_each_file_reports_its_own_outcome(self):
+        links = [self.drive_link(file_id) for file_id in ("good", "flaky", "missing")]
+        links.append("https://example.com/not-a-drive-link")
+
+        results = {}
+        for drive_url, spool, error in iter_downloads(links):
+            if spool is not None:
+                with spool:
+                    results[drive_url] = spool.read()
+            else:
+                results[drive_url] = error
+
+        self.assertEqual(results[self.drive_link("good")], CSV_BODY)
+        self.assertEqual(results[self.drive_link("flaky")], CSV_BODY)
+        self.assertIn("404", str(results[self.drive_link("missing")]))
+        self.assertIn(
+            "Google Drive", str(results["https://example.com/not-a-drive-link"])
+        )
+
+    def test_retries_only_retryable_statuses(self):
+        list(iter_downloads([self.drive_link("flaky"), self.drive_link("missing")]))
+
+        self.assertEqual(StandInDriveHandler.attempts["flaky"], 2)
+        self.assertEqual(StandInDriveHandler.attempts["missing"], 1)
+
+    def test_load_continues_past_failed_files(self):
+        writer = RecordingWriter()
+        outcomes = load_csv_sources(
+            writer,
+            [self.drive_link("good"), self.drive_link("broken"), self.drive_link("a")],
+        )
+
+        by_url = {outcome["url"]: outcome for outcome in outcomes}
+        self.assertEqual(by_url[self.drive_link("good")]["records"], 3)
+        self.assertEqual(by_url[self.drive_link("a")]["records"], 3)
+        self.assertEqual(by_url[self.drive_link("broken")]["status"], "error")
+        self.assertEqual(writer.record_count, 6)
+        self.assertEqual(
+            by_url[self.drive_link("good")]["sha256"],
+            hashlib.sha256(CSV_BODY).hexdigest(),
+        )
+
+
+class SkipLoadedFilesTests(StandInDriveMixin, TestCase):
+    databases = {"default", "ingestion"}
+
+    def test_files_loaded_before_are_skipped(self):
+        links = [self.drive_link("good"), self.drive_link("broken")]
+        SourceFile.record_loaded(
+            [
+                {
+                    "url": self.drive_link("a"),
+                    "status": "success",
+                    "records": 3,
+                    "sha256": hashlib.sha256(CSV_BODY).hexdigest(),
+                    "size": len(CSV_BODY),
+                }
+            ],
+            using=LOADER_DB,
+        )
+
+        writer = RecordingWriter()
+        outcomes = load_csv_sources(writer, links, skip_loaded=True)
+
+        by_url = {outcome["url"]: outcome for outcome in outcomes}
+        self.assertEqual(by_url[self.drive_link("good")]["status"], "skipped")
+        self.assertEqual(by_url[self.drive_link("broken")]["status"], "error")
+        self.assertEqual(writer.record_count, 0)
+
+
+class ReloadTests(TestCase):
+    """Loading an export again only writes the orders and lines that changed."""
+
+    def load(self, engine, body):
+        with connection.cursor() as cursor:
+            writer = WRITERS[engine](cursor)
+            for chunk in iter_csv_chunks(io.BytesIO(body.encode())):
+                writer.write(normalize_chunk(chunk))
+            writer.finish()
+        return writer
+
+    def order_lines(self):
+        return sorted(
+            OrderDetails.objects.values_list(
+                "order_id", "product_id", "selling_price", "quantity_sold"
+            )
+        )
+
+    def test_reloading_an_export_writes_nothing(self):
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine, ORDERS_CSV)
+                lines = self.order_lines()
+
+                writer = self.load(engine, ORDERS_CSV)
+
+                self.assertEqual(self.order_lines(), lines)
+                self.assertEqual(+writer.inserted_rows, Counter())
+                self.assertEqual(writer.updated_rows, Counter())
+                self.assertEqual(writer.rollup_months, set())
+                transaction.set_rollback(True)
+
+    def test_changed_and_new_orders_are_upserted(self):
+        changed = ORDERS_HEADER + "\n".join(
+            [
+                *ORDER_LINES[:2],
+                ORDER_LINES[2].replace("Delivered,20.0,3", "Cancelled,20.0,5"),
+                'O4,2023-03-01,Meesho,P3,Ball,Toys,C2,Bo,b@example.com,'
+                '"2 Hill Rd, Agra, UP",2023-03-04,Delivered,20.0,1',
+            ]
+        )
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine, ORDERS_CSV)
+
+                writer = self.load(engine, changed)
+
+                self.assertEqual(
+                    writer.updated_rows, Counter(orders=1, order_details=1)
+                )
+                self.assertEqual(writer.inserted_rows["orders"], 1)
+                self.assertEqual(writer.inserted_rows["order_details"], 1)
+                self.assertEqual(
+                    writer.rollup_months, {date(2023, 2, 1), date(2023, 3, 1)}
+                )
+                self.assertEqual(
+                    Order.objects.get(id="O3").delivery_status, "Cancelled"
+                )
+                self.assertEqual(
+                    self.order_lines(),
+                    [
+                        ("O1", "P1", 100.0, 1),
+                        ("O1", "P2", 50.0, 2),
+                        ("O3", "P3", 20.0, 5),
+                        ("O4", "P3", 20.0, 1),
+                    ],
+                )
+                transaction.set_rollback(True)
+
+    def test_the_last_line_of_an_order_gives_its_fields(self):
+        body = ORDERS_HEADER + "\n".join(
+            [
+                ORDER_LINES[0],
+                ORDER_LINES[1].replace("Delivered", "Cancelled"),
+                ORDER_LINES[2],
+            ]
+        )
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine, body)
+                self.assertEqual(
+                    Order.objects.get(id="O1").delivery_status, "Cancelled"
+                )
+                transaction.set_rollback(True)
+
+    def test_large_loads_analyze_the_months_they_touched(self):
+        for threshold, analyzed in ((10, []), (1, ["2023_01", "2023_02"])):
+            with self.subTest(threshold=threshold), transaction.atomic():
+                with mock.patch.object(
+                    pipeline, "ANALYZE_MIN_ROWS", threshold
+                ), CaptureQueriesContext(connection) as queries:
+                    self.load("copy", ORDERS_CSV)
+
+                statements = [
+                    query["sql"]
+                    for query in queries
+                    if query["sql"].startswith("ANALYZE")
+                ]
+                expected = [
+                    "ANALYZE "
+                    + ", ".join(
+                        f"{table}_p{month}"
+                        for table in ("orders", "order_details")
+                        for month in analyzed
+                    )
+                ]
+                self.assertEqual(statements, expected if analyzed else [])
+                transaction.set_rollback(True)
+
+    def test_the_last_line_of_a_product_wins(self):
+        repeated = ORDER_LINES[0].replace(",100.0,1", ",90.0,4")
+        expected = [
+            ("O1", "P1", 90.0, 4),
+            ("O1", "P2", 50.0, 2),
+            ("O3", "P3", 20.0, 3),
+        ]
+        for engine in WRITERS:
+            with self.subTest(engine=engine, within="chunk"), transaction.atomic():
+                self.load(engine, ORDERS_CSV + repeated + "\n")
+                self.assertEqual(self.order_lines(), expected)
+                transaction.set_rollback(True)
+
+            with self.subTest(engine=engine, within="files"), transaction.atomic():
+                self.load(engine, ORDERS_CSV)
+                self.load(engine, ORDERS_HEADER + repeated + "\n")
+                self.assertEqual(self.order_lines(), expected)
+                transaction.set_rollback(True)
+
+
+class EngineParityTests(TestCase):
+    """The insert and copy engines write the same rows from the same CSVs."""
+
+    exports = [
+        ORDERS_HEADER
+        + "\n".join(
+            [
+                *ORDER_LINES,
+                # A repeated line and a changed order status: the last wins.
+                ORDER_LINES[0].replace(",100.0,1", ",90.0,4"),
+                ORDER_LINES[1].replace("Delivered", "Shipped"),
+                ORDER_LINES[2].replace("Ball", "Red ball"),
+            ]
+        )
+        + "\n",
+        ORDERS_HEADER
+        + ORDER_LINES[2].replace("Delivered,20.0,3", "Cancelled,20.0,5")
+        + "\n",
+    ]
+
+    snapshot_queries = {
+        "orders": """
+            SELECT o.id, o.date_of_sale, o.customer_id,
+                   o.customer_address_details_id, pl.name, o.delivery_date,
+                   o.delivery_status, o.meta_data::text, o.row_hash
+            FROM orders o LEFT JOIN platform pl ON pl.id = o.platform_id
+            ORDER BY 1, 2
+        """,
+        "order_details": """
+            SELECT order_id, date_of_sale, product_id, selling_price,
+                   quantity_sold, row_hash
+            FROM order_details ORDER BY 1, 2, 3
+        """,
+        "product": """
+            SELECT p.id, p.name, p.category, pl.name
+            FROM product p INNER JOIN platform pl ON pl.id = p.platform_id
+            ORDER BY 1, 2, 3, 4
+        """,
+        "customer": """
+            SELECT c.id, c.name, c.contact_email, pl.name
+            FROM customer c INNER JOIN platform pl ON pl.id = c.platform_id
+            ORDER BY 1
+        """,
+        "customer_address_details": """
+            SELECT id, street, city, state, pincode, customer_id
+            FROM customer_address_details ORDER BY 1
+        """,
+        "order_monthly_rollup": """
+            SELECT r.month, r.category, r.delivery_status, pl.name, r.state,
+                   r.quantity_sold, r.revenue, r.order_count
+            FROM order_monthly_rollup r
+            LEFT JOIN platform pl ON pl.id = r.platform_id
+            ORDER BY 1, 2, 3, 4, 5
+        """,
+    }
+
+    def setUp(self):
+        self.addCleanup(dimensions.clear_all)
+        self.addCleanup(partitions._known_months.clear)
+
+    def load(self, engine, body):
+        with connection.cursor() as cursor:
+            writer = WRITERS[engine](cursor)
+            for chunk in iter_csv_chunks(io.BytesIO(body.encode())):
+                writer.write(normalize_chunk(chunk))
+            writer.finish()
+
+    def snapshot(self):
+        tables = {}
+        with connection.cursor() as cursor:
+            for table, sql in self.snapshot_queries.items():
+                cursor.execute(sql)
+                tables[table] = cursor.fetchall()
+        return tables
+
+    def test_engines_write_the_same_rows(self):
+        snapshots = {}
+        for engine in WRITERS:
+            with transaction.atomic():
+                for export in self.exports:
+                    self.load(engine, export)
+                snapshots[engine] = self.snapshot()
+                transaction.set_rollback(True)
+            dimensions.clear_all()
+            partitions._known_months.clear()
+
+        self.assertEqual(len(snapshots["copy"]["orders"]), 2)
+        self.assertEqual(snapshots["copy"]["orders"][0][6], "Shipped")
+        for table in self.snapshot_queries:
+            with self.subTest(table=table):
+                self.assertEqual(snapshots["insert"][table], snapshots["copy"][table])
+
+    def test_lines_without_a_platform_are_refused(self):
+        body = ORDERS_HEADER + ORDER_LINES[0].replace(",Amazon,", ",,") + "\n"
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                with self.assertRaisesMessage(CsvReadError, "no Platform"):
+                    self.load(engine, body)
+                self.assertFalse(Order.objects.exists())
+                self.assertFalse(Product.objects.exists())
+                transaction.set_rollback(True)
+
+
+class RenamedProductTests(TestCase):
+    """A product loaded again under a new name is still one product."""
+
+    renamed = ORDERS_HEADER + ORDER_LINES[0].replace("Novel", "Novel 2nd ed") + "\n"
+
+    def load(self, engine, body):
+        with connection.cursor() as cursor:
+            writer = WRITERS[engine](cursor)
+            for chunk in iter_csv_chunks(io.BytesIO(body.encode())):
+                writer.write(normalize_chunk(chunk))
+            writer.finish()
+
+    def query(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def test_view_lists_each_order_line_once(self):
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine, ORDERS_CSV)
+                self.load(engine, self.renamed)
+                self.assertEqual(Product.objects.filter(product_id="P1").count(), 2)
+
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "REFRESH MATERIALIZED VIEW CONCURRENTLY mv_order_details"
+                    )
+
+                self.assertEqual(
+                    self.query(
+                        "SELECT order_id, product_id, category FROM mv_order_details "
+                        "ORDER BY order_detail_id"
+                    ),
+                    [("O1", "P1", "Books"), ("O1", "P2", "Toys"), ("O3", "P3", "Toys")],
+                )
+                transaction.set_rollback(True)
+
+
+class FailingWriter(CopyOrderBatchWriter):
+    """Fails to write any chunk after the first."""
+
+    def write(self, frame):
+        if self.record_count:
+            raise DatabaseError("connection lost")
+        super().write(frame)
+
+
+class JobTestCase(TransactionTestCase):
+    """
+    Runs jobs on the ingestion connection, which does not see rows written
+    inside a TestCase transaction on default.
+    """
+
+    databases = {"default", "ingestion"}
+
+    def setUp(self):
+        # Committed keys would outlive the flushed rows they refer to, and
+        # the rollup has no model for the flush to empty.
+        self.addCleanup(dimensions.clear_all)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM order_monthly_rollup")
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        (root / "january.csv").write_text(ORDERS_HEADER + ORDER_LINES[0] + "\n")
+        (root / "february.csv").write_text(ORDERS_HEADER + ORDER_LINES[2] + "\n")
+        settings_override = override_settings(DATA_LOADER_FILE_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        refresh = mock.patch.object(jobs.order_details_refresher, "request_refresh")
+        self.request_refresh = refresh.start()
+        self.addCleanup(refresh.stop)
+
+
+class PartialLoadTests(JobTestCase):
+    def test_committed_chunks_are_published_when_a_load_fails(self):
+        job = IngestionJob.objects.create(urls=["january.csv", "february.csv"])
+        version = DataVersion.current(DataVersion.ORDERS)
+
+        with mock.patch.object(jobs, "make_writer", FailingWriter):
+            jobs.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.ERROR)
+        self.assertIn("connection lost", job.message)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT month FROM order_monthly_rollup")
+            self.assertEqual(cursor.fetchall(), [(date(2023, 1, 1),)])
+        self.assertGreater(DataVersion.current(DataVersion.ORDERS), version)
+        self.request_refresh.assert_called_once()
+
+
+class ChunkTransactionTests(TransactionTestCase):
+    """Each engine writes a chunk in one transaction of its own."""
+
+    def setUp(self):
+        self.addCleanup(dimensions.clear_all)
+
+    def test_failed_chunks_leave_nothing_behind(self):
+        [chunk] = iter_csv_chunks(io.BytesIO(ORDERS_CSV.encode()))
+        orders_stage = {"insert": "write_orders", "copy": "merge_orders"}
+        for engine, writer_class in WRITERS.items():
+            with self.subTest(engine=engine), connection.cursor() as cursor:
+                writer = writer_class(cursor)
+                with mock.patch.object(
+                    writer, orders_stage[engine], side_effect=DatabaseError
+                ), self.assertRaises(DatabaseError):
+                    writer.write(normalize_chunk(chunk))
+
+                # The chunk's dimension rows were rolled back with it.
+                self.assertFalse(Platform.objects.exists())
+                self.assertFalse(Product.objects.exists())
+                self.assertEqual(len(dimensions.product_keys), 0)
+
+
+class JobQueueTests(JobTestCase):
+    def test_jobs_locked_by_another_worker_are_skipped(self):
+        first = IngestionJob.objects.create(urls=["january.csv"])
+        second = IngestionJob.objects.create(urls=["february.csv"])
+
+        # Another worker is still claiming the first job on its connection
+        with transaction.atomic():
+            IngestionJob.objects.select_for_update().get(pk=first.pk)
+            claimed = jobs.claim_next_job()
+
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(claimed.status, IngestionJob.RUNNING)
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(jobs.claim_next_job().pk, first.pk)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_jobs_wait_for_a_free_slot(self):
+        job = IngestionJob.objects.create(urls=["january.csv"])
+        runner = jobs.IngestionJobRunner(max_concurrent=1)
+
+        # The only slot is held by a worker in another process
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_lock(%s, 0)", [jobs.JOB_SLOT_LOCK_ID]
+            )
+            try:
+                self.assertEqual(runner.run_pending(), 0)
+                job.refresh_from_db()
+                self.assertEqual(job.status, IngestionJob.QUEUED)
+            finally:
+                cursor.execute(
+                    "SELECT pg_advisory_unlock(%s, 0)", [jobs.JOB_SLOT_LOCK_ID]
+                )
+
+        self.assertEqual(runner.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.SUCCESS)
+        self.assertEqual(job.rows_parsed, 1)
+
+    def test_job_status_follows_its_files(self):
+        cases = [
+            (["january.csv", "february.csv"], IngestionJob.SUCCESS),
+            (["january.csv", "missing.csv"], IngestionJob.PARTIAL),
+            (["missing.csv"], IngestionJob.ERROR),
+        ]
+        for urls, status in cases:
+            with self.subTest(urls=urls):
+                job = IngestionJob.objects.create(urls=urls)
+                jobs.run_job(job)
+                job.refresh_from_db()
+                self.assertEqual(job.status, status)
+                self.assertTrue(job.finished)
+                self.assertIsNotNone(job.finished_at)
+                self.assertEqual([outcome["url"] for outcome in job.files], urls)
+                if status == IngestionJob.ERROR:
+                    self.assertIn("No such file: missing.csv", job.message)
+
+    def test_stalled_jobs_are_failed(self):
+        stalled = IngestionJob.objects.create(
+            urls=["january.csv"], status=IngestionJob.RUNNING
+        )
+        running = IngestionJob.objects.create(
+            urls=["february.csv"], status=IngestionJob.RUNNING
+        )
+        IngestionJob.objects.filter(pk=stalled.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=10)
+        )
+
+        out = io.StringIO()
+        call_command("run_ingestion_jobs", fail_stalled=60, stdout=out)
+
+        stalled.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stalled.status, IngestionJob.ERROR)
+        self.assertEqual(stalled.message, "Job stalled and was marked as failed")
+        self.assertIsNotNone(stalled.finished_at)
+        self.assertEqual(running.status, IngestionJob.RUNNING)
+        self.assertIn("Marked 1 stalled job(s) as failed", out.getvalue())
+
+
+class JobStatusViewTests(TestCase):
+    def test_reports_the_job(self):
+        job = IngestionJob.objects.create(
+            urls=["january.csv"],
+            status=IngestionJob.SUCCESS,
+            message="Successfully inserted 1 records",
+            rows_parsed=1,
+            files=[{"url": "january.csv", "status": "success", "records": 1}],
+            finished_at=timezone.now(),
+        )
+
+        response = self.client.get(f"/data_loader/jobs/{job.id}")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(data["job_id"], str(job.id))
+        self.assertEqual(data["job_status"], IngestionJob.SUCCESS)
+        self.assertTrue(data["finished"])
+        self.assertEqual(data["rows_parsed"], 1)
+        self.assertEqual(data["files"], job.files)
+
+    def test_unknown_jobs_are_not_found(self):
+        response = self.client.get(f"/data_loader/jobs/{uuid.uuid4()}")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            response.json(), {"status": "error", "message": "Job not found"}
+        )
+
+
+class PartitionTests(TransactionTestCase):
+    """
+    Months get their partitions when first loaded and leave the rollup and
+    mv_order_details when detached. Detaching cannot run in a transaction.
+    """
+
+    databases = {"default", "ingestion"}
+
+    # O1 falls in a month that no other test loads.
+    body = (
+        ORDERS_HEADER
+        + ORDER_LINES[0].replace("2023-01-", "2019-05-")
+        + "\n"
+        + ORDER_LINES[2]
+        + "\n"
+    )
+
+    def setUp(self):
+        self.addCleanup(dimensions.clear_all)
+        self.addCleanup(partitions._known_months.clear)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM order_monthly_rollup")
+        # Refresh the view in the command, not on a debounce timer.
+        schedule = mock.patch.object(jobs.order_details_refresher, "_schedule")
+        schedule.start()
+        self.addCleanup(schedule.stop)
+
+    def load(self, writer_class=CopyOrderBatchWriter):
+        with connection.cursor() as cursor:
+            writer = writer_class(cursor)
+            for chunk in iter_csv_chunks(io.BytesIO(self.body.encode())):
+                writer.write(normalize_chunk(chunk))
+            writer.finish()
+            cursor.execute("REFRESH MATERIALIZED VIEW mv_order_details")
+
+    def detach(self, drop):
+        out = io.StringIO()
+        call_command("detach_order_partitions", before="2020-01", drop=drop, stdout=out)
+        return out.getvalue()
+
+    def query(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def drop_archived_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE order_details_p2019_05, orders_p2019_05")
+
+    def test_detached_months_leave_the_rollup_and_view(self):
+        self.load()
+        with connection.cursor() as cursor:
+            for table in partitions.PARTITIONED_TABLES:
+                self.assertIn(
+                    f"{table}_p2019_05", partitions.attached_partitions(cursor, table)
+                )
+        self.assertEqual(
+            self.query("SELECT DISTINCT month FROM order_monthly_rollup ORDER BY 1"),
+            [(date(2019, 5, 1),), (date(2023, 2, 1),)],
+        )
+
+        self.assertIn("Dropped orders_p2019_05", self.detach(drop=True))
+
+        self.assertEqual(
+            self.query("SELECT to_regclass('orders_p2019_05')"), [(None,)]
+        )
+        self.assertEqual(
+            self.query("SELECT DISTINCT month FROM order_monthly_rollup"),
+            [(date(2023, 2, 1),)],
+        )
+        self.assertEqual(
+            self.query("SELECT DISTINCT order_id FROM mv_order_details"), [("O3",)]
+        )
+        self.assertEqual(list(Order.objects.values_list("id", flat=True)), ["O3"])
+
+    def test_archived_months_are_not_recreated(self):
+        self.load()
+        self.assertIn("Detached orders_p2019_05", self.detach(drop=False))
+        self.addCleanup(self.drop_archived_tables)
+        # The detached tables keep their rows for archiving.
+        self.assertEqual(self.query("SELECT id FROM orders_p2019_05"), [("O1",)])
+
+        with self.assertRaisesMessage(partitions.PartitionError, "probably archived"):
+            self.load()
+
+    def test_months_dropped_by_another_process_are_recreated(self):
+        for engine, writer_class in WRITERS.items():
+            with self.subTest(engine=engine):
+                self.load(writer_class)
+                # Unlike the command, another process leaves this process's
+                # known months as they are.
+                with connection.cursor() as cursor:
+                    for table in reversed(partitions.PARTITIONED_TABLES):
+                        cursor.execute(
+                            f"ALTER TABLE {table} DETACH PARTITION {table}_p2019_05"
+                        )
+                        cursor.execute(f"DROP TABLE {table}_p2019_05")
+
+                self.load(writer_class)
+
+                self.assertEqual(
+                    sorted(Order.objects.values_list("id", flat=True)), ["O1", "O3"]
+                )
+
+
+class RefreshTests(TransactionTestCase):
+    """
+    Refresh requests are stored, debounced and coalesced; the refresh runs
+    on the ingestion connection under an advisory lock.
+    """
+
+    databases = {"default", "ingestion"}
+
+    def setUp(self):
+        self.refresher = refresh.MaterializedViewRefresher(
+            refresh.ORDER_DETAILS_VIEW, debounce_seconds=5, max_delay_seconds=12
+        )
+        timer = mock.patch.object(refresh.threading, "Timer")
+        self.Timer = timer.start()
+        self.addCleanup(timer.stop)
+        self.now = 100.0
+        monotonic = mock.patch.object(
+            refresh.time, "monotonic", side_effect=lambda: self.now
+        )
+        monotonic.start()
+        self.addCleanup(monotonic.stop)
+
+    def delays(self):
+        return [args[0] for args, kwargs in self.Timer.call_args_list]
+
+    def test_requests_are_coalesced_into_one_timer(self):
+        for _ in range(3):
+            self.refresher.request_refresh()
+            self.now += 1
+
+        self.assertEqual(self.delays(), [5, 5, 5])
+        self.assertEqual(self.Timer.return_value.cancel.call_count, 2)
+        self.assertEqual(MaterializedViewRefresh.objects.count(), 1)
+        self.assertTrue(self.refresher.status().pending)
+
+    def test_requests_stop_postponing_at_the_max_delay(self):
+        for _ in range(4):
+            self.refresher.request_refresh()
+            self.now += 4
+
+        self.assertEqual(self.delays(), [5, 5, 4, 0])
+
+    def test_refreshes_only_when_pending(self):
+        version = DataVersion.current(DataVersion.ORDERS)
+        self.refresher.request_refresh()
+
+        self.assertTrue(self.refresher.refresh_if_pending())
+        state = self.refresher.status()
+        self.assertFalse(state.pending)
+        self.assertIsNotNone(state.refreshed_at)
+        self.assertEqual(DataVersion.current(DataVersion.ORDERS), version + 1)
+        self.assertFalse(self.refresher.refresh_if_pending())
+
+    def test_skips_and_retries_while_another_process_refreshes(self):
+        self.refresher.request_refresh()
+        lock = [refresh.REFRESH_LOCK_ID, refresh.ORDER_DETAILS_VIEW]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s, hashtext(%s))", lock)
+            try:
+                self.assertIsNone(self.refresher.refresh_if_pending())
+                self.Timer.reset_mock()
+                self.refresher._run()
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", lock)
+
+        self.assertEqual(self.delays(), [5])
+        self.assertTrue(self.refresher.status().pending)
+        self.assertTrue(self.refresher.refresh_if_pending())
+
+    def test_a_scheduled_refresh_is_flushed_at_exit(self):
+        self.refresher.flush_at_exit()
+        self.assertFalse(self.refresher.status().pending)
+
+        self.refresher.request_refresh()
+        self.refresher.flush_at_exit()
+
+        self.Timer.return_value.cancel.assert_called_once()
+        self.assertIsNone(self.refresher._timer)
+        self.assertFalse(self.refresher.status().pending)
+
+    def test_running_jobs_flushes_a_pending_refresh(self):
+        MaterializedViewRefresh.objects.create(
+            view_name=refresh.ORDER_DETAILS_VIEW, requested_at=timezone.now()
+        )
+
+        out = io.StringIO()
+        call_command("run_ingestion_jobs", stdout=out)
+
+        self.assertIn("Refreshed mv_order_details", out.getvalue())
+        self.assertFalse(refresh.order_details_refresher.status().pending)
+
+    def test_status_endpoint_reports_the_refresh(self):
+        self.refresher.request_refresh()
+
+        response = self.client.get("/data_loader/refresh_status")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(data["view"], refresh.ORDER_DETAILS_VIEW)
+        self.assertTrue(data["pending"])
+        self.assertIsNone(data["last_refreshed_at"])
+
+        self.refresher.refresh_if_pending()
+        data = self.client.get("/data_loader/refresh_status").json()["data"]
+        self.assertFalse(data["pending"])
+        self.assertIsNotNone(data["last_refreshed_at"])
+        self.assertEqual(data["last_error"], "")
+
+
+class FingerprintTests(SimpleTestCase):
+    """Fingerprints and meta_data do not depend on the rest of the chunk."""
+
+    header = ORDERS_HEADER.rstrip("\n") + ",CommissionPercentage,PrimeDelivery\n"
+    line = ORDER_LINES[0] + ",5,True"
+
+    def fingerprint(self, body):
+        [chunk] = iter_csv_chunks(io.BytesIO((self.header + body).encode()))
+        frame = fingerprint_chunk(normalize_chunk(chunk))
+        return frame[frame["order_id"] == "O1"].iloc[0]
+
+    def test_same_row_hashes_alike_in_any_chunk(self):
+        alone = self.fingerprint(self.line + "\n")
+        others = [
+            # A decimal price and commission, and a blank quantity and flag
+            'O2,2023-01-20,Amazon,P3,Ball,Toys,C2,Bo,b@example.com,"2 Hill Rd, Agra, '
+            'UP",2023-01-25,Delivered,19.5,,2.5,',
+            # Text in the numeric meta_data column
+            'O3,2023-02-03,Meesho,P3,Ball,Toys,C2,Bo,b@example.com,"2 Hill Rd, Agra, '
+            'UP",2023-02-05,Delivered,20.0,3,n/a,False',
+        ]
+        for other in others:
+            with self.subTest(other=other):
+                mixed = self.fingerprint(f"{other}\n{self.line}\n")
+                self.assertEqual(mixed["order_hash"], alone["order_hash"])
+                self.assertEqual(mixed["line_hash"], alone["line_hash"])
+                self.assertEqual(mixed["meta_data"], alone["meta_data"])
+        self.assertIn('"commission_percentage": 5,', alone["meta_data"])
+        self.assertIn('"prime_delivery": true', alone["meta_data"])
+
+    def test_fingerprints_hash_a_text_encoding_of_the_row(self):
+        # Stored fingerprints must not change with the pandas version.
+        line = self.fingerprint(self.line + "\n")
+        digest = hashlib.blake2b(b"100.0\x1f1.0", digest_size=8).digest()
+        self.assertEqual(
+            line["line_hash"], int.from_bytes(digest, "big", signed=True)
+        )
+
+
+class DimensionKeyCacheTests(SimpleTestCase):
+    def test_evicts_the_least_recently_used_keys(self):
+        cache = DimensionKeyCache(max_size=2)
+        cache.update({"a": 1, "b": 2})
+        cache.lookup(["a"])
+        cache.update({"c": 3})
+
+        found, missing = cache.lookup(["a", "b", "c"])
+
+        self.assertEqual(found, {"a": 1, "c": 3})
+        self.assertEqual(missing, ["b"])
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class DimensionCachingTests(TestCase):
+    """Loads only send dimension rows missing from the process caches."""
+
+    def setUp(self):
+        dimensions.clear_all()
+        self.addCleanup(dimensions.clear_all)
+        # Committing the loads below also marks their months' partitions as
+        # created, but the test transaction rolls the partitions back.
+        self.addCleanup(partitions._known_months.clear)
+
+    def load(self, engine):
+        with connection.cursor() as cursor:
+            writer = WRITERS[engine](cursor)
+            for chunk in iter_csv_chunks(io.BytesIO(ORDERS_CSV.encode())):
+                writer.write(normalize_chunk(chunk))
+        return writer
+
+    def test_keys_are_cached_once_committed(self):
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine)
+                self.assertEqual(len(dimensions.customer_keys), 0)
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.load(engine)
+                self.assertEqual(len(dimensions.customer_keys), 2)
+                self.assertEqual(len(dimensions.product_keys), 3)
+                self.assertEqual(
+                    set(dimensions.platform_ids.lookup(["Amazon", "Meesho"])[0]),
+                    {"Amazon", "Meesho"},
+                )
+
+                writer = self.load(engine)
+                self.assertEqual(writer.inserted_rows, Counter())
+                dimensions.clear_all()
+                partitions._known_months.clear()
+                transaction.set_rollback(True)
+
+    def test_stored_keys_are_not_inserted_again(self):
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                self.load(engine)
+                # As in a process that did not write them.
+                dimensions.clear_all()
+
+                with CaptureQueriesContext(connection) as queries:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        self.load(engine)
+                inserts = [
+                    query["sql"].split("(")[0].split()[-1]
+                    for query in queries.captured_queries
+                    if query["sql"].lstrip().startswith("INSERT")
+                ]
+                self.assertEqual(inserts, [])
+                self.assertEqual(len(dimensions.customer_keys), 2)
+                self.assertEqual(len(dimensions.address_keys), 2)
+                self.assertEqual(len(dimensions.product_keys), 3)
+                dimensions.clear_all()
+                partitions._known_months.clear()
+                transaction.set_rollback(True)
+
+
+class ParallelParsingTests(SimpleTestCase):
+    # The first record's address spans two lines.
+    body = ORDERS_CSV.replace("1 Main St,", "1 Main St\nBlock B,", 1).encode()
+
+    def test_blocks_end_at_record_boundaries(self):
+        blocks = list(iter_csv_blocks(io.BytesIO(self.body), block_bytes=16))
+
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(
+            blocks[0][0] + b"".join(block for _, block in blocks), self.body
+        )
+
+    def test_workers_yield_the_chunks_in_file_order(self):
+        inline = pd.concat(iter_normalized_chunks(io.BytesIO(self.body)))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            chunks = list(
+                iter_normalized_chunks(
+                    io.BytesIO(self.body), pool, window=2, block_bytes=16
+                )
+            )
+            with self.assertRaises(CsvReadError):
+                list(iter_normalized_chunks(io.BytesIO(b'OrderID\n"O1\n'), pool))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(inline["street"].iloc[0], "1 Main St\nBlock B")
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks).reset_index(drop=True), inline.reset_index(drop=True)
+        )
+
+
+class LocalSourceTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings_override = override_settings(DATA_LOADER_FILE_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_local_and_compressed_files_are_loaded(self):
+        (self.root / "plain.csv").write_bytes(CSV_BODY)
+        (self.root / "orders.csv.gz").write_bytes(gzip.compress(CSV_BODY))
+        (self.root / "corrupt.csv.gz").write_bytes(gzip.compress(CSV_BODY)[:30])
+        sources = ["plain.csv", "orders.csv.gz", "corrupt.csv.gz", "missing.csv"]
+        if zstandard is not None:
+            compressed = zstandard.ZstdCompressor().compress(CSV_BODY)
+            (self.root / "orders.csv.zst").write_bytes(compressed)
+            sources.append("orders.csv.zst")
+
+        writer = RecordingWriter()
+        outcomes = load_csv_sources(writer, sources)
+
+        by_url = {outcome["url"]: outcome for outcome in outcomes}
+        self.assertEqual(by_url["plain.csv"]["records"], 3)
+        self.assertEqual(by_url["orders.csv.gz"]["records"], 3)
+        self.assertEqual(by_url["corrupt.csv.gz"]["status"], "error")
+        self.assertIn("No such file", by_url["missing.csv"]["message"])
+        if zstandard is not None:
+            self.assertEqual(by_url["orders.csv.zst"]["records"], 3)
+
+    def test_paths_outside_the_root_are_rejected(self):
+        outside = tempfile.NamedTemporaryFile(suffix=".csv")
+        self.addCleanup(outside.close)
+        outside.write(CSV_BODY)
+        outside.flush()
+
+        outcomes = load_csv_sources(
+            RecordingWriter(), [outside.name, f"../{Path(outside.name).name}"]
+        )
+
+        for outcome in outcomes:
+            self.assertEqual(outcome["status"], "error")
+            self.assertIn("DATA_LOADER_FILE_ROOT", outcome["message"])
+
+    def test_uploads_are_loaded_and_removed(self):
+        source = save_upload(SimpleUploadedFile("orders.csv", CSV_BODY))
+
+        writer = RecordingWriter()
+        [outcome] = load_csv_sources(writer, [source])
+        remove_uploads([source])
+
+        self.assertEqual(outcome["records"], 3)
+        self.assertEqual(list((self.root / "uploads").iterdir()), [])
+
+    def test_downloads_start_before_local_files_are_read(self):
+        (self.root / "plain.csv").write_bytes(CSV_BODY)
+        started = threading.Event()
+
+        def download(session, url):
+            started.set()
+            return io.BytesIO(CSV_BODY)
+
+        drive_link = "https://drive.google.com/file/d/remote/view"
+        with mock.patch(
+            "ecomm_dashboard.data_loader.sources.timed_download", download
+        ):
+            results = iter_sources([drive_link, "plain.csv"])
+            source, stream, error = next(results)
+            with stream:
+                self.assertEqual(source, "plain.csv")
+                self.assertTrue(started.wait(timeout=5))
+            self.assertEqual([source for source, *_ in results], [drive_link])
+
+    @override_settings(DATA_LOADER_FILE_ROOT=None)
+    def test_local_files_are_disabled_without_a_root(self):
+        [outcome] = load_csv_sources(RecordingWriter(), ["plain.csv"])
+        self.assertEqual(outcome["status"], "error")
+
+        response = self.client.post(
+            "/data_loader/extract_order_data",
+            {"files": SimpleUploadedFile("orders.csv", CSV_BODY)},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "File uploads are not enabled")
+
+
+class StageTimingTests(StandInDriveMixin, TestCase):
+    """Loads record how long each stage took and how many rows it handled."""
+
+    def setUp(self):
+        super().setUp()
+        if instrumentation.time_query not in connection.execute_wrappers:
+            instrumentation.instrument_connection(connection)
+            self.addCleanup(
+                connection.execute_wrappers.remove, instrumentation.time_query
+            )
+
+    def test_downloads_and_parsing_are_timed(self):
+        with instrumentation.collect() as timings:
+            load_csv_sources(RecordingWriter(), [self.drive_link("good")])
+
+        self.assertIn("download", timings.stage_seconds)
+        self.assertEqual(timings.stage_rows["parse"], 3)
+
+    def test_writers_time_their_stages(self):
+        for engine in WRITERS:
+            with self.subTest(engine=engine), transaction.atomic():
+                with instrumentation.collect() as timings:
+                    with connection.cursor() as cursor:
+                        writer = WRITERS[engine](cursor)
+                        for chunk in iter_csv_chunks(io.BytesIO(ORDERS_CSV.encode())):
+                            writer.write(normalize_chunk(chunk))
+                        writer.finish()
+
+                stages = timings.as_dict()["stages"]
+                self.assertEqual(stages["dimensions"]["rows"], 3)
+                self.assertEqual(stages["orders"]["rows"], 3)
+                self.assertIn("rollup", stages)
+                self.assertGreater(timings.queries, 0)
+                transaction.set_rollback(True)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_nothing_is_recorded_when_disabled(self):
+        with instrumentation.collect() as timings:
+            load_csv_sources(RecordingWriter(), [self.drive_link("good")])
+
+        self.assertEqual(timings.as_dict()["stages"], {})
@@ -1,15 +1,11 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-import pandas as pd
 import logging
-import requests
-import io
-import numpy as np
-from django.db import connection
-import traceback
-import json
-from datetime import datetime
-from psycopg2.extras import execute_values
+
+from ecomm_dashboard.data_loader.jobs import submit_job
+from ecomm_dashboard.data_loader.models import IngestionJob
+from ecomm_dashboard.data_loader.refresh import order_details_refresher
+from ecomm_dashboard.data_loader.sources import file_root, save_upload
 
 logger = logging.getLogger(__name__)
 
@@ -17,203 +13,113 @@ logger = logging.getLogger(__name__)
 @api_view(["POST"])
 def extract_order_data(request):
     """
-    API endpoint that returns sales volume based on optional filters.
+    API endpoint that queues a load of order CSV exports shared on Google Drive,
+    stored under DATA_LOADER_FILE_ROOT or uploaded as multipart ``files``.
     """
     try:
-        csv_drive_urls = request.data.get("urls", [])
-        csv_dataframes = []
-
-        for drive_url in csv_drive_urls:
-            try:
-                google_file_id = drive_url.split("/d/")[1].split("/")[0]
-                download_url = f"https://drive.google.com/uc?id={google_file_id}"
-                response = requests.get(download_url, verify=False)
-                response.raise_for_status()
-                csv_data = pd.read_csv(io.StringIO(response.text))
-                csv_dataframes.append(csv_data)
-            except Exception as e:
-                return Response(
-                    {"status": "error", "message": f"Error reading CSV file: {str(e)}"},
-                    status=400,
-                )
-
-        merged_dataframe = pd.concat(csv_dataframes, ignore_index=True)
-        merged_dataframe = merged_dataframe.replace({np.nan: None})
-        records = merged_dataframe.to_dict(orient="records")
-
-        try:
-            with connection.cursor() as cursor:
-                # Insert platforms
-                platforms = {
-                    record["Platform"] for record in records if record["Platform"]
-                }
-                platform_values = [(name,) for name in platforms]
-                execute_values(
-                    cursor,
-                    "INSERT INTO platform (name) VALUES %s ON CONFLICT (name) DO NOTHING",
-                    platform_values,
-                )
-
-                # Get platform mapping
-                cursor.execute(
-                    "SELECT name, id FROM platform WHERE name = ANY(%s)",
-                    [list(platforms)],
-                )
-                platform_map = dict(cursor.fetchall())
-
-                # Insert products
-                products = {
-                    (
-                        record["ProductID"],
-                        record["ProductName"],
-                        record["Category"],
-                        platform_map[record["Platform"]],
-                    )
-                    for record in records
-                    if record["ProductID"]
-                }
-                product_values = [
-                    (pid, name, category, platform_id)
-                    for pid, name, category, platform_id in products
-                ]
-                execute_values(
-                    cursor,
-                    """
-                    INSERT INTO product (id, name, category, platform_id)
-                    VALUES %s
-                    ON CONFLICT (id, name, category, platform_id) DO NOTHING
-                    """,
-                    product_values,
-                )
-
-                # Insert customers
-                customers = {
-                    (
-                        record["CustomerID"],
-                        record["CustomerName"],
-                        record["ContactEmail"],
-                        platform_map[record["Platform"]],
-                    )
-                    for record in records
-                    if record["CustomerID"]
-                }
-                customer_values = [
-                    (cid, name, email, platform_id)
-                    for cid, name, email, platform_id in customers
-                ]
-                execute_values(
-                    cursor,
-                    """
-                    INSERT INTO customer (id, name, contact_email, platform_id)
-                    VALUES %s ON CONFLICT (id) DO NOTHING
-                    """,
-                    customer_values,
-                )
-
-                # Insert addresses
-                addresses = []
-                for record in records:
-                    if record["DeliveryAddress"] and record["CustomerID"]:
-                        street, city_state = record["DeliveryAddress"].split(", ", 1)
-                        city, state = city_state.split(", ")
-                        city = city.replace("City-", "")
-                        state = state.replace("State-", "")
-                        address_id = f"ADDR-{record['CustomerID']}-{city}-{state}"
-                        addresses.append(
-                            (address_id, street, city, state, 0, record["CustomerID"])
-                        )
-
-                execute_values(
-                    cursor,
-                    """
-                    INSERT INTO customer_address_details 
-                    (id, street, city, state, pincode, customer_id)
-                    VALUES %s ON CONFLICT (id) DO NOTHING
-                    """,
-                    list(set(addresses)),
-                )
-
-                # Insert orders
-                order_values = []
-                for record in records:
-                    if record["OrderID"]:
-                        address_id = f"ADDR-{record['CustomerID']}-{record['DeliveryAddress'].split(', ')[1].replace('City-', '')}-{record['DeliveryAddress'].split(', ')[2].replace('State-', '')}"
-                        meta_data = {
-                            "coupon_used": record["CouponUsed"],
-                            "return_window": record["ReturnWindow"],
-                            "prime_delivery": record["PrimeDelivery"],
-                            "warehouse_location": record["WarehouseLocation"],
-                            "reseller_name": record["ResellerName"],
-                            "commission_percentage": record["CommissionPercentage"],
-                            "phone_number": record["PhoneNumber"],
-                        }
-                        order_values.append(
-                            (
-                                record["OrderID"],
-                                datetime.strptime(
-                                    record["DateOfSale"], "%Y-%m-%d"
-                                ).date(),
-                                record["CustomerID"],
-                                address_id,
-                                platform_map[record["Platform"]],
-                                datetime.strptime(
-                                    record["DeliveryDate"], "%Y-%m-%d"
-                                ).date(),
-                                record["DeliveryStatus"],
-                                json.dumps(meta_data),
-                            )
-                        )
-
-                execute_values(
-                    cursor,
-                    """
-                    INSERT INTO orders
-                    (id, date_of_sale, customer_id, customer_address_details_id, 
-                     platform_id, delivery_date, delivery_status, meta_data)
-                    VALUES %s ON CONFLICT (id) DO NOTHING
-                    """,
-                    order_values,
-                )
+        if hasattr(request.data, "getlist"):
+            sources = request.data.getlist("urls")
+        else:
+            sources = request.data.get("urls", [])
+        uploads = request.FILES.getlist("files")
+        if not sources and not uploads:
+            return Response(
+                {"status": "error", "message": "No CSV urls provided"},
+                status=400,
+            )
+        if uploads and file_root() is None:
+            return Response(
+                {"status": "error", "message": "File uploads are not enabled"},
+                status=400,
+            )
 
-                # Insert order details
-                order_details_values = [
-                    (
-                        record["OrderID"],
-                        record["ProductID"],
-                        record["SellingPrice"],
-                        record["QuantitySold"],
-                    )
-                    for record in records
-                    if record["OrderID"] and record["ProductID"]
-                ]
+        sources = [*sources, *(save_upload(upload) for upload in uploads)]
+        job = submit_job(sources)
+        return Response(
+            {
+                "status": "success",
+                "message": "Upload queued",
+                "data": {"job_id": job.id, "job_status": job.status},
+            },
+            status=202,
+            headers={"Location": f"/data_loader/jobs/{job.id}"},
+        )
 
-                execute_values(
-                    cursor,
-                    """
-                    INSERT INTO order_details (order_id, product_id, selling_price, quantity_sold)
-                    VALUES %s
-                    """,
-                    order_details_values,
-                )
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return Response(
+            {
+                "status": "error",
+                "message": "An error occurred while processing your request.",
+            },
+            status=500,
+        )
 
-                # Refresh materialized view
-                cursor.execute("REFRESH MATERIALIZED VIEW mv_order_details")
 
+@api_view(["GET"])
+def job_status(request, job_id):
+    """
+    API endpoint that reports the state and progress of an ingestion job.
+    """
+    try:
+        job = IngestionJob.objects.filter(pk=job_id).first()
+        if job is None:
             return Response(
-                {
-                    "status": "success",
-                    "message": f"Successfully inserted {len(records)} records",
-                }
+                {"status": "error", "message": "Job not found"},
+                status=404,
             )
 
-        except Exception as e:
-            logger.error(f"Error inserting data: {str(e)}")
-            logger.error(traceback.format_exc())
-            return Response(
-                {"status": "error", "message": f"Error inserting data: {str(e)}"},
-                status=500,
-            )
+        return Response(
+            {
+                "status": "success",
+                "data": {
+                    "job_id": job.id,
+                    "job_status": job.status,
+                    "finished": job.finished,
+                    "message": job.message,
+                    "rows_parsed": job.rows_parsed,
+                    "rows_inserted": job.rows_inserted,
+                    "rows_updated": job.rows_updated,
+                    "timings": job.timings,
+                    "files": job.files,
+                    "created_at": job.created_at,
+                    "started_at": job.started_at,
+                    "finished_at": job.finished_at,
+                },
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return Response(
+            {
+                "status": "error",
+                "message": "An error occurred while processing your request.",
+            },
+            status=500,
+        )
+
 
+@api_view(["GET"])
+def refresh_status(request):
+    """
+    API endpoint that reports the state of the mv_order_details refresh.
+    """
+    try:
+        state = order_details_refresher.status()
+        return Response(
+            {
+                "status": "success",
+                "data": {
+                    "view": state.view_name,
+                    "pending": state.pending,
+                    "requested_at": state.requested_at,
+                    "started_at": state.started_at,
+                    "last_refreshed_at": state.refreshed_at,
+                    "last_duration_ms": state.duration_ms,
+                    "last_error": state.last_error,
+                },
+            }
+        )
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         return Response(
@@ -222,4 +128,4 @@ def extract_order_data(request):
                 "message": "An error occurred while processing your request.",
             },
             status=500,
-        )
\ No newline at end of file
+        )
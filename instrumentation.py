@@ -0,0 +1,376 @@
+"""
+Stage timers, database query statistics and Prometheus metrics.
+
+Code that does a distinct piece of work wraps it in ``stage(name)``: loads
+time their download, parse, staging (copy engine), dimension, order,
+analyze (large loads), rollup and view refresh stages, and the chart
+endpoints their cache lookup and computation. Every database query is timed
+by an execute wrapper installed on each connection. Both are recorded into
+process-wide histograms, exposed in the Prometheus text format by
+``render_metrics``, and into the ``Timings`` of the request or job being
+run, if any, which ``collect`` sets up for the current context.
+
+Everything is a no-op with ``INSTRUMENTATION_ENABLED = False``: stages only
+read the setting, and the query wrapper is not installed.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from ecomm_dashboard.data_loader import dimensions
+from ecomm_dashboard.visualizer import statements
+
+# Upper bounds of the histogram buckets.
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def enabled():
+    """Whether instrumentation is switched on."""
+    return getattr(settings, "INSTRUMENTATION_ENABLED", True)
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format."""
+    return (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+class Counter:
+    """A counter with one label, e.g. rows per stage."""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] += amount
+
+    def samples(self):
+        """Yield ``(name, labels, value)`` for every series."""
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            yield self.name, {self.label: label_value}, value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """A histogram with one label and fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        # Label value -> [count per bucket..., count above the last, sum].
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        """Yield ``(name, labels, value)`` for every bucket, sum and count."""
+        with self._lock:
+            all_series = {key: list(series) for key, series in self._series.items()}
+        for label_value, series in sorted(all_series.items()):
+            cumulative = 0
+            bounds = [*self.buckets, "+Inf"]
+            for bound, count in zip(bounds, series[:-1]):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    {self.label: label_value, "le": bound},
+                    cumulative,
+                )
+            yield f"{self.name}_sum", {self.label: label_value}, series[-1]
+            yield f"{self.name}_count", {self.label: label_value}, cumulative
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram(
+    "ecomm_stage_duration_seconds",
+    "Time spent per loader and chart stage.",
+    "stage",
+    DURATION_BUCKETS,
+)
+STAGE_ROWS = Counter(
+    "ecomm_stage_rows_total", "Rows processed per loader stage.", "stage"
+)
+REQUEST_SECONDS = Histogram(
+    "ecomm_request_duration_seconds",
+    "Time to serve a request, per URL route.",
+    "route",
+    DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "ecomm_request_queries",
+    "Database queries run per request, per URL route.",
+    "route",
+    QUERY_COUNT_BUCKETS,
+)
+QUERY_SECONDS = Histogram(
+    "ecomm_db_query_duration_seconds",
+    "Database query time, per database alias.",
+    "alias",
+    DURATION_BUCKETS,
+)
+
+METRICS = [STAGE_SECONDS, STAGE_ROWS, REQUEST_SECONDS, REQUEST_QUERIES, QUERY_SECONDS]
+
+
+class Timings:
+    """Stage times, rows and database queries of one request or job."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_seconds = defaultdict(float)
+        self.stage_rows = defaultdict(int)
+        self.queries = 0
+        self.query_seconds = 0.0
+        # Downloads add their stage from the download threads.
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def add_stage(self, name, seconds, rows=None):
+        with self._lock:
+            self.stage_seconds[name] += seconds
+            if rows is not None:
+                self.stage_rows[name] += rows
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def as_dict(self):
+        """Return the timings in the form stored on ``IngestionJob``."""
+        with self._lock:
+            stages = {
+                name: {"seconds": round(seconds, 6), "rows": self.stage_rows.get(name)}
+                for name, seconds in self.stage_seconds.items()
+            }
+            return {
+                "stages": stages,
+                "queries": self.queries,
+                "query_seconds": round(self.query_seconds, 6),
+            }
+
+    def server_timing(self):
+        """Return a ``Server-Timing`` header value for these timings."""
+        with self._lock:
+            metrics = [
+                f"{name};dur={seconds * 1000:.1f}"
+                for name, seconds in self.stage_seconds.items()
+            ]
+            metrics.append(
+                f'db;dur={self.query_seconds * 1000:.1f};desc="queries: {self.queries}"'
+            )
+        metrics.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+_timings = contextvars.ContextVar("instrumentation_timings", default=None)
+
+
+@contextmanager
+def collect():
+    """
+    Collect the stages and queries run in this context into a new
+    ``Timings``. Work handed to other threads is only included if it runs
+    in a copy of this context (``contextvars.copy_context().run``).
+    """
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record(name, seconds, rows=None):
+    """Record ``seconds`` spent in stage ``name``, processing ``rows`` rows."""
+    if not enabled():
+        return
+    STAGE_SECONDS.observe(name, seconds)
+    if rows is not None:
+        STAGE_ROWS.inc(name, rows)
+    timings = _timings.get()
+    if timings is not None:
+        timings.add_stage(name, seconds, rows)
+
+
+class stage:
+    """
+    Time the enclosed block as stage ``name``. ``rows`` can be passed in or
+    set on the returned timer inside the block.
+    """
+
+    __slots__ = ("name", "rows", "start")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start, self.rows)
+
+
+def timed_iter(name, iterable):
+    """
+    Yield from ``iterable``, recording the time taken to produce every item
+    as stage ``name`` with the item's length as its rows.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        record(name, time.perf_counter() - start, len(item))
+        yield item
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper that times every query of a connection."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        QUERY_SECONDS.observe(context["connection"].alias, seconds)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add_query(seconds)
+
+
+def instrument_connection(connection):
+    """Install the query timer on a Django connection, once."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@receiver(connection_created)
+def instrument_new_connection(sender, connection, **kwargs):
+    if enabled():
+        instrument_connection(connection)
+
+
+def render_samples(metric_name, help_text, metric_type, samples):
+    lines = [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} {metric_type}"]
+    for name, labels, value in samples:
+        if labels:
+            label_text = ",".join(
+                f'{key}="{escape_label(label)}"' for key, label in labels.items()
+            )
+            name = f"{name}{{{label_text}}}"
+        lines.append(f"{name} {value}")
+    return lines
+
+
+def render_metrics():
+    """
+    Return this process's metrics in the Prometheus text format, with the
+    prepared-statement and dimension cache counters.
+    """
+    lines = []
+    for metric in METRICS:
+        lines += render_samples(
+            metric.name, metric.help_text, metric.type, metric.samples()
+        )
+
+    stats = statements.statement_stats()
+    for key in ("executions", "hits", "prepares", "deallocations"):
+        name = f"ecomm_prepared_statement_{key}_total"
+        lines += render_samples(
+            name,
+            f"Chart query {key} as prepared statements.",
+            "counter",
+            [(name, {}, stats[key])],
+        )
+    lines += render_samples(
+        "ecomm_prepared_statement_connections",
+        "Connections holding prepared chart statements.",
+        "gauge",
+        [("ecomm_prepared_statement_connections", {}, stats["connections"])],
+    )
+
+    cache_stats = dimensions.cache_stats()
+    for key, name, metric_type in (
+        ("hits", "ecomm_dimension_cache_hits_total", "counter"),
+        ("misses", "ecomm_dimension_cache_misses_total", "counter"),
+        ("size", "ecomm_dimension_cache_size", "gauge"),
+    ):
+        lines += render_samples(
+            name,
+            f"Dimension key cache {key}, per table.",
+            metric_type,
+            [
+                (name, {"table": table}, values[key])
+                for table, values in cache_stats.items()
+            ],
+        )
+    return "\n".join(lines) + "\n"
+
+
+def clear_metrics():
+    """Reset every histogram and counter, e.g. between tests."""
+    for metric in METRICS:
+        metric.clear()
@@ -0,0 +1,208 @@
+"""
+PostgreSQL backend that keeps psycopg2 connections in a per-process pool.
+
+Django's own pooling needs psycopg 3, while the loader relies on psycopg2's
+``execute_values`` and ``copy_expert``. A database configured with ``POOL``
+hands its connections back to a pool instead of closing them, so a request
+reuses an authenticated connection instead of paying a TCP, TLS and auth
+handshake. Every database alias has its own pool::
+
+    "POOL": {
+        "MAX_SIZE": 10,        # connections per process
+        "TIMEOUT": 10,         # seconds to wait for a free connection
+        "MAX_IDLE": 300,       # close connections idle for longer
+        "MAX_LIFETIME": 1800,  # replace connections older than this
+    }
+
+As with Django's pooling, ``CONN_MAX_AGE`` must be 0. With
+``CONN_HEALTH_CHECKS`` a pooled connection is checked with ``SELECT 1``
+before it is handed out again.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+Database = base.Database
+
+POOL_DEFAULTS = {
+    "MAX_SIZE": 10,
+    "TIMEOUT": 10,
+    "MAX_IDLE": 300,
+    "MAX_LIFETIME": 1800,
+}
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of psycopg2 connections."""
+
+    def __init__(self, max_size, timeout, max_idle, max_lifetime, check):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.pid = os.getpid()
+        self.closed = False
+        # Idle connections hold no slot, and one is only opened when none is
+        # idle, so a process never has more than max_size connections.
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._opened_at = {}
+
+    def getconn(self, connect):
+        """Return a pooled connection, opening one with ``connect()`` if needed."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError(
+                f"No database connection became free within {self.timeout}s"
+            )
+        try:
+            while (connection := self._pop_idle()) is not None:
+                if self._usable(connection):
+                    return connection
+                self._discard(connection)
+            connection = connect()
+            with self._lock:
+                self._opened_at[connection] = time.monotonic()
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection):
+        """Return a connection taken with ``getconn()`` to the pool."""
+        try:
+            keep = not self.closed and not connection.closed
+            if keep and connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+                keep = connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+        except Database.Error:
+            keep = False
+
+        try:
+            if keep:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection; connections in use close when returned."""
+        self.closed = True
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _pop_idle(self):
+        # Take the most recently used connection, so surplus connections stay
+        # idle at the other end and expire.
+        stale = []
+        found = None
+        now = time.monotonic()
+        with self._lock:
+            while self._idle and found is None:
+                connection, returned_at = self._idle.pop()
+                if (
+                    now - returned_at > self.max_idle
+                    or now - self._opened_at[connection] > self.max_lifetime
+                ):
+                    stale.append(connection)
+                else:
+                    found = connection
+            while self._idle and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.popleft()[0])
+        for connection in stale:
+            self._discard(connection)
+        return found
+
+    def _usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Database.Error:
+            return False
+        return True
+
+    def _discard(self, connection):
+        with self._lock:
+            self._opened_at.pop(connection, None)
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _psycopg2_pools = {}
+    _psycopg2_pools_lock = threading.Lock()
+
+    # The pool the current connection was taken from; it must go back there
+    # even if the alias's pool has been replaced since.
+    _connection_source = None
+
+    @property
+    def connection_pool(self):
+        """The pool of this database alias, or None if it is not pooled."""
+        options = self.settings_dict.get("POOL")
+        if self.alias == NO_DB_ALIAS or not options:
+            return None
+        if self.settings_dict["CONN_MAX_AGE"] != 0:
+            raise ImproperlyConfigured(
+                "Pooling doesn't support persistent connections."
+            )
+
+        with self._psycopg2_pools_lock:
+            pool = self._psycopg2_pools.get(self.alias)
+            # Connections must not be shared with a forked worker.
+            if pool is None or pool.closed or pool.pid != os.getpid():
+                options = {**POOL_DEFAULTS, **options}
+                pool = ConnectionPool(
+                    max_size=options["MAX_SIZE"],
+                    timeout=options["TIMEOUT"],
+                    max_idle=options["MAX_IDLE"],
+                    max_lifetime=options["MAX_LIFETIME"],
+                    check=self.settings_dict["CONN_HEALTH_CHECKS"],
+                )
+                self._psycopg2_pools[self.alias] = pool
+        return pool
+
+    def close_pool(self):
+        # Called when test databases are created and destroyed. Aliases that
+        # mirror this one share its database, so every pool is closed.
+        super().close_pool()
+        with self._psycopg2_pools_lock:
+            pools = list(self._psycopg2_pools.values())
+            self._psycopg2_pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def get_new_connection(self, conn_params):
+        pool = self.connection_pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connect = super().get_new_connection
+        connection = pool.getconn(lambda: connect(conn_params))
+        self._connection_source = pool
+        return connection
+
+    def _close(self):
+        pool = self._connection_source
+        if pool is None or self.connection is None:
+            return super()._close()
+        self._connection_source = None
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+            self.connection = None
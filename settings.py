@@ -39,10 +39,14 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    "ecomm_dashboard.visualizer",
+    "ecomm_dashboard.data_loader",
 ]
 
 MIDDLEWARE = [
+    "ecomm_dashboard.visualizer.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "ecomm_dashboard.visualizer.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -74,16 +78,99 @@ WSGI_APPLICATION = "ecomm_dashboard.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+#
+# Dashboard reads ("default") and ingestion ("ingestion") connect to the same
+# database through separate per-process connection pools (see
+# ecomm_dashboard/pooled_postgresql), so a large load cannot take the
+# connections serving the charts. Connections return to their pool after
+# every request and are health-checked before reuse. Statements on "default"
+# are cancelled after DATABASE_STATEMENT_TIMEOUT_MS; loads, view refreshes and
+# maintenance commands run on "ingestion" without a timeout.
+
+DATABASE = {
+    "ENGINE": "ecomm_dashboard.pooled_postgresql",
+    "NAME": "postgres",
+    "USER": "postgres",
+    "PASSWORD": os.environ.get("DATABASE_PASSWORD"),
+    "HOST": os.environ.get(
+        "DATABASE_HOST", "ecomm.ck72vh0ahefl.ap-south-1.rds.amazonaws.com"
+    ),
+    "PORT": os.environ.get("DATABASE_PORT", "5432"),
+    "CONN_MAX_AGE": 0,
+    "CONN_HEALTH_CHECKS": True,
+}
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": "postgres",
-        "USER": "postgres",
-        "PASSWORD": os.environ.get("DATABASE_PASSWORD"),
-        "HOST": "ecomm.ck72vh0ahefl.ap-south-1.rds.amazonaws.com",
-        "PORT": "5432",
+        **DATABASE,
+        "OPTIONS": {
+            "options": "-c statement_timeout={}".format(
+                os.environ.get("DATABASE_STATEMENT_TIMEOUT_MS", "30000")
+            ),
+        },
+        "POOL": {
+            "MAX_SIZE": int(os.environ.get("DATABASE_POOL_SIZE", 10)),
+            "TIMEOUT": 10,
+        },
+    },
+    "ingestion": {
+        **DATABASE,
+        "OPTIONS": {"options": "-c statement_timeout=0"},
+        "POOL": {
+            # Job workers plus the materialized view refresher.
+            "MAX_SIZE": int(os.environ.get("DATA_LOADER_POOL_SIZE", 4)),
+            "TIMEOUT": 60,
+        },
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+# Read replicas of the database, e.g.
+# DATABASE_REPLICA_HOSTS=replica-1.example.com,replica-2.example.com. The
+# chart and summary queries are routed to a replica once it has replayed the
+# current orders data version, and to the primary until then; everything
+# else stays on the primary.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_HOSTS", "").split(","))
+):
+    DATABASE_REPLICAS.append(f"replica_{index}")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
     }
+
+# How long a replica is trusted to still have the data version it was last
+# seen at before it is checked again.
+DATABASE_REPLICA_CHECK_SECONDS = int(
+    os.environ.get("DATABASE_REPLICA_CHECK_SECONDS", 30)
+)
+
+DATABASE_ROUTERS = ["ecomm_dashboard.visualizer.routers.ReplicaRouter"]
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Chart responses are cached under the "visualizer" alias. Keys embed the
+# orders data version, so no TTL is needed. LocMemCache evicts least recently
+# used entries past MAX_ENTRIES; for a cache shared between workers switch to
+# e.g. "django.core.cache.backends.filebased.FileBasedCache" with a directory
+# LOCATION, or a Redis/Memcached backend.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "visualizer": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "visualizer",
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+            "CULL_FREQUENCY": 4,
+        },
+    },
 }
 
 
@@ -132,3 +219,70 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 100,
 }
+
+# The ASGI entry point serves the chart endpoints with async views, which
+# run their queries on this many threads (one read connection each).
+VISUALIZER_ASYNC_VIEWS = os.environ.get("VISUALIZER_ASYNC_VIEWS") == "1"
+VISUALIZER_ASYNC_WORKERS = DATABASES["default"]["POOL"]["MAX_SIZE"]
+
+# Responses at least this large are compressed with brotli or gzip.
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+
+# Chart queries run as server-side prepared statements, kept per connection
+# up to the max. Disable behind a transaction-mode pooler such as PgBouncer.
+VISUALIZER_PREPARED_STATEMENTS = (
+    os.environ.get("VISUALIZER_PREPARED_STATEMENTS", "1") == "1"
+)
+VISUALIZER_PREPARED_STATEMENTS_MAX = 200
+
+# Stage timers, per-request query counts, Server-Timing headers and the
+# /metrics endpoint. Disabled, they cost next to nothing.
+INSTRUMENTATION_ENABLED = os.environ.get("INSTRUMENTATION_ENABLED", "1") == "1"
+
+# Materialized view refreshes requested by uploads are debounced by this many
+# seconds, but never postponed longer than the max delay.
+MV_REFRESH_DEBOUNCE_SECONDS = 5
+MV_REFRESH_MAX_DELAY_SECONDS = 60
+
+# Database alias used by uploads, view refreshes and maintenance commands.
+DATA_LOADER_DATABASE = "ingestion"
+
+# Uploaded CSVs are parsed and written this many rows at a time, using the
+# "copy" engine (COPY into a staging table, then set-based merges) or the
+# "insert" engine (multi-row INSERTs via execute_values).
+DATA_LOADER_CHUNK_ROWS = 50_000
+DATA_LOADER_ENGINE = "copy"
+
+# Loads that write at least this many orders and order lines analyze the
+# month partitions they touched before refreshing the rollup.
+DATA_LOADER_ANALYZE_MIN_ROWS = 100_000
+
+# Each loader process caches up to this many platform, product, customer and
+# address keys per table, so rows that already exist are not sent again.
+DATA_LOADER_DIMENSION_CACHE_SIZE = 100_000
+
+# Uploaded CSVs are parsed and normalized by this many worker processes per
+# loader process, in blocks of about DATA_LOADER_PARSE_BLOCK_BYTES; 0 parses
+# them on the thread running the load.
+DATA_LOADER_PARSE_WORKERS = int(os.environ.get("DATA_LOADER_PARSE_WORKERS", 0))
+DATA_LOADER_PARSE_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Uploads may name CSV files under this directory besides Google Drive links,
+# and uploaded files are kept in its "uploads" directory until their job has
+# run. Every process running jobs must see the same directory. Unset (the
+# default), only Drive links are accepted; ingest_files/ next to this file is
+# ignored by git for local use.
+DATA_LOADER_FILE_ROOT = os.environ.get("DATA_LOADER_FILE_ROOT")
+
+# Uploads run as background jobs; at most this many run at once across all
+# processes, so ingestion cannot take over the database from dashboard reads.
+DATA_LOADER_MAX_CONCURRENT_JOBS = 2
+
+# Source CSVs are downloaded by this many threads, each file with its own
+# timeout (seconds) and retries with exponential backoff.
+DATA_LOADER_DOWNLOAD_WORKERS = 4
+DATA_LOADER_DOWNLOAD_TIMEOUT = 300
+DATA_LOADER_DOWNLOAD_CONNECT_TIMEOUT = 10
+DATA_LOADER_DOWNLOAD_RETRIES = 3
+DATA_LOADER_DOWNLOAD_BACKOFF = 1.0
+DATA_LOADER_DOWNLOAD_URL = "https://drive.google.com/uc?id={file_id}"
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
-from ecomm_dashboard.visualizer import views as visualizer_view
+from ecomm_dashboard.visualizer import async_views
+from ecomm_dashboard.visualizer import views as sync_views
+from ecomm_dashboard.visualizer.views import metrics, statement_stats
 from ecomm_dashboard.data_loader import views as data_loader_view
 
+# Under ASGI the chart endpoints are served by their async versions.
+visualizer_view = async_views if settings.VISUALIZER_ASYNC_VIEWS else sync_views
+
 router = routers.DefaultRouter()
 # router.register(r"users", views.UserViewSet)
 # router.register(r"groups", views.GroupViewSet)
@@ -19,5 +25,11 @@ urlpatterns = [
     ),
     path("visualizer/monthly_revenue", visualizer_view.bar_chart_monthly_revenue),
     path("visualizer/orders_summary", visualizer_view.orders_summary),
+    path("visualizer/chart_batch", visualizer_view.chart_batch),
+    path("visualizer/series", visualizer_view.chart_series),
+    path("visualizer/statement_stats", statement_stats),
+    path("metrics", metrics),
     path("data_loader/extract_order_data", data_loader_view.extract_order_data),
+    path("data_loader/jobs/<uuid:job_id>", data_loader_view.job_status),
+    path("data_loader/refresh_status", data_loader_view.refresh_status),
 ]
@@ -3,4 +3,5 @@ from django.apps import AppConfig
 
 class VisualizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'visualizer'
+    name = 'ecomm_dashboard.visualizer'
+    label = 'visualizer'
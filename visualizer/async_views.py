@@ -0,0 +1,175 @@
+"""
+Async versions of the chart endpoints, served when running under ASGI.
+
+The views never block the event loop. The ETag check, cache lookup, queries
+and payload building run on a thread pool sized to the read connection pool,
+so one process can hold many concurrent dashboard polls open while at most
+that many of them use a database connection at a time.
+"""
+
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from ecomm_dashboard.visualizer.cache import resolve_chart_response
+from ecomm_dashboard.visualizer.renderers import select_renderer
+from ecomm_dashboard.visualizer.views import (
+    get_batch_metrics,
+    get_chart_batch,
+    get_monthly_series,
+    get_orders_summary,
+    get_request_filters,
+    get_series,
+    get_series_params,
+    read_database,
+)
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "VISUALIZER_ASYNC_WORKERS", 10),
+    thread_name_prefix="visualizer",
+)
+
+
+def run_closing_connections(func, *args):
+    """Run ``func`` and hand this thread's connections back to their pools."""
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+async def cached_chart_response(request, endpoint, filters, compute):
+    """Async counterpart of ``cache.cached_chart_response``."""
+    renderer = select_renderer(request)
+    if renderer is None:
+        return JsonResponse(
+            {"status": "error", "message": "Unsupported Accept header."}, status=406
+        )
+
+    loop = asyncio.get_running_loop()
+    # Run in a copy of this context, so the request's instrumentation sees
+    # the queries and stages of the worker thread.
+    status, data, headers = await loop.run_in_executor(
+        executor,
+        contextvars.copy_context().run,
+        run_closing_connections,
+        resolve_chart_response,
+        request,
+        endpoint,
+        filters,
+        compute,
+        renderer.format,
+    )
+    if status == 304:
+        return HttpResponse(status=304, headers=headers)
+    return HttpResponse(
+        renderer.render({"status": "success", "data": data}),
+        content_type=renderer.media_type,
+        headers=headers,
+    )
+
+
+async def chart_endpoint(request, endpoint, compute):
+    """Helper function to serve a chart endpoint with the views' error handling"""
+    try:
+        filters = get_request_filters(request)
+
+        return await cached_chart_response(
+            request, endpoint, filters, lambda version: compute(filters, version)
+        )
+
+    except ValueError as ve:
+        return JsonResponse({"status": "error", "message": str(ve)}, status=400)
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return JsonResponse(
+            {
+                "status": "error",
+                "message": "An error occurred while processing your request.",
+            },
+            status=500,
+        )
+
+
+@require_GET
+async def line_chart_monthly_sales_volume(request):
+    """API endpoint that returns sales volume based on optional filters."""
+    return await chart_endpoint(
+        request,
+        "monthly_sales_volume",
+        lambda filters, version: get_monthly_series(
+            "quantity_sold", filters, using=read_database(version)
+        ),
+    )
+
+
+@require_GET
+async def bar_chart_monthly_revenue(request):
+    """API endpoint that returns revenue based on optional filters."""
+    return await chart_endpoint(
+        request,
+        "monthly_revenue",
+        lambda filters, version: get_monthly_series(
+            "selling_price", filters, using=read_database(version)
+        ),
+    )
+
+
+@require_GET
+async def orders_summary(request):
+    """API endpoint that returns order totals based on optional filters."""
+    return await chart_endpoint(
+        request,
+        "orders_summary",
+        lambda filters, version: get_orders_summary(
+            filters, using=read_database(version)
+        ),
+    )
+
+
+@require_GET
+async def chart_batch(request):
+    """
+    API endpoint that returns several chart series and the order summary for
+    one set of filters, computed with a single grouped query.
+    """
+    try:
+        metrics = get_batch_metrics(request)
+    except ValueError as ve:
+        return JsonResponse({"status": "error", "message": str(ve)}, status=400)
+
+    return await chart_endpoint(
+        request,
+        f"chart_batch:{','.join(metrics)}",
+        lambda filters, version: get_chart_batch(
+            metrics, filters, using=read_database(version)
+        ),
+    )
+
+
+@require_GET
+async def chart_series(request):
+    """
+    API endpoint that returns metrics per day, week, month, quarter or year,
+    optionally broken down by up to two dimensions, based on optional filters.
+    """
+    try:
+        grain, group_by, metrics = get_series_params(request)
+    except ValueError as ve:
+        return JsonResponse({"status": "error", "message": str(ve)}, status=400)
+
+    return await chart_endpoint(
+        request,
+        f"chart_series:{grain}:{','.join(group_by)}:{','.join(metrics)}",
+        lambda filters, version: get_series(
+            grain, group_by, metrics, filters, using=read_database(version)
+        ),
+    )
@@ -0,0 +1,87 @@
+"""
+Response cache for the chart endpoints.
+
+Entries are keyed on the endpoint, the normalized filters and the current
+orders data version. Every successful load bumps that version, so stale
+entries are never served and simply age out of the backend configured under
+``CACHES["visualizer"]``. The same key doubles as the response ETag, which
+lets polling dashboards revalidate with ``If-None-Match`` and get a 304
+without the chart being recomputed.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader.models import DataVersion
+
+CACHE_ALIAS = "visualizer"
+
+
+def normalize_filters(filters):
+    """Helper function to drop empty filters and canonicalize their values"""
+    normalized = {}
+    for key, value in filters.items():
+        if value is None or not str(value).strip():
+            continue
+        normalized[key] = ",".join(part.strip() for part in str(value).split(","))
+    return normalized
+
+
+def chart_cache_key(endpoint, filters, version):
+    """Helper function to build the cache key and ETag for a chart request"""
+    payload = json.dumps(
+        [endpoint, version, normalize_filters(filters)], sort_keys=True
+    )
+    return f"chart:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def etag_matches(request, etag):
+    """Helper function to check an If-None-Match header against an ETag"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def resolve_chart_response(request, endpoint, filters, compute, media_format="json"):
+    """
+    Return the status, ``data`` payload and headers of a chart response.
+
+    ``compute`` is only called on a cache miss, with the orders data version
+    the response is cached under, and must return the ``data`` payload;
+    exceptions it raises propagate to the view unchanged. The payload is
+    None when the client's copy is still current (304). The payload is
+    cached once for every format, but each format gets its own ETag.
+    """
+    version = DataVersion.current(DataVersion.ORDERS)
+    key = chart_cache_key(endpoint, filters, version)
+    etag = key if media_format == "json" else f"{key}.{media_format}"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache", "Vary": "Accept"}
+
+    if etag_matches(request, headers["ETag"]):
+        return 304, None, headers
+
+    cache = caches[CACHE_ALIAS]
+    with instrumentation.stage("cache"):
+        data = cache.get(key)
+    if data is None:
+        with instrumentation.stage("compute"):
+            data = compute(version)
+        cache.set(key, data, timeout=None)
+
+    return 200, data, headers
+
+
+def cached_chart_response(request, endpoint, filters, compute):
+    """Return the chart response for ``filters``, computing it only on a miss."""
+    status, data, headers = resolve_chart_response(
+        request, endpoint, filters, compute, request.accepted_renderer.format
+    )
+    if status == 304:
+        return Response(status=304, headers=headers)
+    return Response({"status": "success", "data": data}, headers=headers)
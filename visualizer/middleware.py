@@ -0,0 +1,94 @@
+"""
+Response compression for large chart payloads, and request instrumentation.
+
+``CompressionMiddleware`` extends Django's ``GZipMiddleware`` to prefer
+brotli when the client accepts it and the ``brotli`` package is installed,
+and to leave responses smaller than ``RESPONSE_COMPRESSION_MIN_BYTES``
+uncompressed, since compressing a few hundred bytes costs more than it
+saves.
+
+``InstrumentationMiddleware`` records the duration and database query count
+of every request per URL route, and reports the stages and queries of
+chart responses in a ``Server-Timing`` header.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from ecomm_dashboard import instrumentation
+
+# Fast enough for responses built per request, and still smaller than gzip.
+BROTLI_QUALITY = 4
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.streaming:
+            return super().process_response(request, response)
+        min_bytes = getattr(settings, "RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+        if len(response.content) < min_bytes or response.has_header(
+            "Content-Encoding"
+        ):
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        # The compressed body is no longer byte-identical, as in GZipMiddleware.
+        if (etag := response.get("ETag")) and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with instrumentation.collect() as timings:
+            response = self.get_response(request)
+        return self.record(request, response, timings)
+
+    async def __acall__(self, request):
+        with instrumentation.collect() as timings:
+            response = await self.get_response(request)
+        return self.record(request, response, timings)
+
+    def record(self, request, response, timings):
+        match = request.resolver_match
+        route = match.route if match is not None else "unmatched"
+        instrumentation.REQUEST_SECONDS.observe(route, timings.elapsed)
+        instrumentation.REQUEST_QUERIES.observe(route, timings.queries)
+        if route.startswith("visualizer/"):
+            response.headers["Server-Timing"] = timings.server_timing()
+        return response
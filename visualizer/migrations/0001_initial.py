@@ -0,0 +1,98 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.CharField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=32)),
+                ('contact_email', models.CharField(max_length=255)),
+            ],
+            options={
+                'db_table': 'customer',
+            },
+        ),
+        migrations.CreateModel(
+            name='Platform',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=32, unique=True)),
+            ],
+            options={
+                'db_table': 'platform',
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerAddressDetails',
+            fields=[
+                ('id', models.CharField(primary_key=True, serialize=False)),
+                ('street', models.CharField(max_length=32)),
+                ('city', models.CharField(max_length=255)),
+                ('state', models.CharField(max_length=255)),
+                ('pincode', models.IntegerField()),
+                ('customer_id', models.ForeignKey(db_column='customer_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.customer')),
+            ],
+            options={
+                'db_table': 'customer_address_details',
+            },
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.CharField(primary_key=True, serialize=False)),
+                ('date_of_sale', models.DateField()),
+                ('delivery_date', models.DateField()),
+                ('delivery_status', models.CharField(max_length=31)),
+                ('meta_data', models.JSONField()),
+                ('customer_address_details_id', models.ForeignKey(db_column='customer_address_details_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.customeraddressdetails')),
+                ('customer_id', models.ForeignKey(db_column='customer_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.customer')),
+                ('platform_id', models.ForeignKey(db_column='platform_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.platform')),
+            ],
+            options={
+                'db_table': 'orders',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderDetails',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('product_id', models.CharField(max_length=16)),
+                ('selling_price', models.FloatField()),
+                ('quantity_sold', models.IntegerField()),
+                ('order_id', models.ForeignKey(db_column='order_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.order')),
+            ],
+            options={
+                'db_table': 'order_details',
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='platform_id',
+            field=models.ForeignKey(db_column='platform_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.platform'),
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('product_key', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_id', models.CharField(db_column='id', max_length=16)),
+                ('name', models.CharField(max_length=32)),
+                ('category', models.CharField(max_length=32)),
+                ('platform_id', models.ForeignKey(db_column='platform_id', on_delete=django.db.models.deletion.CASCADE, to='visualizer.platform')),
+            ],
+            options={
+                'db_table': 'product',
+                'unique_together': {('product_id', 'name', 'category', 'platform_id')},
+            },
+        ),
+    ]
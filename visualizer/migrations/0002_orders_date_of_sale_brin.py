@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:43
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Build the index without blocking loads into a populated orders table.
+    atomic = False
+
+    dependencies = [
+        ('visualizer', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['date_of_sale'], name='orders_date_of_sale_brin'),
+        ),
+    ]
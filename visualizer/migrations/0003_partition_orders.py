@@ -0,0 +1,119 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Rebuilds orders and order_details as tables range-partitioned by month on
+# date_of_sale, with one partition per month that has data (<table>_pYYYY_MM).
+# order_details gets its order's date_of_sale so both tables share the
+# partition key. A partitioned table's unique constraints must include the
+# partition key, so the primary keys become (id, date_of_sale) and
+# order_details references orders on (order_id, date_of_sale).
+#
+# The existing rows are copied in one transaction, so on a large database
+# apply this in a maintenance window. mv_order_details depends on both
+# tables; it is dropped here and recreated by data_loader 0007.
+PARTITION_SQL = """
+DROP MATERIALIZED VIEW IF EXISTS mv_order_details;
+
+CREATE TABLE orders_partitioned (LIKE orders INCLUDING DEFAULTS)
+    PARTITION BY RANGE (date_of_sale);
+
+CREATE TABLE order_details_partitioned (
+    LIKE order_details INCLUDING DEFAULTS,
+    date_of_sale date NOT NULL
+) PARTITION BY RANGE (date_of_sale);
+-- A serial id of a table created before these migrations would keep its
+-- sequence, owned by the table dropped below, as the default.
+ALTER TABLE order_details_partitioned ALTER COLUMN id DROP DEFAULT;
+
+DO $$
+DECLARE
+    month date;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', date_of_sale)::date FROM orders
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF orders_partitioned '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'orders_p' || to_char(month, 'YYYY_MM'),
+            month,
+            (month + INTERVAL '1 month')::date
+        );
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF order_details_partitioned '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'order_details_p' || to_char(month, 'YYYY_MM'),
+            month,
+            (month + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO orders_partitioned SELECT * FROM orders;
+
+INSERT INTO order_details_partitioned
+    (id, order_id, product_id, selling_price, quantity_sold, date_of_sale)
+SELECT od.id, od.order_id, od.product_id, od.selling_price, od.quantity_sold,
+       o.date_of_sale
+FROM order_details od
+INNER JOIN orders o ON o.id = od.order_id;
+
+DROP TABLE order_details;
+DROP TABLE orders;
+ALTER TABLE orders_partitioned RENAME TO orders;
+ALTER TABLE order_details_partitioned RENAME TO order_details;
+
+ALTER TABLE orders
+    ADD CONSTRAINT orders_pkey PRIMARY KEY (id, date_of_sale),
+    ADD CONSTRAINT orders_customer_id_fk FOREIGN KEY (customer_id)
+        REFERENCES customer (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT orders_customer_address_details_id_fk
+        FOREIGN KEY (customer_address_details_id)
+        REFERENCES customer_address_details (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT orders_platform_id_fk FOREIGN KEY (platform_id)
+        REFERENCES platform (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX orders_customer_id ON orders (customer_id);
+CREATE INDEX orders_customer_address_details_id
+    ON orders (customer_address_details_id);
+CREATE INDEX orders_platform_id ON orders (platform_id);
+CREATE INDEX orders_date_of_sale_brin ON orders USING brin (date_of_sale);
+
+-- Identity columns are not supported on partitioned tables before
+-- Postgres 17, so order_details.id draws from a plain sequence.
+CREATE SEQUENCE order_details_id_seq OWNED BY order_details.id;
+SELECT setval('order_details_id_seq', COALESCE(MAX(id), 0) + 1, false)
+FROM order_details;
+ALTER TABLE order_details
+    ALTER COLUMN id SET DEFAULT nextval('order_details_id_seq'),
+    ADD CONSTRAINT order_details_pkey PRIMARY KEY (id, date_of_sale),
+    ADD CONSTRAINT order_details_order_fk FOREIGN KEY (order_id, date_of_sale)
+        REFERENCES orders (id, date_of_sale) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX order_details_order_id ON order_details (order_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0002_orders_date_of_sale_brin'),
+        ('data_loader', '0006_mv_order_details_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(PARTITION_SQL)],
+            state_operations=[
+                migrations.AddField(
+                    model_name='orderdetails',
+                    name='date_of_sale',
+                    field=models.DateField(default=None),
+                    preserve_default=False,
+                ),
+                migrations.AlterField(
+                    model_name='orderdetails',
+                    name='order_id',
+                    field=models.ForeignKey(db_column='order_id', db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='visualizer.order'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# Databases created before these migrations existed were migrated with
+# --fake-initial, which skips 0001 and leaves product without the
+# product_key surrogate key the models and mv_order_details use. Adds it,
+# numbering the existing rows, and makes it the primary key if product has
+# none. Does nothing on databases whose product table 0001 created.
+PRODUCT_KEY_SQL = """
+ALTER TABLE product ADD COLUMN IF NOT EXISTS product_key bigserial;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'product'::regclass AND contype = 'p'
+    ) THEN
+        ALTER TABLE product ADD PRIMARY KEY (product_key);
+    END IF;
+END $$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0004_order_fingerprints'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PRODUCT_KEY_SQL, migrations.RunSQL.noop),
+    ]
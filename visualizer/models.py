@@ -1,12 +1,12 @@
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 
 # Create your models here.
-from django.db import models
 
 
 class Platform(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=32)
+    name = models.CharField(max_length=32, unique=True)
 
     class Meta:
         app_label = "visualizer"
@@ -17,15 +17,20 @@ class Platform(models.Model):
 
 
 class Product(models.Model):
-    id = models.CharField(max_length=16)
+    # The same product id can be listed on several platforms, so rows are
+    # identified by (id, name, category, platform_id) behind a surrogate key.
+    product_key = models.BigAutoField(primary_key=True)
+    product_id = models.CharField(max_length=16, db_column="id")
     name = models.CharField(max_length=32)
     category = models.CharField(max_length=32)
-    platform_id = models.ForeignKey(Platform, on_delete=models.CASCADE)
+    platform_id = models.ForeignKey(
+        Platform, on_delete=models.CASCADE, db_column="platform_id"
+    )
 
     class Meta:
         app_label = "visualizer"
         db_table = "product"
-        unique_together = ("id", "name", "category", "platform_id")
+        unique_together = ("product_id", "name", "category", "platform_id")
 
     def __str__(self):
         return self.name + " " + str(self.platform_id)
@@ -35,7 +40,9 @@ class Customer(models.Model):
     id = models.CharField(primary_key=True)
     name = models.CharField(max_length=32)
     contact_email = models.CharField(max_length=255)
-    platform_id = models.ForeignKey(Platform, on_delete=models.CASCADE)
+    platform_id = models.ForeignKey(
+        Platform, on_delete=models.CASCADE, db_column="platform_id"
+    )
 
     class Meta:
         app_label = "visualizer"
@@ -51,7 +58,9 @@ class CustomerAddressDetails(models.Model):
     city = models.CharField(max_length=255)
     state = models.CharField(max_length=255)
     pincode = models.IntegerField()
-    customer_id = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    customer_id = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, db_column="customer_id"
+    )
 
     class Meta:
         app_label = "visualizer"
@@ -64,20 +73,35 @@ class CustomerAddressDetails(models.Model):
 
 
 class Order(models.Model):
+    # orders is range-partitioned by month on date_of_sale, so its database
+    # primary key is (id, date_of_sale); Django only sees id.
     id = models.CharField(primary_key=True)
     date_of_sale = models.DateField()
-    customer_id = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    customer_id = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, db_column="customer_id"
+    )
     customer_address_details_id = models.ForeignKey(
-        CustomerAddressDetails, on_delete=models.CASCADE
+        CustomerAddressDetails,
+        on_delete=models.CASCADE,
+        db_column="customer_address_details_id",
+    )
+    platform_id = models.ForeignKey(
+        Platform, on_delete=models.CASCADE, db_column="platform_id"
     )
-    platform_id = models.ForeignKey(Platform, on_delete=models.CASCADE)
     delivery_date = models.DateField()
     delivery_status = models.CharField(max_length=31)
     meta_data = models.JSONField()
+    # Fingerprint of the loaded values; the loader skips unchanged orders.
+    row_hash = models.BigIntegerField(null=True)
 
     class Meta:
         app_label = "visualizer"
         db_table = "orders"
+        indexes = [
+            # Orders arrive roughly in date order, so a BRIN index serves the
+            # month ranges the rollup refresh scans at a fraction of a B-tree.
+            BrinIndex(fields=["date_of_sale"], name="orders_date_of_sale_brin"),
+        ]
 
     def __str__(self):
         return (
@@ -98,14 +122,28 @@ class Order(models.Model):
 
 
 class OrderDetails(models.Model):
+    # Partitioned like orders: the primary key is (id, date_of_sale) and
+    # (order_id, date_of_sale) references orders (id, date_of_sale).
     id = models.AutoField(primary_key=True)
-    order_id = models.ForeignKey(Order, on_delete=models.CASCADE)
-    product_id = models.ForeignKey(Product, on_delete=models.CASCADE)
+    order_id = models.ForeignKey(
+        Order, on_delete=models.CASCADE, db_column="order_id", db_constraint=False
+    )
+    date_of_sale = models.DateField()
+    product_id = models.CharField(max_length=16)
     selling_price = models.FloatField()
+    quantity_sold = models.IntegerField()
+    row_hash = models.BigIntegerField(null=True)
 
     class Meta:
         app_label = "visualizer"
         db_table = "order_details"
+        constraints = [
+            # One line per product and order, so loads can upsert lines.
+            models.UniqueConstraint(
+                fields=["order_id", "date_of_sale", "product_id"],
+                name="order_details_natural_key",
+            ),
+        ]
 
     def __str__(self):
         return str(self.order_id) + " " + str(self.product_id)
@@ -0,0 +1,144 @@
+"""
+Renderers for the chart endpoints, chosen by the ``Accept`` header.
+
+Chart payloads are columnar, a ``labels`` array plus one array per series,
+so they do not need DRF's generic encoder or the browsable API:
+
+* ``application/json`` is rendered with orjson when it is installed, which
+  also serializes NumPy arrays directly, and with DRF's encoder otherwise;
+* ``application/vnd.apache.arrow.stream`` (or ``?format=arrow``) returns the
+  payload as an Arrow IPC stream with one column per series, when pyarrow
+  is installed.
+"""
+
+import json
+from decimal import Decimal
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.request import Request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def json_default(value):
+    """Serialize the values orjson does not handle like DRF's encoder does."""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Compact JSON rendered with orjson."""
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(
+            data, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+def arrow_column(values):
+    """Return ``values`` as an Arrow array, with Decimals as floats like JSON."""
+    column = pyarrow.array(values)
+    if pyarrow.types.is_decimal(column.type):
+        column = column.cast(pyarrow.float64())
+    return column
+
+
+def chart_table(payload):
+    """
+    Return a chart response payload as an Arrow table.
+
+    Charts become a ``labels`` column plus one column per series; series of
+    the series endpoint are named ``<group values>/<metric>`` and carry their
+    group as field metadata. Anything else, such as the orders summary or an
+    error, becomes a single row with one column per field.
+    """
+    data = payload.get("data", payload)
+    metadata = {"status": str(payload.get("status", ""))}
+
+    if "labels" not in data:
+        return pyarrow.table(
+            {key: arrow_column([value]) for key, value in data.items()},
+            metadata=metadata,
+        )
+
+    fields = [pyarrow.field("labels", pyarrow.string())]
+    columns = [pyarrow.array(data["labels"], pyarrow.string())]
+    series = data.get("series", {"values": data.get("values", [])})
+    if isinstance(series, dict):
+        for name, values in series.items():
+            column = arrow_column(values)
+            fields.append(pyarrow.field(name, column.type))
+            columns.append(column)
+    else:
+        for entry in series:
+            prefix = "".join(f"{value}/" for value in entry["group"].values())
+            group = json.dumps(entry["group"])
+            for metric, values in entry["values"].items():
+                column = arrow_column(values)
+                fields.append(
+                    pyarrow.field(
+                        prefix + metric,
+                        column.type,
+                        metadata={"group": group, "metric": metric},
+                    )
+                )
+                columns.append(column)
+
+    if "summary" in data:
+        metadata["summary"] = json.dumps(data["summary"], default=json_default)
+    return pyarrow.Table.from_arrays(
+        columns, schema=pyarrow.schema(fields, metadata=metadata)
+    )
+
+
+class ArrowRenderer(BaseRenderer):
+    """Chart payloads as an Arrow IPC stream."""
+
+    media_type = ARROW_MEDIA_TYPE
+    format = "arrow"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        table = chart_table(data)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+CHART_RENDERERS = [ORJSONRenderer if orjson is not None else JSONRenderer]
+if pyarrow is not None:
+    CHART_RENDERERS.append(ArrowRenderer)
+
+
+def select_renderer(request):
+    """Return the chart renderer for a Django ``request``, or None (406)."""
+    renderers = [renderer() for renderer in CHART_RENDERERS]
+    try:
+        renderer, _ = DefaultContentNegotiation().select_renderer(
+            Request(request), renderers
+        )
+    except NotAcceptable:
+        return None
+    return renderer
@@ -0,0 +1,91 @@
+"""
+Database router sending dashboard reads to read replicas.
+
+Replicas are the aliases listed in ``DATABASE_REPLICAS``. Only reads of the
+visualizer app are routed to them; ingestion, job and refresh state, writes
+and migrations stay on ``default``. The chart endpoints pass the orders data
+version their response is cached under as the ``data_version`` hint, and a
+replica only serves the read once it has replayed that version. Right after
+a load every replica is behind, so reads fall back to the primary until one
+catches up. A version seen on a replica is trusted for
+``DATABASE_REPLICA_CHECK_SECONDS``, and forgotten as soon as the replica
+cannot be reached, so a replica that fails over or is restored from an older
+copy is checked again.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+from ecomm_dashboard.data_loader.models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """Routes visualizer reads to a replica that is caught up, else the primary."""
+
+    def __init__(self, replicas=None):
+        if replicas is None:
+            replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        self.replicas = list(replicas)
+        self._next = itertools.cycle(range(len(self.replicas) or 1))
+        self._lock = threading.Lock()
+        self.check_seconds = getattr(settings, "DATABASE_REPLICA_CHECK_SECONDS", 30)
+        # Highest orders version each replica has been seen at, and when it
+        # was last read from the replica.
+        self._seen_versions = {}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != "visualizer" or not self.replicas:
+            return None
+        version = hints.get("data_version")
+        if version is None:
+            version = DataVersion.current(DataVersion.ORDERS)
+        return self.replica_for(version) or DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are read-only copies of the primary.
+        if db in self.replicas:
+            return False
+        return None
+
+    def replica_for(self, version):
+        """Return a replica that has replayed ``version``, or None."""
+        with self._lock:
+            start = next(self._next)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.seen_version(alias) >= version:
+                return alias
+            try:
+                seen = DataVersion.current(DataVersion.ORDERS, using=alias)
+            except DatabaseError as e:
+                logger.warning(f"Replica {alias} is unavailable: {str(e)}")
+                self.forget(alias)
+                continue
+            with self._lock:
+                self._seen_versions[alias] = (seen, time.monotonic())
+            if seen >= version:
+                return alias
+        return None
+
+    def seen_version(self, alias):
+        """
+        Return the version ``alias`` was last seen at, or -1 if it was not
+        seen within the last ``check_seconds``.
+        """
+        with self._lock:
+            seen, checked_at = self._seen_versions.get(alias, (-1, None))
+        if checked_at is None or time.monotonic() - checked_at > self.check_seconds:
+            return -1
+        return seen
+
+    def forget(self, alias):
+        """Check ``alias`` again before the next read it serves."""
+        with self._lock:
+            self._seen_versions.pop(alias, None)
@@ -0,0 +1,108 @@
+"""
+Server-side prepared statements for the chart queries.
+
+The chart helpers build their SQL from the filters present, and psycopg2
+sends every query as plain text, so Postgres parses and plans each request
+again. ``execute`` names a statement after a hash of its SQL, PREPAREs it
+the first time a connection runs it and EXECUTEs it by name from then on.
+Filter values are passed as parameters (see ``build_filter_conditions``),
+so the number of statements is bounded by the filter combinations, not the
+values. Pooled connections keep their statements across requests, and after
+a few executions Postgres can reuse a generic plan instead of planning again.
+
+Prepared statements belong to a database session, so they do not work
+behind a transaction-mode pooler such as PgBouncer; set
+``VISUALIZER_PREPARED_STATEMENTS = False`` there.
+"""
+
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError
+
+# SQLSTATE invalid_sql_statement_name, raised when a statement we prepared
+# was dropped from the session, e.g. by DISCARD ALL.
+UNKNOWN_STATEMENT = "26000"
+
+# Statements prepared on each psycopg2 connection, least recently used first.
+# A Django connection is only used by one thread at a time, so the lock only
+# guards this mapping and the counters.
+_prepared = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_stats = {"executions": 0, "hits": 0, "prepares": 0, "deallocations": 0}
+
+
+def statement_name(query):
+    """Return the name ``query`` is prepared under."""
+    return "chart_" + hashlib.sha1(query.encode()).hexdigest()[:16]
+
+
+def positional_sql(query):
+    """Replace the ``%s`` placeholders of ``query`` with ``$1``, ``$2``, ..."""
+    parts = query.split("%s")
+    sql = parts[0]
+    for number, part in enumerate(parts[1:], start=1):
+        sql += f"${number}{part}"
+    return sql.replace("%%", "%")
+
+
+def statement_stats():
+    """Return this process's prepared-statement counters."""
+    with _lock:
+        stats = dict(_stats)
+        stats["connections"] = len(_prepared)
+    stats["hit_ratio"] = (
+        stats["hits"] / stats["executions"] if stats["executions"] else 0.0
+    )
+    return stats
+
+
+def execute(cursor, query, params=()):
+    """Run ``query`` on ``cursor`` as a prepared statement."""
+    if not getattr(settings, "VISUALIZER_PREPARED_STATEMENTS", True):
+        cursor.execute(query, params)
+        return
+
+    try:
+        _execute_prepared(cursor, query, params)
+    except DatabaseError as e:
+        if getattr(e.__cause__, "pgcode", None) != UNKNOWN_STATEMENT:
+            raise
+        # The session lost its statements; prepare them again.
+        with _lock:
+            _prepared.pop(cursor.db.connection, None)
+        if cursor.db.in_atomic_block:
+            raise
+        _execute_prepared(cursor, query, params)
+
+
+def _execute_prepared(cursor, query, params):
+    name = statement_name(query)
+    with _lock:
+        statements = _prepared.setdefault(cursor.db.connection, OrderedDict())
+        hit = name in statements
+        _stats["executions"] += 1
+        _stats["hits"] += hit
+
+    if hit:
+        statements.move_to_end(name)
+    else:
+        limit = getattr(settings, "VISUALIZER_PREPARED_STATEMENTS_MAX", 200)
+        while len(statements) >= limit:
+            oldest, _ = statements.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {oldest}")
+            with _lock:
+                _stats["deallocations"] += 1
+        cursor.execute(f"PREPARE {name} AS {positional_sql(query)}")
+        statements[name] = None
+        with _lock:
+            _stats["prepares"] += 1
+
+    if params:
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name}({placeholders})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
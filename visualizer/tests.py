@@ -1,3 +1,656 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import unittest
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.data_loader.models import DataVersion, IngestionJob
+from ecomm_dashboard.data_loader.pipeline import (
+    CopyOrderBatchWriter,
+    iter_csv_chunks,
+    normalize_chunk,
+)
+from ecomm_dashboard.visualizer.models import Order
+from ecomm_dashboard.visualizer import async_views, routers, statements, views
+from ecomm_dashboard.visualizer.cache import CACHE_ALIAS, resolve_chart_response
+from ecomm_dashboard.visualizer.middleware import brotli
+from ecomm_dashboard.visualizer.renderers import ARROW_MEDIA_TYPE, pyarrow
+from ecomm_dashboard.visualizer.routers import ReplicaRouter
+from ecomm_dashboard.visualizer.views import (
+    FILTER_PARAMS,
+    build_filter_conditions,
+    monthly_aggregate_query,
+)
+
+
+def make_filters(**values):
+    filters = dict.fromkeys(FILTER_PARAMS)
+    filters.update(values)
+    return filters
+
+
+def pandas_monthly_series(value_col, filters):
+    """
+    The monthly series as the chart views computed it before they moved the
+    aggregation into SQL: every matching line of mv_order_details summed by
+    month in pandas.
+    """
+    query = f"SELECT date_of_sale, {value_col} FROM mv_order_details"
+    where_conditions, params = build_filter_conditions(filters)
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        df = pd.DataFrame(cursor.fetchall(), columns=["date_of_sale", value_col])
+
+    df["date_of_sale"] = pd.to_datetime(df["date_of_sale"])
+    monthly_data = (
+        df.groupby(df["date_of_sale"].dt.strftime("%Y-%m"))[value_col]
+        .sum()
+        .reset_index()
+        .rename(columns={"date_of_sale": "month"})
+        .sort_values("month")
+    )
+    return {
+        "labels": monthly_data["month"].tolist(),
+        "values": monthly_data[value_col].tolist(),
+    }
+
+
+class ChartQueryPlanTests(TestCase):
+    """The chart queries against mv_order_details are served by its indexes."""
+
+    def explain(self, filters):
+        query, params = monthly_aggregate_query("quantity_sold", filters)
+        with connection.cursor() as cursor:
+            # The test view is empty, so take sequential scans off the table
+            # and check that a usable index exists for each filter shape.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + query, params)
+            return "\n".join(line for (line,) in cursor.fetchall())
+
+    def test_filters_use_their_index(self):
+        cases = {
+            "mv_order_details_date_of_sale": make_filters(
+                sales_date="2023-01-15,2023-02-15"
+            ),
+            "mv_order_details_category_date": make_filters(category="Books"),
+            "mv_order_details_status_date": make_filters(delivery_status="Cancelled"),
+            "mv_order_details_platform_date": make_filters(platform_id="2"),
+            "mv_order_details_state_date": make_filters(state="S1"),
+        }
+        for index, filters in cases.items():
+            with self.subTest(index=index):
+                self.assertIn(index, self.explain(filters))
+
+    def test_multi_value_filters_use_their_index(self):
+        cases = {
+            "mv_order_details_category_date": make_filters(category="Books,Toys"),
+            "mv_order_details_platform_date": make_filters(platform_id="1,2,3"),
+            "mv_order_details_state_date": make_filters(state="S1,S2"),
+        }
+        for index, filters in cases.items():
+            with self.subTest(index=index):
+                plan = self.explain(filters)
+                self.assertIn(index, plan)
+                self.assertIn("ANY", plan)
+
+    def test_negated_filters_keep_the_date_index(self):
+        # <> ALL cannot use an index, so the date range has to narrow the scan.
+        plan = self.explain(
+            make_filters(state="!S1,S2", sales_date="2023-01-15,2023-02-15")
+        )
+        self.assertIn("mv_order_details_date_of_sale", plan)
+        self.assertIn("ALL", plan)
+
+    def test_statement_does_not_depend_on_list_length(self):
+        one, _ = monthly_aggregate_query("quantity_sold", make_filters(state="S1"))
+        many, _ = monthly_aggregate_query(
+            "quantity_sold", make_filters(state="S1,S2,S3")
+        )
+        self.assertEqual(one, many)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Dashboard reads reuse pooled connections, apart from ingestion's."""
+
+    databases = {"default", "ingestion"}
+
+    def backend_pid(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            (pid,) = cursor.fetchone()
+        connection.close()
+        return pid
+
+    def test_closed_connection_is_reused(self):
+        self.assertEqual(self.backend_pid(), self.backend_pid())
+
+    def test_ingestion_has_its_own_pool(self):
+        self.assertIsNotNone(connection.connection_pool)
+        self.assertIsNot(
+            connections["ingestion"].connection_pool, connection.connection_pool
+        )
+
+
+class PreparedStatementTests(SimpleTestCase):
+    """Chart queries are prepared once per connection and executed by name."""
+
+    databases = {"default"}
+
+    def run_query(self, query, params):
+        with connection.cursor() as cursor:
+            statements.execute(cursor, query, params)
+            return cursor.fetchall()
+
+    def prepared_names(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM pg_prepared_statements")
+            return {name for (name,) in cursor.fetchall()}
+
+    def test_statement_is_prepared_once(self):
+        query = "SELECT %s::int + x FROM unnest(%s::int[]) AS x"
+        before = statements.statement_stats()
+        self.assertEqual(self.run_query(query, [1, [1, 2]]), [(2,), (3,)])
+        self.assertEqual(self.run_query(query, [10, [5]]), [(15,)])
+        after = statements.statement_stats()
+
+        self.assertEqual(after["prepares"] - before["prepares"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertIn(statements.statement_name(query), self.prepared_names())
+
+    def test_lost_statements_are_prepared_again(self):
+        query = "SELECT %s::text || 'lost'"
+        self.assertEqual(self.run_query(query, ["a"]), [("alost",)])
+        with connection.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL")
+        self.assertEqual(self.run_query(query, ["b"]), [("blost",)])
+
+    @override_settings(VISUALIZER_PREPARED_STATEMENTS_MAX=2)
+    def test_least_recently_used_statements_are_deallocated(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL")
+        statements._prepared.pop(connection.connection, None)
+
+        queries = [f"SELECT %s::int * {factor}" for factor in (2, 3, 4)]
+        for query in queries:
+            self.run_query(query, [1])
+        names = self.prepared_names()
+
+        self.assertNotIn(statements.statement_name(queries[0]), names)
+        for query in queries[1:]:
+            self.assertIn(statements.statement_name(query), names)
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Chart reads only go to a replica that has replayed their data version."""
+
+    # "ingestion" is a second connection to the test database. It stands in
+    # for a replica, and a version bump not yet committed on "default" for
+    # replication lag.
+    databases = {"default", "ingestion"}
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        router = ReplicaRouter(replicas=["ingestion"])
+        version = DataVersion.current(DataVersion.ORDERS)
+        self.assertEqual(router.db_for_read(Order, data_version=version), "ingestion")
+
+        with transaction.atomic():
+            DataVersion.bump(DataVersion.ORDERS)
+            version = DataVersion.current(DataVersion.ORDERS)
+            self.assertEqual(router.db_for_read(Order, data_version=version), "default")
+
+        self.assertEqual(router.db_for_read(Order, data_version=version), "ingestion")
+
+    def test_seen_versions_are_checked_again(self):
+        router = ReplicaRouter(replicas=["ingestion"])
+        version = DataVersion.current(DataVersion.ORDERS)
+        self.assertEqual(router.db_for_read(Order, data_version=version), "ingestion")
+
+        # The replica goes away, e.g. while it fails over.
+        current = mock.patch.object(
+            DataVersion, "current", side_effect=DatabaseError("connection refused")
+        )
+        with current:
+            self.assertEqual(
+                router.db_for_read(Order, data_version=version), "ingestion"
+            )
+            with mock.patch.object(routers.time, "monotonic", return_value=1e12):
+                self.assertEqual(
+                    router.db_for_read(Order, data_version=version), "default"
+                )
+        self.assertEqual(router.seen_version("ingestion"), -1)
+
+        self.assertEqual(router.db_for_read(Order, data_version=version), "ingestion")
+
+    def test_ingestion_state_stays_on_primary(self):
+        router = ReplicaRouter(replicas=["ingestion"])
+        self.assertIsNone(router.db_for_read(IngestionJob))
+        self.assertFalse(router.allow_migrate("ingestion", "visualizer"))
+
+
+class AsyncViewTests(SimpleTestCase):
+    """The async chart views answer like their sync counterparts."""
+
+    databases = {"default"}
+
+    def test_async_views_match_sync_views(self):
+        params = {"product_category": "Books", "date_range": "2023-01-01,2023-03-31"}
+        for name in ("line_chart_monthly_sales_volume", "orders_summary"):
+            with self.subTest(view=name):
+                caches[CACHE_ALIAS].clear()
+                expected = getattr(views, name)(RequestFactory().get("/", params))
+                expected.render()
+
+                caches[CACHE_ALIAS].clear()
+                view = async_to_sync(getattr(async_views, name))
+                response = view(AsyncRequestFactory().get("/", params))
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), expected.data)
+                self.assertEqual(response["ETag"], expected["ETag"])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_async_views_negotiate_the_format(self):
+        params = {"format": "arrow", "group_by": "category"}
+        expected = views.chart_series(RequestFactory().get("/", params))
+        expected.render()
+
+        view = async_to_sync(async_views.chart_series)
+        response = view(AsyncRequestFactory().get("/", params))
+
+        self.assertEqual(response["Content-Type"], ARROW_MEDIA_TYPE)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+
+ORDERS_CSV = """\
+OrderID,DateOfSale,Platform,ProductID,ProductName,Category,CustomerID,\
+CustomerName,ContactEmail,DeliveryAddress,DeliveryDate,DeliveryStatus,\
+SellingPrice,QuantitySold
+O1,2023-01-10,Amazon,P1,Novel,Books,C1,Ann,a@example.com,"1 Main St, Pune, MH",2023-01-12,Delivered,100.0,1
+O1,2023-01-10,Amazon,P2,Kite,Toys,C1,Ann,a@example.com,"1 Main St, Pune, MH",2023-01-12,Delivered,50.0,2
+O2,2023-01-20,Amazon,P1,Novel,Books,C2,Bo,b@example.com,"2 Hill Rd, Agra, UP",2023-01-25,Cancelled,100.0,1
+O3,2023-02-03,Meesho,P3,Ball,Toys,C2,Bo,b@example.com,"2 Hill Rd, Agra, UP",2023-02-05,Delivered,20.0,3
+"""
+
+
+class ChartCacheTests(TestCase):
+    """Chart payloads are cached per data version and revalidated by ETag."""
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.compute = mock.Mock(side_effect=lambda version: {"version": version})
+
+    def resolve(self, filters=None, media_format="json", if_none_match=None):
+        headers = {"If-None-Match": if_none_match} if if_none_match else {}
+        request = RequestFactory().get("/", headers=headers)
+        return resolve_chart_response(
+            request, "series", filters or {}, self.compute, media_format
+        )
+
+    def test_payloads_are_computed_once(self):
+        first = self.resolve({"state": "UP", "platform": ""})
+        second = self.resolve({"state": " UP"})
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], 200)
+        self.compute.assert_called_once()
+        self.assertEqual(self.resolve({"state": "MH"})[0], 200)
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_loads_invalidate_cached_payloads(self):
+        _, data, headers = self.resolve()
+        DataVersion.bump(DataVersion.ORDERS)
+        _, new_data, new_headers = self.resolve()
+
+        self.assertEqual(self.compute.call_count, 2)
+        self.assertEqual(new_data["version"], data["version"] + 1)
+        self.assertNotEqual(new_headers["ETag"], headers["ETag"])
+
+    def test_current_copies_are_not_modified(self):
+        _, _, headers = self.resolve()
+
+        status, data, not_modified_headers = self.resolve(
+            if_none_match=headers["ETag"]
+        )
+        self.assertEqual((status, data), (304, None))
+        self.assertEqual(not_modified_headers["ETag"], headers["ETag"])
+        self.assertEqual(self.resolve(if_none_match=f"W/{headers['ETag']}")[0], 304)
+        self.compute.assert_called_once()
+
+        DataVersion.bump(DataVersion.ORDERS)
+        self.assertEqual(self.resolve(if_none_match=headers["ETag"])[0], 200)
+
+    def test_each_format_has_its_own_etag(self):
+        _, json_data, json_headers = self.resolve()
+        _, arrow_data, arrow_headers = self.resolve(media_format="arrow")
+
+        self.assertEqual(json_data, arrow_data)
+        self.compute.assert_called_once()
+        self.assertNotEqual(json_headers["ETag"], arrow_headers["ETag"])
+        status, _, _ = self.resolve(
+            media_format="arrow", if_none_match=json_headers["ETag"]
+        )
+        self.assertEqual(status, 200)
+
+
+class LoadedOrdersTestCase(TestCase):
+    """Loads ORDERS_CSV and refreshes mv_order_details before each test."""
+
+    exports = [ORDERS_CSV]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for export in self.exports:
+                writer = CopyOrderBatchWriter(cursor)
+                for chunk in iter_csv_chunks(io.BytesIO(export.encode())):
+                    writer.write(normalize_chunk(chunk))
+                writer.finish()
+            cursor.execute("REFRESH MATERIALIZED VIEW mv_order_details")
+        caches[CACHE_ALIAS].clear()
+
+    def get(self, view, **params):
+        response = view(RequestFactory().get("/", params))
+        response.render()
+        return response.data["data"]
+
+
+class MonthlySeriesSourceTests(LoadedOrdersTestCase):
+    """The rollup, the view and the original pandas path agree."""
+
+    # P1 is loaded again under a new name, which gives it a second row.
+    exports = [
+        ORDERS_CSV,
+        ORDERS_CSV.splitlines()[0]
+        + "\nO4,2023-02-10,Amazon,P1,Novel 2nd ed,Books,C1,Ann,a@example.com,"
+        '"1 Main St, Pune, MH",2023-02-12,Delivered,100.0,1\n',
+    ]
+
+    def test_sources_agree(self):
+        self.assertEqual(
+            views.get_monthly_series("quantity_sold", make_filters()),
+            {"labels": ["2023-01", "2023-02"], "values": [4, 4]},
+        )
+        for filters in (
+            {},
+            {"category": "Books"},
+            {"state": "UP"},
+            {"delivery_status": "Cancelled"},
+            {"sales_date": "2023-01-01,2023-02-28"},
+        ):
+            for value_col in ("quantity_sold", "selling_price"):
+                with self.subTest(filters=filters, value_col=value_col):
+                    filters = make_filters(**filters)
+                    pandas_series = pandas_monthly_series(value_col, filters)
+
+                    self.assertEqual(
+                        views.get_monthly_series(value_col, filters), pandas_series
+                    )
+                    self.assertEqual(
+                        views.get_monthly_aggregate(value_col, filters), pandas_series
+                    )
+
+
+class ChartBatchTests(LoadedOrdersTestCase):
+    """The batch endpoint agrees with the endpoints it replaces."""
+
+    def test_batch_matches_separate_endpoints(self):
+        # O1 has lines in two categories, which the rollup counts twice.
+        for filters in ({}, {"product_category": "Toys"}, {"state": "UP"}):
+            with self.subTest(filters=filters):
+                batch = self.get(views.chart_batch, **filters)
+                volume = self.get(views.line_chart_monthly_sales_volume, **filters)
+                revenue = self.get(views.bar_chart_monthly_revenue, **filters)
+                summary = self.get(views.orders_summary, **filters)
+
+                self.assertEqual(batch["labels"], volume["labels"])
+                self.assertEqual(batch["series"]["quantity_sold"], volume["values"])
+                self.assertEqual(batch["series"]["revenue"], revenue["values"])
+                self.assertEqual(batch["summary"], summary)
+
+    def test_multi_value_and_negated_filters(self):
+        self.assertEqual(
+            self.get(views.orders_summary, state="MH,UP"),
+            self.get(views.orders_summary),
+        )
+        self.assertEqual(
+            self.get(views.orders_summary, state="!UP"),
+            self.get(views.orders_summary, state="MH"),
+        )
+        # O1 is in both categories and must only be counted once.
+        batch = self.get(
+            views.chart_batch, product_category="Books,Toys", metrics="order_count"
+        )
+        self.assertEqual(batch["series"], {"order_count": [2, 1]})
+
+    def test_filters_matching_no_orders(self):
+        empty = {
+            "total_orders": 0,
+            "total_revenue": 0,
+            "total_products_sold": 0,
+            "canceled_order_percentage": 0.0,
+        }
+        for filters in ({"state": "KA"}, {"product_category": "Garden"}):
+            with self.subTest(filters=filters):
+                summary = self.get(views.orders_summary, **filters)
+                batch = self.get(views.chart_batch, **filters)
+                self.assertEqual(summary, empty)
+                self.assertEqual(batch["summary"], empty)
+
+    def test_invalid_filter_values(self):
+        for params in ({"platform_id": "1,x"}, {"state": "!"}):
+            with self.subTest(params=params):
+                response = views.orders_summary(RequestFactory().get("/", params))
+                self.assertEqual(response.status_code, 400)
+
+    def test_prepared_statements_return_the_same_results(self):
+        prepared = self.get(views.chart_batch, state="MH,UP")
+        with override_settings(VISUALIZER_PREPARED_STATEMENTS=False):
+            caches[CACHE_ALIAS].clear()
+            self.assertEqual(self.get(views.chart_batch, state="MH,UP"), prepared)
+
+    def test_selected_metrics_only(self):
+        batch = self.get(views.chart_batch, metrics="order_count,cancelled_orders")
+        self.assertEqual(
+            batch["series"], {"order_count": [2, 1], "cancelled_orders": [1, 0]}
+        )
+        self.assertNotIn("summary", batch)
+
+
+class ChartSeriesTests(LoadedOrdersTestCase):
+    """The series endpoint groups by time grain and breakdown dimensions."""
+
+    def test_monthly_breakdown_by_category(self):
+        data = self.get(
+            views.chart_series, group_by="category", metrics="order_count,revenue"
+        )
+        self.assertEqual(data["labels"], ["2023-01", "2023-02"])
+        self.assertEqual(
+            data["series"],
+            [
+                {
+                    "group": {"category": "Books"},
+                    "values": {"order_count": [2, 0], "revenue": [200, 0]},
+                },
+                {
+                    "group": {"category": "Toys"},
+                    "values": {"order_count": [1, 1], "revenue": [50, 20]},
+                },
+            ],
+        )
+
+    def test_weekly_breakdown_by_state(self):
+        data = self.get(views.chart_series, grain="week", group_by="state")
+        self.assertEqual(data["labels"], ["2023-W02", "2023-W03", "2023-W05"])
+        self.assertEqual(
+            [(series["group"], series["values"]) for series in data["series"]],
+            [
+                ({"state": "MH"}, {"quantity_sold": [3, 0, 0]}),
+                ({"state": "UP"}, {"quantity_sold": [0, 1, 3]}),
+            ],
+        )
+
+    def test_orders_split_across_categories_are_counted_once(self):
+        data = self.get(views.chart_series, grain="quarter", metrics="order_count")
+        self.assertEqual(data["labels"], ["2023-Q1"])
+        self.assertEqual(
+            data["series"], [{"group": {}, "values": {"order_count": [3]}}]
+        )
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"grain": "hour"},
+            {"group_by": "customer_id"},
+            {"group_by": "category,state,platform_id"},
+            {"metrics": "summary"},
+        ):
+            with self.subTest(params=params):
+                response = views.chart_series(RequestFactory().get("/", params))
+                self.assertEqual(response.status_code, 400)
+
+
+class ChartRenderingTests(LoadedOrdersTestCase):
+    """Chart responses are rendered in the format the client accepts."""
+
+    url = "/visualizer/series?grain=week&group_by=state&metrics=revenue"
+
+    def test_json_matches_view_data(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        expected = self.get(
+            views.chart_series, grain="week", group_by="state", metrics="revenue"
+        )
+        self.assertEqual(json.loads(response.content)["data"], expected)
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_arrow_stream_has_one_column_per_series(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=ARROW_MEDIA_TYPE)
+        self.assertEqual(response["Content-Type"], ARROW_MEDIA_TYPE)
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+
+        self.assertEqual(
+            table.to_pydict(),
+            {
+                "labels": ["2023-W02", "2023-W03", "2023-W05"],
+                "MH/revenue": [150.0, 0.0, 0.0],
+                "UP/revenue": [0.0, 100.0, 20.0],
+            },
+        )
+        self.assertEqual(
+            table.schema.field("UP/revenue").metadata[b"group"], b'{"state": "UP"}'
+        )
+        self.assertNotEqual(response["ETag"], self.client.get(self.url)["ETag"])
+
+    def test_unknown_format_is_not_acceptable(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 406)
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=0)
+    def test_large_responses_are_compressed(self):
+        url = "/visualizer/series?grain=day&group_by=category,state&metrics=" + (
+            "quantity_sold,revenue,order_count,cancelled_orders"
+        )
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        if brotli is not None:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertEqual(brotli.decompress(response.content), plain.content)
+
+
+class InstrumentationTests(LoadedOrdersTestCase):
+    """Requests are timed, and chart responses report their stages."""
+
+    url = "/visualizer/series?grain=month&group_by=state"
+
+    def setUp(self):
+        super().setUp()
+        instrumentation.clear_metrics()
+        if instrumentation.time_query not in connection.execute_wrappers:
+            instrumentation.instrument_connection(connection)
+            self.addCleanup(
+                connection.execute_wrappers.remove, instrumentation.time_query
+            )
+
+    def test_chart_responses_report_server_timing(self):
+        miss = self.client.get(self.url)["Server-Timing"]
+        self.assertIn("compute;dur=", miss)
+        self.assertRegex(miss, r'db;dur=[\d.]+;desc="queries: [1-9]')
+        self.assertIn("total;dur=", miss)
+
+        hit = self.client.get(self.url)["Server-Timing"]
+        self.assertIn("cache;dur=", hit)
+        self.assertNotIn("compute", hit)
+
+        self.assertFalse(self.client.get("/metrics").has_header("Server-Timing"))
+
+    def test_metrics_are_exposed_in_prometheus_format(self):
+        self.client.get(self.url)
+        response = self.client.get("/metrics")
+
+        self.assertEqual(
+            response["Content-Type"], instrumentation.PROMETHEUS_CONTENT_TYPE
+        )
+        body = response.content.decode()
+        self.assertIn("# TYPE ecomm_request_duration_seconds histogram", body)
+        self.assertIn(
+            'ecomm_request_duration_seconds_count{route="visualizer/series"} 1', body
+        )
+        self.assertIn(
+            'ecomm_request_queries_bucket{route="visualizer/series",le="+Inf"} 1', body
+        )
+        self.assertIn('ecomm_stage_duration_seconds_count{stage="compute"} 1', body)
+        self.assertIn("ecomm_prepared_statement_executions_total", body)
+        self.assertIn('ecomm_dimension_cache_hits_total{table="product"}', body)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_nothing_is_recorded_when_disabled(self):
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertNotIn(
+            "ecomm_stage_duration_seconds_count", instrumentation.render_metrics()
+        )
+
+
+class PrometheusFormatTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = instrumentation.Histogram("h", "Help.", "view", (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe('a "b"', value)
+
+        samples = [
+            (name, labels.get("le"), value)
+            for name, labels, value in histogram.samples()
+        ]
+        self.assertEqual(
+            samples,
+            [
+                ("h_bucket", 0.1, 2),
+                ("h_bucket", 1, 3),
+                ("h_bucket", "+Inf", 4),
+                ("h_sum", None, 2.65),
+                ("h_count", None, 4),
+            ],
+        )
+        self.assertEqual(instrumentation.escape_label('a "b"'), 'a \\"b\\"')
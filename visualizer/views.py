@@ -1,97 +1,214 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
-from django.db import connection
-import pandas as pd
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 import logging
+from datetime import date, timedelta
+
+from ecomm_dashboard import instrumentation
+from ecomm_dashboard.visualizer import statements
+from ecomm_dashboard.visualizer.cache import cached_chart_response
+from ecomm_dashboard.visualizer.models import Order
+from ecomm_dashboard.visualizer.renderers import CHART_RENDERERS
 
 
 logger = logging.getLogger(__name__)
 
+FILTER_PARAMS = {
+    "sales_date": "date_range",
+    "category": "product_category",
+    "delivery_status": "delivery_status",
+    "platform_id": "platform_id",
+    "state": "state",
+}
+
+# Dimension filters accept comma-separated values and match any of them, or
+# none of them when prefixed with NEGATION_PREFIX (state=!MH,UP).
+FILTER_COLUMNS = {
+    "category": ("category", str),
+    "delivery_status": ("delivery_status", str),
+    "platform_id": ("platform_id", int),
+    "state": ("state", str),
+}
+NEGATION_PREFIX = "!"
+
+ROLLUP_TABLE = "order_monthly_rollup"
+ROLLUP_VALUE_COLUMNS = {
+    "quantity_sold": "quantity_sold",
+    "selling_price": "revenue",
+}
+
+# Per-month aggregates of the batch endpoint, as (mv_order_details,
+# order_monthly_rollup) expressions.
+BATCH_METRICS = {
+    "quantity_sold": ("SUM(quantity_sold)", "SUM(quantity_sold)"),
+    "revenue": ("SUM(selling_price)", "SUM(revenue)"),
+    "order_count": ("COUNT(DISTINCT order_id)", "SUM(order_count)"),
+    "cancelled_orders": (
+        "COUNT(DISTINCT order_id) FILTER (WHERE delivery_status = 'Cancelled')",
+        "SUM(order_count) FILTER (WHERE delivery_status = 'Cancelled')",
+    ),
+}
+# "summary" is the orders_summary totals, derived from all four series.
+BATCH_SUMMARY = "summary"
+ORDER_METRICS = {"order_count", "cancelled_orders", BATCH_SUMMARY}
+
+# Time grains of the series endpoint and the to_char format of their labels.
+TIME_GRAINS = {
+    "day": "YYYY-MM-DD",
+    "week": 'IYYY-"W"IW',
+    "month": "YYYY-MM",
+    "quarter": 'YYYY-"Q"Q',
+    "year": "YYYY",
+}
+ROLLUP_GRAINS = {"month", "quarter", "year"}
+
+# Dimensions a series can be broken down by, and how many at once.
+GROUP_BY_DIMENSIONS = ["category", "delivery_status", "platform_id", "state"]
+MAX_GROUP_BY = 2
+
+
+def get_request_filters(request):
+    """Helper function to read the chart filters from the query string"""
+    return {
+        key: request.GET.get(param) for key, param in FILTER_PARAMS.items()
+    }
+
+
+def parse_filter_values(value, type_cast=str):
+    """Helper function to split a filter into its values and whether it is negated"""
+    negated = value.startswith(NEGATION_PREFIX)
+    parts = value[len(NEGATION_PREFIX) :] if negated else value
+
+    values = list(
+        dict.fromkeys(
+            type_cast(part.strip()) for part in parts.split(",") if part.strip()
+        )
+    )
+    if not values:
+        raise ValueError(f"Invalid filter value: {value}")
+    return values, negated
+
+
+def build_filter_conditions(filters, date_col="date_of_sale"):
+    """
+    Helper function to build WHERE conditions and params from filters.
 
-def build_filter_conditions(filters):
-    """Helper function to build WHERE conditions and params from filters"""
+    Dimension filters are passed as one array parameter, so the statement
+    is the same for any number of values and the dimension indexes on
+    mv_order_details still apply.
+    """
     where_conditions = []
     params = []
 
     if filters["sales_date"]:
         try:
             start_date, end_date = filters["sales_date"].split(",")
-            where_conditions.extend(["date_of_sale >= %s", "date_of_sale <= %s"])
+            where_conditions.extend([f"{date_col} >= %s", f"{date_col} <= %s"])
             params.extend([start_date, end_date])
         except ValueError:
             raise ValueError(
                 "Invalid date range format. Use 'start_date,end_date' in YYYY-MM-DD format."
             )
 
-    filter_mappings = {
-        "category": ("category = %s", str),
-        "delivery_status": ("delivery_status = %s", str),
-        "platform_id": ("platform_id = %s", int),
-        "state": ("state = %s", str),
-    }
-
-    for key, (condition, type_cast) in filter_mappings.items():
+    for key, (column, type_cast) in FILTER_COLUMNS.items():
         if filters[key]:
-            where_conditions.append(condition)
-            params.append(type_cast(filters[key]))
+            values, negated = parse_filter_values(filters[key], type_cast)
+            if negated:
+                where_conditions.append(f"{column} <> ALL(%s)")
+            else:
+                where_conditions.append(f"{column} = ANY(%s)")
+            params.append(values)
 
     return where_conditions, params
 
 
-def get_filtered_data(query, filters):
-    """Helper function to execute query and return filtered data"""
-    where_conditions, params = build_filter_conditions(filters)
+def monthly_aggregate_query(
+    value_col, filters, source="mv_order_details", date_col="date_of_sale"
+):
+    """Helper function to build the per-month SUM query and its params"""
+    where_conditions, params = build_filter_conditions(filters, date_col=date_col)
 
+    query = (
+        f"SELECT to_char({date_col}, 'YYYY-MM') AS month, SUM({value_col}) "
+        f"FROM {source}"
+    )
     if where_conditions:
         query += " WHERE " + " AND ".join(where_conditions)
+    query += " GROUP BY month ORDER BY month"
+    return query, params
 
-    with connection.cursor() as cursor:
-        cursor.execute(query, params)
-        return cursor.fetchall()
 
+def get_monthly_aggregate(
+    value_col,
+    filters,
+    source="mv_order_details",
+    date_col="date_of_sale",
+    using=DEFAULT_DB_ALIAS,
+):
+    """Helper function to sum a column per month inside the database"""
+    query, params = monthly_aggregate_query(value_col, filters, source, date_col)
 
-def process_monthly_data(data, date_col, value_col, columns):
-    """Helper function to process monthly aggregations"""
-    df = pd.DataFrame(data, columns=columns)
-    df[date_col] = pd.to_datetime(df[date_col])
-
-    monthly_data = (
-        df.groupby(df[date_col].dt.strftime("%Y-%m"))[value_col]
-        .sum()
-        .reset_index()
-        .rename(columns={date_col: "month"})
-        .sort_values("month")
-    )
+    with connections[using].cursor() as cursor:
+        statements.execute(cursor, query, params)
+        rows = cursor.fetchall()
 
     return {
-        "labels": monthly_data["month"].tolist(),
-        "values": monthly_data[value_col].tolist(),
+        "labels": [month for month, _ in rows],
+        "values": [value for _, value in rows],
     }
 
+
+def rollup_covers(filters):
+    """Helper function to check whether the monthly rollup can answer the filters"""
+    if not filters["sales_date"]:
+        return True
+
+    try:
+        start_date, end_date = (
+            date.fromisoformat(part.strip()) for part in filters["sales_date"].split(",")
+        )
+    except ValueError:
+        return False
+
+    return start_date.day == 1 and (end_date + timedelta(days=1)).day == 1
+
+
+def get_monthly_series(value_col, filters, using=DEFAULT_DB_ALIAS):
+    """Helper function to read a monthly series from the cheapest source"""
+    if rollup_covers(filters):
+        return get_monthly_aggregate(
+            ROLLUP_VALUE_COLUMNS[value_col],
+            filters,
+            source=ROLLUP_TABLE,
+            date_col="month",
+            using=using,
+        )
+    return get_monthly_aggregate(value_col, filters, using=using)
+
+
+def read_database(version):
+    """Helper function to pick the database for chart reads at a data version"""
+    return router.db_for_read(Order, data_version=version)
+
+
 @api_view(["GET"])
+@renderer_classes(CHART_RENDERERS)
 def line_chart_monthly_sales_volume(request):
     """API endpoint that returns sales volume based on optional filters."""
     try:
-        filters = {
-            "sales_date": request.query_params.get("date_range"),
-            "category": request.query_params.get("product_category"),
-            "delivery_status": request.query_params.get("delivery_status"),
-            "platform_id": request.query_params.get("platform_id"),
-            "state": request.query_params.get("state"),
-        }
-
-        query = "SELECT date_of_sale, quantity_sold FROM mv_order_details"
-        data = get_filtered_data(query, filters)
+        filters = get_request_filters(request)
 
-        result = process_monthly_data(
-            data=data,
-            date_col="date_of_sale",
-            value_col="quantity_sold",
-            columns=["date_of_sale", "quantity_sold"],
+        return cached_chart_response(
+            request,
+            "monthly_sales_volume",
+            filters,
+            lambda version: get_monthly_series(
+                "quantity_sold", filters, using=read_database(version)
+            ),
         )
 
-        return Response({"status": "success", "data": result})
-
     except ValueError as ve:
         return Response({"status": "error", "message": str(ve)}, status=400)
     except Exception as e:
@@ -106,28 +223,264 @@ def line_chart_monthly_sales_volume(request):
 
 
 @api_view(["GET"])
+@renderer_classes(CHART_RENDERERS)
 def bar_chart_monthly_revenue(request):
     """API endpoint that returns revenue based on optional filters."""
     try:
-        filters = {
-            "sales_date": request.query_params.get("date_range"),
-            "category": request.query_params.get("product_category"),
-            "delivery_status": request.query_params.get("delivery_status"),
-            "platform_id": request.query_params.get("platform_id"),
-            "state": request.query_params.get("state"),
+        filters = get_request_filters(request)
+
+        return cached_chart_response(
+            request,
+            "monthly_revenue",
+            filters,
+            lambda version: get_monthly_series(
+                "selling_price", filters, using=read_database(version)
+            ),
+        )
+
+    except ValueError as ve:
+        return Response({"status": "error", "message": str(ve)}, status=400)
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return Response(
+            {
+                "status": "error",
+                "message": "An error occurred while processing your request.",
+            },
+            status=500,
+        )
+
+
+def get_orders_summary(filters, source="mv_order_details", using=DEFAULT_DB_ALIAS):
+    """Helper function to compute the order totals and cancellation rate"""
+    where_conditions, params = build_filter_conditions(filters)
+
+    query = f"""
+        SELECT
+            COUNT(DISTINCT order_id),
+            COALESCE(SUM(selling_price), 0),
+            COALESCE(SUM(quantity_sold), 0),
+            COALESCE(
+                100.0
+                * COUNT(DISTINCT order_id) FILTER (WHERE delivery_status = 'Cancelled')
+                / NULLIF(COUNT(DISTINCT order_id), 0),
+                0
+            )
+        FROM {source}
+    """
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+
+    with connections[using].cursor() as cursor:
+        statements.execute(cursor, query, params)
+        (
+            total_orders,
+            total_revenue,
+            total_products_sold,
+            canceled_order_percentage,
+        ) = cursor.fetchone()
+
+    return {
+        "total_orders": total_orders,
+        "total_revenue": total_revenue,
+        "total_products_sold": total_products_sold,
+        "canceled_order_percentage": float(canceled_order_percentage),
+    }
+
+
+def get_list_param(request, param, choices, default):
+    """Helper function to read a comma-separated list limited to ``choices``"""
+    value = request.GET.get(param)
+    if not value:
+        return list(default)
+
+    items = list(
+        dict.fromkeys(item.strip() for item in value.split(",") if item.strip())
+    )
+    if not items or set(items) - set(choices):
+        raise ValueError(f"Invalid {param}. Choose from: {', '.join(choices)}")
+    return items
+
+
+def get_batch_metrics(request):
+    """Helper function to read and validate the requested batch metrics"""
+    choices = [*BATCH_METRICS, BATCH_SUMMARY]
+    return get_list_param(request, "metrics", choices, default=choices)
+
+
+def batch_aggregate_query(columns, filters, use_rollup):
+    """Helper function to build the single grouped query of the batch endpoint"""
+    date_col = "month" if use_rollup else "date_of_sale"
+    source = ROLLUP_TABLE if use_rollup else "mv_order_details"
+    where_conditions, params = build_filter_conditions(filters, date_col=date_col)
+
+    aggregates = ", ".join(
+        f"COALESCE({BATCH_METRICS[column][use_rollup]}, 0)" for column in columns
+    )
+    query = (
+        f"SELECT to_char({date_col}, 'YYYY-MM') AS month, {aggregates} "
+        f"FROM {source}"
+    )
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+    query += " GROUP BY month ORDER BY month"
+    return query, params
+
+
+def rollup_counts_orders(filters, group_by=()):
+    """
+    Helper function to check whether rollup order counts add up exactly.
+
+    The rollup keeps one distinct-order count per (month, category, status,
+    platform, state), so an order with lines in two categories is counted in
+    both; its counts only add up across rows when a single category is
+    selected or the result is broken down by category.
+    """
+    if "category" in group_by:
+        return True
+    if not filters["category"]:
+        return False
+    values, negated = parse_filter_values(filters["category"])
+    return len(values) == 1 and not negated
+
+
+def get_chart_batch(metrics, filters, using=DEFAULT_DB_ALIAS):
+    """Helper function to compute several monthly series and the summary at once"""
+    columns = list(BATCH_METRICS)
+    if BATCH_SUMMARY not in metrics:
+        columns = [column for column in columns if column in metrics]
+
+    use_rollup = rollup_covers(filters) and (
+        not ORDER_METRICS.intersection(metrics) or rollup_counts_orders(filters)
+    )
+    query, params = batch_aggregate_query(columns, filters, use_rollup)
+
+    with connections[using].cursor() as cursor:
+        statements.execute(cursor, query, params)
+        rows = cursor.fetchall()
+
+    values = {
+        column: [row[index] for row in rows]
+        for index, column in enumerate(columns, start=1)
+    }
+    data = {
+        "labels": [row[0] for row in rows],
+        "series": {
+            metric: values[metric] for metric in metrics if metric in BATCH_METRICS
+        },
+    }
+
+    if BATCH_SUMMARY in metrics:
+        total_orders = sum(values["order_count"])
+        data[BATCH_SUMMARY] = {
+            "total_orders": total_orders,
+            "total_revenue": sum(values["revenue"]),
+            "total_products_sold": sum(values["quantity_sold"]),
+            "canceled_order_percentage": (
+                100.0 * sum(values["cancelled_orders"]) / total_orders
+                if total_orders
+                else 0.0
+            ),
         }
+    return data
+
+
+def get_series_params(request):
+    """Helper function to read and validate the grain, breakdown and metrics"""
+    grain = request.GET.get("grain") or "month"
+    if grain not in TIME_GRAINS:
+        raise ValueError(f"Invalid grain. Choose from: {', '.join(TIME_GRAINS)}")
+
+    group_by = get_list_param(request, "group_by", GROUP_BY_DIMENSIONS, default=[])
+    if len(group_by) > MAX_GROUP_BY:
+        raise ValueError(f"group_by accepts at most {MAX_GROUP_BY} dimensions.")
+
+    metrics = get_list_param(
+        request, "metrics", BATCH_METRICS, default=["quantity_sold"]
+    )
+    return grain, group_by, metrics
+
+
+def series_query(grain, group_by, metrics, filters, use_rollup):
+    """Helper function to build the grouped query of the series endpoint"""
+    date_col = "month" if use_rollup else "date_of_sale"
+    source = ROLLUP_TABLE if use_rollup else "mv_order_details"
+    where_conditions, params = build_filter_conditions(filters, date_col=date_col)
+
+    columns = [
+        f"to_char(date_trunc('{grain}', {date_col}), '{TIME_GRAINS[grain]}') "
+        "AS period",
+        *group_by,
+        *(f"COALESCE({BATCH_METRICS[metric][use_rollup]}, 0)" for metric in metrics),
+    ]
+    keys = ", ".join(["period", *group_by])
+    query = f"SELECT {', '.join(columns)} FROM {source}"
+    if where_conditions:
+        query += " WHERE " + " AND ".join(where_conditions)
+    query += f" GROUP BY {keys} ORDER BY {keys}"
+    return query, params
 
-        query = "SELECT date_of_sale, selling_price FROM mv_order_details"
-        data = get_filtered_data(query, filters)
 
-        result = process_monthly_data(
-            data=data,
-            date_col="date_of_sale",
-            value_col="selling_price",
-            columns=["date_of_sale", "selling_price"],
+def get_series(grain, group_by, metrics, filters, using=DEFAULT_DB_ALIAS):
+    """
+    Helper function to compute metrics per time period and breakdown group.
+
+    Returns one ``labels`` array of periods and one entry per group in
+    ``series``, holding an array per metric aligned with the labels; periods
+    without data for a group are 0.
+    """
+    use_rollup = (
+        grain in ROLLUP_GRAINS
+        and rollup_covers(filters)
+        and (
+            not ORDER_METRICS.intersection(metrics)
+            or rollup_counts_orders(filters, group_by)
         )
+    )
+    query, params = series_query(grain, group_by, metrics, filters, use_rollup)
+
+    with connections[using].cursor() as cursor:
+        statements.execute(cursor, query, params)
+        rows = cursor.fetchall()
+
+    labels = sorted({row[0] for row in rows})
+    positions = {label: index for index, label in enumerate(labels)}
+    groups = {}
+    for period, *values in rows:
+        key = tuple(values[: len(group_by)])
+        if key not in groups:
+            groups[key] = {metric: [0] * len(labels) for metric in metrics}
+        for metric, value in zip(metrics, values[len(group_by) :]):
+            groups[key][metric][positions[period]] = value
+
+    return {
+        "labels": labels,
+        "series": [
+            {"group": dict(zip(group_by, key)), "values": values}
+            for key, values in groups.items()
+        ],
+    }
+
+
+@api_view(["GET"])
+@renderer_classes(CHART_RENDERERS)
+def chart_series(request):
+    """
+    API endpoint that returns metrics per day, week, month, quarter or year,
+    optionally broken down by up to two dimensions, based on optional filters.
+    """
+    try:
+        filters = get_request_filters(request)
+        grain, group_by, metrics = get_series_params(request)
 
-        return Response({"status": "success", "data": result})
+        return cached_chart_response(
+            request,
+            f"chart_series:{grain}:{','.join(group_by)}:{','.join(metrics)}",
+            filters,
+            lambda version: get_series(
+                grain, group_by, metrics, filters, using=read_database(version)
+            ),
+        )
 
     except ValueError as ve:
         return Response({"status": "error", "message": str(ve)}, status=400)
@@ -143,46 +496,58 @@ def bar_chart_monthly_revenue(request):
 
 
 @api_view(["GET"])
-def orders_summary(request):
+@renderer_classes(CHART_RENDERERS)
+def chart_batch(request):
     """
-    API endpoint that returns revenue based on optional filters.
+    API endpoint that returns several chart series and the order summary for
+    one set of filters, computed with a single grouped query.
     """
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """SELECT o.delivery_status, od.selling_price, od.quantity_sold
-                FROM orders as o 
-                INNER JOIN order_details od ON o.id = od.order_id
-                INNER JOIN product p ON od.product_id = p.id
-                INNER JOIN customer_address_details cad ON o.customer_address_details_id = cad.id""",
-            )
-            order_data = cursor.fetchall()
+        filters = get_request_filters(request)
+        metrics = get_batch_metrics(request)
 
-        # Start with the full DataFrame
-        filtered_data = pd.DataFrame(
-            order_data,
-            columns=["delivery_status", "selling_price", "quantity_sold"],
-        )
-        total_orders = filtered_data.shape[0]
-        total_revenue = filtered_data["selling_price"].sum()
-        total_products_sold = filtered_data["quantity_sold"].sum()
-        canceled_order_percentage = (
-            filtered_data[filtered_data["delivery_status"] == "Cancelled"].shape[0]
-            / total_orders
-            * 100
+        return cached_chart_response(
+            request,
+            f"chart_batch:{','.join(metrics)}",
+            filters,
+            lambda version: get_chart_batch(
+                metrics, filters, using=read_database(version)
+            ),
         )
 
+    except ValueError as ve:
+        return Response({"status": "error", "message": str(ve)}, status=400)
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
         return Response(
             {
-                "status": "success",
-                "data": {
-                    "total_orders": total_orders,
-                    "total_revenue": total_revenue,
-                    "total_products_sold": total_products_sold,
-                    "canceled_order_percentage": canceled_order_percentage,
-                },
-            }
+                "status": "error",
+                "message": "An error occurred while processing your request.",
+            },
+            status=500,
+        )
+
+
+@api_view(["GET"])
+@renderer_classes(CHART_RENDERERS)
+def orders_summary(request):
+    """
+    API endpoint that returns order totals based on optional filters.
+    """
+    try:
+        filters = get_request_filters(request)
+
+        return cached_chart_response(
+            request,
+            "orders_summary",
+            filters,
+            lambda version: get_orders_summary(
+                filters, using=read_database(version)
+            ),
         )
+
+    except ValueError as ve:
+        return Response({"status": "error", "message": str(ve)}, status=400)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         return Response(
@@ -192,3 +557,24 @@ def orders_summary(request):
             },
             status=500,
         )
+
+
+@api_view(["GET"])
+def statement_stats(request):
+    """
+    API endpoint that reports prepared-statement reuse in this process.
+    """
+    return Response({"status": "success", "data": statements.statement_stats()})
+
+
+@require_GET
+def metrics(request):
+    """
+    Endpoint that exposes this process's metrics in the Prometheus text format.
+
+    A plain Django view, so scrapers are not subject to DRF content negotiation.
+    """
+    return HttpResponse(
+        instrumentation.render_metrics(),
+        content_type=instrumentation.PROMETHEUS_CONTENT_TYPE,
+    )